@@ -1,9 +1,10 @@
-﻿from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+﻿from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse, FileResponse
 
 import shutil
+import hashlib
 import os
 import uuid
 import json
@@ -16,6 +17,7 @@ import requests
 import paho.mqtt.client as mqtt
 
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import copy
@@ -23,12 +25,18 @@ import copy
 # ==========================
 # Imports จาก process modules
 # ==========================
-from process.size import analyze_shrimp
-from process.shrimp import analyze_kuny
-from process.din import analyze_video
-from process.water import analyze_water
+# analyzer ทั้ง 4 ตัว (size / shrimp / water / din) รันผ่าน utils.worker_pool
+# ใน process แยกตามประเภท process หลักจึงไม่ต้อง import torch / โมเดลเลย
 from local_storage import LocalStorage
 from auto_dose import process_auto_dose   # 🟢 เพิ่มบรรทัดนี้
+from utils.loader_model import resolve_allowed_model_path
+from utils.model_registry import registry
+from utils import metrics
+from utils.worker_pool import model_version, run_analyzer, worker_count, worker_pools
+from utils.result_cache import content_key, make_key, result_cache
+from utils.scene_gate import scene_gate
+from process.din_output import resolve_output_mode
+from utils.roi import ROI_KINDS, roi_mode, roi_signature, roi_store
 import math
 
 # ==========================
@@ -151,19 +159,6 @@ def build_public_url(file_path: str) -> str:
         return f"{FILE_BASE_URL}/{rel_path}"
     return make_public_url(abs_file)
 
-# ==========================
-# Helper: แปลงค่า Size จาก text_content
-# ==========================
-def _extract_size_from_text(text: str):
-    matches = re.findall(r"Shrimp\s+\d+:\s*([\d.]+)\s*cm\s*/\s*([\d.]+)\s*g", text)
-    if matches:
-        lengths = [float(m[0]) for m in matches]
-        weights = [float(m[1]) for m in matches]
-        avg_length = sum(lengths) / len(lengths)
-        avg_weight = sum(weights) / len(weights)
-        return avg_length, avg_weight
-    return None, None
-
 def _has_status_payload(data: dict) -> bool:
     return any([
         data.get("DO") not in (None, ""),
@@ -180,24 +175,40 @@ def _has_size_payload(data: dict) -> bool:
         bool(data.get("PicKungDinn")),
     ])
 
+# ==========================
+# Background persistence: เขียนไฟล์ input ลงดิสก์โดยไม่ให้ request ต้องรอ
+# ==========================
+# เก็บไฟล์ภาพ input ลง input_raspi1/ input_raspi2/ หรือไม่ (analyzer ใช้ bytes ในหน่วยความจำอยู่แล้ว)
+PERSIST_INPUTS = os.environ.get("PERSIST_INPUTS", "1") == "1"
+_persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="persist")
+
+def _write_bytes(path: str, data: bytes):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    except Exception as e:
+        print(f"❌ Error persisting file {path}: {e}")
+
+def persist_in_background(path: str, data: bytes):
+    _persist_executor.submit(_write_bytes, path, data)
+
 # ==========================
 # Save JSON Result
 # ==========================
 def save_json_result(
     result_type,
     original_name,
-    output_image=None,
-    output_text_path=None,
+    result,
     pond_number=None,
     total_larvae=None,
     survival_rate=None,
-    output_video=None,
-    original_input_path=None
+    original_input_path=None,
+    original_input_bytes=None,
+    output_mode=None
 ):
-    text_content = None
-    if output_text_path and os.path.exists(output_text_path):
-        with open(output_text_path, "r", encoding="utf-8") as f:
-            text_content = f.read()
+    """result = AnalysisResult ของ analyzer (process/results.py) ใช้ตัวเลขจาก metrics ตรงๆ ไม่ต้องอ่าน txt"""
+    output_image, output_video = result.image, result.video
 
     result_data = {
         "id": str(uuid.uuid4()),
@@ -207,7 +218,9 @@ def save_json_result(
         "pond_number": pond_number,
         "total_larvae": total_larvae,
         "survival_rate": survival_rate,
-        "text_content": text_content
+        "text_content": result.text,
+        "metrics": result.metrics,
+        "detections": result.detections
     }
 
     # ถ้าไม่เจอ pond_id ใน args ลองเดาจากชื่อไฟล์
@@ -227,8 +240,20 @@ def save_json_result(
     if output_video:
         result_data["output_video"] = make_public_url(output_video)
 
+    # din: none / keyframes / preview / full (ดู process/din_output.py)
+    if output_mode:
+        result_data["output_mode"] = output_mode
+
     # ✅ raw image: ตั้งชื่อใหม่ทุกครั้ง (timestamp + ชื่อไฟล์เก่า)
-    if original_input_path and os.path.exists(original_input_path):
+    # ถ้ามี bytes ในหน่วยความจำ -> เขียนแบบ background แล้วใส่ URL ได้เลย ไม่ต้องรอดิสก์
+    if original_input_path and original_input_bytes is not None:
+        raw_dir = os.path.join(LOCAL_STORAGE_BASE, result_type, "raw")
+        raw_filename = f"{now_bangkok().strftime('%Y%m%d_%H%M%S_%f')}_{os.path.basename(original_input_path)}"
+        raw_dest = os.path.join(raw_dir, raw_filename)
+        persist_in_background(raw_dest, original_input_bytes)
+        result_data["raw_input_image"] = build_public_url(raw_dest)
+
+    elif original_input_path and os.path.exists(original_input_path):
         raw_dir = os.path.join(LOCAL_STORAGE_BASE, result_type, "raw")
         os.makedirs(raw_dir, exist_ok=True)
 
@@ -245,15 +270,18 @@ def save_json_result(
 
     # ✅ เพิ่ม shrimp_size ถ้าเป็น result_type = "size"
     if result_type == "size":
-        length_cm, weight_avg_g = _extract_size_from_text(text_content or "")
         result_data["shrimp_size"] = {
-            "length_cm": length_cm,
-            "weight_avg_g": weight_avg_g,
+            "length_cm": result.metrics.get("avg_length_cm"),
+            "weight_avg_g": result.metrics.get("avg_weight_g"),
             "image_url": result_data.get("output_image")
         }
 
-    # ✅ ส่งการแจ้งเตือนเมื่อพบกุ้งลอยผิวน้ำ
-    if result_type == "shrimp" and text_content and "🆗 ไม่พบกุ้งลอยผิวน้ำในภาพนี้" not in text_content:
+    # ผลเดิมจาก scene gate: ยังบันทึก JSON ตามรอบ แต่ติดป้ายไว้และไม่แจ้งเตือนซ้ำ
+    if result.reused:
+        result_data["reused"] = True
+
+    # ✅ ส่งการแจ้งเตือนเมื่อพบกุ้งลอยผิวน้ำ (ครั้งเดียวต่อผลที่รันโมเดลจริง)
+    if result_type == "shrimp" and result.metrics.get("count") and not result.reused:
         pond_id = result_data.get("pond_number")
         if pond_id:
             image_url = result_data.get("output_image")
@@ -415,12 +443,69 @@ def get_latest_pond_info_for_pond(data_ponds_dir, pond_id):
         data = json.load(f)
     return data.get("pond_id"), data.get("initial_stock")
 
+# ==========================
+# Helper: result cache key ของแต่ละไฟล์
+# ==========================
+def _image_analyzer_for(filename_lower: str):
+    """ชื่อ analyzer ที่ไฟล์ภาพนี้จะถูกส่งไป (ตามลำดับเงื่อนไขเดียวกับ /process)"""
+    if "shrimp_float" in filename_lower:
+        return "shrimp"
+    if "shrimp" in filename_lower:
+        return "size"
+    if "water" in filename_lower:
+        return "water"
+    return None
+
+def _cache_key_for(analyzer: str, content: bytes = None, digest: str = None, variant: str = None):
+    """
+    key = sha256 ของไฟล์ + analyzer + version โมเดล (ถ้าหา version ไม่ได้จะไม่ใช้ cache)
+    variant = ตัวเลือกที่ทำให้ผลลัพธ์ต่างกัน (เช่น output mode ของ din)
+    """
+    try:
+        version = model_version(analyzer)
+    except Exception as e:
+        print(f"⚠️ Skip result cache ({analyzer}): {e}")
+        return None
+    name = f"{analyzer}/{variant}" if variant else analyzer
+    if digest is not None:
+        return make_key(digest, name, version)
+    return content_key(content, name, version)
+
+async def run_gated_analyzer(kind: str, pond_id, content: bytes, **kwargs):
+    """
+    รัน analyzer ผ่าน scene gate: ถ้าภาพใหม่ของบ่อนี้แทบไม่ต่างจากภาพล่าสุดที่รันจริง
+    จะคืนผลเดิม (AnalysisResult) โดยไม่รันโมเดล
+    """
+    try:
+        version = model_version(kind)
+    except Exception:
+        version = "unknown"
+    previous, fingerprint = scene_gate.check(kind, pond_id, content, version)
+    if previous is not None:
+        print(f"🟰 Scene unchanged ({kind} pond {pond_id}), reuse {previous.artifact}")
+        return previous.as_reused()
+    result = await run_analyzer(kind, content, **kwargs)
+    scene_gate.update(kind, pond_id, fingerprint, result, version)
+    return result
+
 # ==========================
 # API: /process
 # ==========================
 @app.post("/process")
-async def process_files(files: List[UploadFile] = File(...)):
+async def process_files(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    idempotency_key: str | None = Form(None),
+    din_output: str | None = Form(None)
+):
+    """
+    idempotency_key (form field หรือ header Idempotency-Key) ใช้บอกว่าเป็นการส่งซ้ำของ upload เดิม
+    ไฟล์ที่ bytes ตรงกับที่เคยประมวลผลแล้ว (หรือ key ซ้ำ) จะได้ผลเดิมกลับไปทันทีโดยไม่รันโมเดลใหม่
+    din_output (none / keyframes / preview / full) ผลลัพธ์ของวิดีโอกุ้งดิ้น
+    ถ้าไม่ส่งมาใช้ ENV DIN_OUTPUT_MODE_POND<N> / DIN_OUTPUT_MODE (default full)
+    """
     global last_seen_data  # ✅ อัพเดท cache ทันที
+    idempotency_key = idempotency_key or request.headers.get("Idempotency-Key")
     
     os.makedirs("input_raspi1", exist_ok=True)
     os.makedirs("input_raspi2", exist_ok=True)
@@ -434,6 +519,8 @@ async def process_files(files: List[UploadFile] = File(...)):
         filename_lower = filename.lower()
         ext = os.path.splitext(filename_lower)[-1]
         print(f"📦 Received file: {filename}")
+        file_idem_key = f"{idempotency_key}:{filename}" if idempotency_key else None
+        cache_key, claimed = None, False
 
         try:
             if ext in [".jpg", ".jpeg", ".png"]:
@@ -442,20 +529,33 @@ async def process_files(files: List[UploadFile] = File(...)):
                 if pond_id is None:
                     raise HTTPException(status_code=400, detail="ไม่พบ pond_id ในชื่อไฟล์!")
 
+                # ♻️ upload ซ้ำ -> คืนผลเดิม (ไม่รันโมเดล / ไม่เขียน JSON / ไม่ push / ไม่แจ้งเตือนซ้ำ)
+                analyzer = _image_analyzer_for(filename_lower)
+                roi_variant = roi_signature("size", pond_id) if analyzer == "size" else None
+                cache_key = _cache_key_for(analyzer, content=content, variant=roi_variant) if analyzer else None
+                # retry ที่มาระหว่างงานแรกยังรันอยู่ จะรอผลของงานแรก (claim) แทนการรันซ้ำ
+                cached = await result_cache.claim(cache_key, file_idem_key) if cache_key else None
+                claimed = cache_key is not None and cached is None
+                if cached:
+                    print(f"♻️ Cache hit: {filename} -> {cached.get('json')}")
+                    results.append({**cached, "cached": True})
+                    continue
+
                 pond_number, total_larvae = get_latest_pond_info_for_pond(DATA_PONDS_DIR, pond_id)
 
                 # Shrimp Floating
                 if "shrimp_float" in filename_lower:
-                    input_path = os.path.join("input_raspi2", f"shrimp_float_pond{pond_id}_{now_str}{ext}")
-                    with open(input_path, "wb") as f:
-                        f.write(content)
+                    input_name = f"shrimp_float_pond{pond_id}_{now_str}{ext}"
+                    if PERSIST_INPUTS:
+                        persist_in_background(os.path.join("input_raspi2", input_name), content)
 
-                    output_img_path, output_txt_path = await asyncio.to_thread(analyze_kuny, input_path)
+                    result = await run_gated_analyzer(
+                        "shrimp", pond_id, content, original_name=input_name
+                    )
                     json_path = save_json_result(
                         result_type="shrimp",
                         original_name=filename,
-                        output_image=output_img_path,
-                        output_text_path=output_txt_path,
+                        result=result,
                         pond_number=pond_number,
                         total_larvae=total_larvae
                     )
@@ -470,27 +570,31 @@ async def process_files(files: List[UploadFile] = File(...)):
                     _send_json_to(APP_STATUS_URL, status_json)
 
                     results.append({"type": "shrimp_floating", "filename": filename, "json": json_path})
+                    result_cache.put(cache_key, results[-1], file_idem_key)
 
                 # Shrimp Size
                 elif "shrimp" in filename_lower:
-                    input_path = os.path.join("input_raspi1", f"shrimp_pond{pond_id}_{now_str}{ext}")
-                    with open(input_path, "wb") as f:
-                        f.write(content)
-
-                    output_img_path, output_txt_path = await asyncio.to_thread(
-                        analyze_shrimp,
-                        input_path,
+                    input_name = f"shrimp_pond{pond_id}_{now_str}{ext}"
+                    input_path = os.path.join("input_raspi1", input_name)
+                    if PERSIST_INPUTS:
+                        persist_in_background(input_path, content)
+
+                    result = await run_analyzer(
+                        "size",
+                        content,
                         total_larvae=total_larvae,
-                        pond_number=pond_number
+                        pond_number=pond_number,
+                        original_name=input_name,
+                        pond_id=pond_id
                     )
                     json_path = save_json_result(
                         result_type="size",
                         original_name=filename,
-                        output_image=output_img_path,
-                        output_text_path=output_txt_path,
+                        result=result,
                         pond_number=pond_number,
                         total_larvae=total_larvae,
-                        original_input_path=input_path
+                        original_input_path=input_path,
+                        original_input_bytes=content
                     )
                     
                     if os.path.exists(json_path):
@@ -502,14 +606,17 @@ async def process_files(files: List[UploadFile] = File(...)):
                     _send_json_to(APP_SIZE_URL, size_json)
 
                     results.append({"type": "shrimp_size", "filename": filename, "json": json_path})
+                    result_cache.put(cache_key, results[-1], file_idem_key)
 
                 # Water
                 elif "water" in filename_lower:
-                    input_path = os.path.join("input_raspi2", f"water_pond{pond_id}_{now_str}{ext}")
-                    with open(input_path, "wb") as f:
-                        f.write(content)
+                    input_name = f"water_pond{pond_id}_{now_str}{ext}"
+                    if PERSIST_INPUTS:
+                        persist_in_background(os.path.join("input_raspi2", input_name), content)
 
-                    output_img_path, output_txt_path = await asyncio.to_thread(analyze_water, input_path)
+                    result = await run_gated_analyzer(
+                        "water", pond_id, content, original_name=input_name
+                    )
 
                     # 🟢 อ่านค่า sensor ล่าสุด
                     sensor_path, sensor_d = _latest_json_in_dir(FS_SENSOR_DIR, pond_id=pond_id)
@@ -526,8 +633,7 @@ async def process_files(files: List[UploadFile] = File(...)):
                     json_path = save_json_result(
                         result_type="water",
                         original_name=filename,
-                        output_image=output_img_path,
-                        output_text_path=output_txt_path,
+                        result=result,
                         pond_number=pond_number,
                         total_larvae=total_larvae
                     )
@@ -541,6 +647,7 @@ async def process_files(files: List[UploadFile] = File(...)):
                     _send_json_to(APP_STATUS_URL, status_json)
 
                     results.append({"type": "water_image", "filename": filename, "json": json_path})
+                    result_cache.put(cache_key, results[-1], file_idem_key)
 
             # Video
             elif ext in [".mp4", ".avi", ".mov", ".mpeg4"]:
@@ -548,36 +655,63 @@ async def process_files(files: List[UploadFile] = File(...)):
                 if pond_id is None:
                     raise HTTPException(status_code=400, detail="ไม่พบ pond_id ในชื่อไฟล์!")
 
+                try:
+                    output_mode = resolve_output_mode(din_output, pond_id)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+
                 pond_number, total_larvae = get_latest_pond_info_for_pond(DATA_PONDS_DIR, pond_id)
                 input_path = os.path.join("input_video", f"video_pond{pond_id}_{now_str}{ext}")
+                hasher = hashlib.sha256()
                 with open(input_path, "wb") as f:
-                    shutil.copyfileobj(file.file, f)
-
-                output_video_path, output_txt_path = await asyncio.to_thread(analyze_video, input_path)
+                    for chunk in iter(lambda: file.file.read(1 << 20), b""):
+                        hasher.update(chunk)
+                        f.write(chunk)
+
+                din_variant = "/".join(filter(None, [output_mode, roi_signature("din", pond_id)]))
+                cache_key = _cache_key_for("din", digest=hasher.hexdigest(), variant=din_variant)
+                cached = await result_cache.claim(cache_key, file_idem_key) if cache_key else None
+                claimed = cache_key is not None and cached is None
+                if cached:
+                    print(f"♻️ Cache hit: {filename} -> {cached.get('json')}")
+                    os.remove(input_path)
+                    results.append({**cached, "cached": True})
+                    continue
+
+                result = await run_analyzer(
+                    "din", input_path, output_mode=output_mode, pond_id=pond_id
+                )
+                if result is None:
+                    raise ValueError("เปิดวิดีโอไม่ได้")
                 json_path = save_json_result(
                     result_type="din",
                     original_name=filename,
-                    output_video=output_video_path,
-                    output_text_path=output_txt_path,
+                    result=result,
                     pond_number=pond_number,
-                    total_larvae=total_larvae
+                    total_larvae=total_larvae,
+                    output_mode=output_mode
                 )
                 
                 if os.path.exists(json_path):
                     with open(json_path, "r", encoding="utf-8") as f:
                         last_seen_data["din"] = json.load(f)
 
-                # ✅ ส่ง push ทันที (shrimp_size.json มี video link)
+                # ✅ ส่ง push ทันที (shrimp_size.json มี link ของวิดีโอ / ภาพ keyframe)
                 size_json = build_shrimp_size_json(pond_id)
                 _send_json_to(APP_SIZE_URL, size_json)
 
                 results.append({"type": "shrimp_video", "filename": filename, "json": json_path})
+                result_cache.put(cache_key, results[-1], file_idem_key)
 
             else:
                 raise HTTPException(status_code=400, detail="ไม่รองรับไฟล์ประเภทนี้")
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"❗ Error processing {filename}: {e}")
+        finally:
+            # งานที่ claim แล้วไปไม่ถึง put (error / ถูกยกเลิก) -> ปล่อยให้ retry ที่รออยู่รันเองได้
+            if claimed:
+                result_cache.release(cache_key, file_idem_key)
 
     return {
         "status": "success",
@@ -585,6 +719,60 @@ async def process_files(files: List[UploadFile] = File(...)):
         "results": results
     }
 
+# ==========================
+# API: รอบสุ่มวัดขนาด (ยกยอหลายครั้ง) -> ผลรวมชุดเดียว
+# ==========================
+@app.post("/ponds/{pond_id}/size_session")
+async def process_size_session(pond_id: int, files: List[UploadFile] = File(...)):
+    """
+    ภาพถาดทุกภาพของรอบสุ่มวัดเดียวกัน -> inference เป็น batch เดียว แล้วรวมทุกตัว
+    ได้ค่าเฉลี่ย / CV / histogram ขนาด และแผนอาหารชุดเดียว (ดู process.size.analyze_sampling_session)
+    """
+    global last_seen_data
+    os.makedirs("input_raspi1", exist_ok=True)
+    now_str = now_bangkok().strftime("%Y%m%d_%H%M%S_%f")
+
+    contents, input_names = [], []
+    for i, file in enumerate(files, start=1):
+        ext = os.path.splitext(file.filename.lower())[-1]
+        if ext not in [".jpg", ".jpeg", ".png"]:
+            raise HTTPException(status_code=400, detail=f"ไม่รองรับไฟล์ประเภทนี้: {file.filename}")
+        content = await file.read()
+        input_name = f"shrimp_pond{pond_id}_{now_str}_{i}{ext}"
+        if PERSIST_INPUTS:
+            persist_in_background(os.path.join("input_raspi1", input_name), content)
+        contents.append(content)
+        input_names.append(input_name)
+
+    pond_number, total_larvae = get_latest_pond_info_for_pond(DATA_PONDS_DIR, pond_id)
+    try:
+        result = await run_analyzer(
+            "size",
+            contents,
+            entry="analyze_sampling_session",
+            total_larvae=total_larvae,
+            pond_number=pond_number,
+            original_names=input_names,
+            pond_id=pond_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"❗ Error processing size session: {e}")
+
+    json_path = save_json_result(
+        result_type="size",
+        original_name=f"size_session_pond{pond_id}_{now_str}",
+        result=result,
+        pond_number=pond_number,
+        total_larvae=total_larvae
+    )
+    with open(json_path, "r", encoding="utf-8") as f:
+        last_seen_data["size"] = json.load(f)
+
+    size_json = build_shrimp_size_json(pond_id)
+    _send_json_to(APP_SIZE_URL, size_json)
+
+    return {"status": "success", "json": json_path, "metrics": result.metrics}
+
 # ==========================
 # CONFIG เพิ่มเติมสำหรับไฟล์/ไดเรกทอรี และปลายทางส่ง JSON
 # ==========================
@@ -661,22 +849,9 @@ def _send_json_to(url: str, data: dict):
 
 
 def _extract_size_from_json(size_json: dict):
-    """ดึงค่า length_cm / weight_g จากฟิลด์ shrimp_size หรือจากข้อความ text_content"""
-    if "shrimp_size" in size_json:
-        sc = size_json["shrimp_size"]
-        return sc.get("length_cm"), sc.get("weight_avg_g")
-
-    txt = size_json.get("text_content") or ""
-    # Match pattern: "Shrimp 1: 0.33 cm / 0.00 g"
-    matches = re.findall(r"Shrimp\s+\d+:\s*([\d.]+)\s*cm\s*/\s*([\d.]+)\s*g", txt)
-    if matches:
-        lengths = [float(m[0]) for m in matches]
-        weights = [float(m[1]) for m in matches]
-        avg_length = sum(lengths) / len(lengths)
-        avg_weight = sum(weights) / len(weights)
-        return avg_length, avg_weight
-
-    return None, None
+    """ดึงค่า length_cm / weight_g จากฟิลด์ shrimp_size (ค่าจาก metrics ของ analyzer)"""
+    sc = size_json.get("shrimp_size") or {}
+    return sc.get("length_cm"), sc.get("weight_avg_g")
 
 
 # ==========================
@@ -787,13 +962,14 @@ def build_shrimp_size_json(pond_id: int) -> dict:
 
     video_url = None
     if din_d:
-        video_url = din_d.get("output_video")
+        # วิดีโอ (full / preview) หรือภาพ (keyframes / fast engine) แล้วแต่ output mode ที่ใช้
+        video_url = din_d.get("output_video") or _pick_url_maybe_list(din_d.get("output_image"))
     
     data = {
         "pondId": pond_id,
         "timestamp": format_timestamp(),
-        "Size_CM": round(length_cm,2),   # ปัดทศนิยม 2 ตำแหน่ง
-        "Size_gram": round(weight_g,2),  # ปัดทศนิยม 1 ตำแหน่ง
+        "Size_CM": round(length_cm or 0,2),   # ปัดทศนิยม 2 ตำแหน่ง
+        "Size_gram": round(weight_g or 0,2),  # ปัดทศนิยม 1 ตำแหน่ง
         "SizePic": size_image,
         "PicFood": raw_image or size_image,
         "PicKungDin": video_url,
@@ -908,6 +1084,39 @@ def get_size(pond_id: int):
     return {"error": "no shrimp_size.json yet"}
 
 
+# ==========================
+# ENDPOINTS: ROI ของถาดต่อบ่อ (ดู utils/roi.py)
+# ==========================
+@app.get("/ponds/{pond_id}/roi")
+def get_roi(pond_id: int):
+    return {"mode": roi_mode(), "roi": roi_store.all(pond_id)}
+
+
+@app.post("/ponds/{pond_id}/roi")
+async def set_roi(pond_id: int, request: Request):
+    """
+    ตั้ง ROI แบบ manual: {"kind": "size" | "din", "box": [x1, y1, x2, y2]}
+    box เป็นสัดส่วน 0-1 ของภาพ (เช่น [0.1, 0.05, 0.9, 0.95])
+    """
+    data = await request.json()
+    kind, box = data.get("kind"), data.get("box")
+    if kind not in ROI_KINDS or not isinstance(box, list) or len(box) != 4:
+        raise HTTPException(status_code=400, detail=f"ต้องมี kind ({', '.join(ROI_KINDS)}) และ box [x1, y1, x2, y2]")
+    try:
+        entry = roi_store.set(kind, pond_id, box, source="manual")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "kind": kind, "roi": entry}
+
+
+@app.delete("/ponds/{pond_id}/roi")
+def delete_roi(pond_id: int, kind: str):
+    """ลบ ROI (ROI_MODE=auto จะหาขอบถาดใหม่จากภาพถัดไป)"""
+    if kind not in ROI_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind ต้องเป็น {', '.join(ROI_KINDS)}")
+    return {"status": "success", "removed": roi_store.clear(kind, pond_id)}
+
+
 # ==========================
 # ENDPOINTS: list / view / json (utility)
 # ==========================
@@ -1010,6 +1219,63 @@ def health_check():
     return {"status": "ok"}
 
 
+# ==========================
+# MODEL REGISTRY: สถานะ / สลับเวอร์ชันโมเดล
+# ==========================
+# รายชื่อโมเดลที่จะโหลดล่วงหน้าตอน startup เช่น "size,shrimp" (ค่าว่าง = โหลดตอนใช้งานจริง)
+MODEL_PRELOAD = [k.strip() for k in os.environ.get("MODEL_PRELOAD", "").split(",") if k.strip()]
+
+
+@app.get("/models")
+def get_models_status():
+    status = registry.status()
+    for model_key in status:
+        if worker_count(model_key) > 0:
+            status[model_key] = worker_pools.status(model_key)
+    return status
+
+
+@app.get("/metrics")
+def get_metrics():
+    """metrics ภายใน process เช่น histogram ขนาด batch ของแต่ละโมเดล, result cache hit / miss, scene gate hit rate"""
+    return {**metrics.snapshot(), "result_cache": result_cache.stats(), "scene_gate": scene_gate.stats()}
+
+
+@app.post("/models/{model_key}/reload")
+async def reload_model(model_key: str, request: Request):
+    """
+    สลับโมเดลเป็นไฟล์ .pt ใหม่โดยไม่ต้อง restart
+    body (optional): {"path": "/data/Model/shrimp_v2.pt"}  ถ้าไม่ส่ง path จะโหลดไฟล์เดิมซ้ำ
+                     (ต้องอยู่ใน MODEL_DIR, ส่งแค่ชื่อไฟล์ได้ เช่น {"path": "shrimp_v2.pt"})
+                     {"backend": "onnx"}  สลับ backend (torch / onnx / openvino) ของไฟล์ตาม config
+    """
+    path, backend = None, None
+    try:
+        body = await request.json()
+        path = (body or {}).get("path")
+        backend = (body or {}).get("backend")
+    except Exception:
+        pass
+    if path:
+        try:
+            path = resolve_allowed_model_path(path)
+        except PermissionError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+
+    # ถ้าโมเดลนี้รันใน worker process ต้องสลับที่ worker (process หลักไม่ได้ถือโมเดลไว้)
+    target = worker_pools if worker_count(model_key) > 0 else registry
+    try:
+        info = await asyncio.to_thread(target.reload, model_key, path, backend)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        # โหลด / warmup โมเดลใหม่ไม่ได้ -> โมเดลเดิมยังใช้งานอยู่
+        raise HTTPException(status_code=500, detail=f"❗ Error reloading {model_key}: {e}")
+    return {"status": "success", "model": info}
+
+
 # ==========================
 # BACKGROUND LOOP
 # ==========================
@@ -1128,6 +1394,20 @@ async def startup_event():
     pond_id = 1
     asyncio.create_task(loop_build_and_push(pond_id))
 
+    # โหลดโมเดลล่วงหน้า (ใน worker process หรือ thread แยก) โดยไม่บล็อก startup
+    pool_keys = [k for k in MODEL_PRELOAD if worker_count(k) > 0]
+    local_keys = [k for k in MODEL_PRELOAD if worker_count(k) <= 0]
+    if pool_keys:
+        worker_pools.preload(pool_keys)
+    if local_keys:
+        asyncio.create_task(asyncio.to_thread(registry.preload, local_keys))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    worker_pools.shutdown()
+    result_cache.flush()
+
 # ==========================
 # ENTRYPOINT
 # ==========================
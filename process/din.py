@@ -1,105 +1,266 @@
 import os
-import torch
-from ultralytics import YOLO
-from deep_sort_realtime.deepsort_tracker import DeepSort
+import time
 import numpy as np
 import imageio.v2 as imageio
 import cv2
-from torchvision.ops import nms
 
-# โหลดโมเดลกุ้งดิ้นจากโฟลเดอร์ Model/
-model_path = os.environ.get("MODEL_DIN", os.path.join("Model", "din.pt"))
-model = YOLO(model_path)
+from process.din_output import artifact_path, make_sink, resolve_output_mode
+from process.results import AnalysisResult
+from process.trackers import make_tracker, tracker_name
+from utils.env import env_number
+from utils.model_registry import get_model, inference_imgsz
+from utils.roi import roi_for, roi_mode, to_pixels
+from utils.video_writer import describe
 
-tracker = DeepSort(max_age=30, n_init=3, max_cosine_distance=0.3)
+# โมเดลกุ้งดิ้นถูกโหลดแบบ lazy ผ่าน utils.model_registry (key = "din")
+# tracker สร้างใหม่ทุกครั้งที่วิเคราะห์วิดีโอ ผ่าน TrackingSession (engine เลือกได้ ดู process/trackers.py)
 
 # --------------------------
 # PARAMS
 # --------------------------
-NO_MOVE_THRESHOLD = 2.5   # ใช้แบบเวอร์ชันที่สอง
-shrimp_moved_once = set()
-movement_status = {}
+NO_MOVE_THRESHOLD = 2.5   # ใช้แบบเวอร์ชันที่สอง (pixel ต่อ 1 เฟรมที่ fps เต็ม)
 CONFIDENCE_THRESHOLD = 0.85
+HEALTHY_MOVED_PERCENT = 70
+NMS_IOU_THRESHOLD = 0.5   # ให้ NMS ของ ultralytics ทำที่ 0.5 แบบ class-agnostic (เดิมรัน torchvision nms ซ้ำอีกรอบ)
 
+# --------------------------
+# FRAME SAMPLING / MOTION GATE
+# --------------------------
+# DIN_FRAME_STRIDE      รัน detect ทุกๆ N เฟรม (default 1 = ทุกเฟรม)
+# DIN_TARGET_FPS        หรือกำหนดเป็น fps ที่ต้องการ detect (คำนวณ stride จาก fps ของวิดีโอ)
+# DIN_MOTION_THRESHOLD  สัดส่วน pixel ที่เปลี่ยน (0-1) ต่ำกว่านี้ถือว่าเฟรมนิ่ง ข้าม detect (default 0 = ปิด)
+# DIN_MOTION_MAX_SKIP   ข้ามติดกันได้ไม่เกินกี่เฟรม กัน tracker ขาดข้อมูลนานเกินไป (default = 1 วินาที)
+# DIN_BATCH_SIZE        จำนวนเฟรมที่ส่งเข้า model.predict ต่อครั้ง (default 8)
 
-def analyze_video(input_path, original_name: str = None):
-    if not os.path.exists(input_path):
-        print(f"❌ ไม่พบวิดีโอ: {input_path}")
-        return
+# --------------------------
+# EARLY TERMINATION
+# --------------------------
+# DIN_TIME_BUDGET       เวลาประมวลผลสูงสุดต่อคลิป (วินาที wall-clock, default 0 = ไม่จำกัด)
+# DIN_CONVERGE_SECONDS  หยุดเมื่อจำนวน track และจำนวนที่เคยขยับไม่เปลี่ยนเลยนาน N วินาทีของคลิป (default 0 = ปิด)
+# DIN_STOP_ALL_MOVED    1 = หยุดทันทีเมื่อทุก track ที่ confirmed เคยขยับแล้ว (ผลไม่มีทางเปลี่ยน) (default 0)
+# DIN_MIN_SECONDS       ต้องวิเคราะห์อย่างน้อยกี่วินาทีของคลิปก่อนใช้กฎหยุด (default 3)
+MOTION_PIXEL_DELTA = 15   # ค่าความต่างของ gray (0-255) ที่ถือว่า pixel นั้น "เปลี่ยน"
+MOTION_FRAME_WIDTH = 160  # ย่อเฟรมก่อนเทียบ motion
+MAX_CHUNK_BATCHES = 4     # อ่านเฟรมล่วงหน้าได้ไม่เกิน batch_size x 4 เฟรม
 
-    # ===============================
-    # ใช้ path ของ Railway (/data)
-    # ===============================
-    output_dir = os.environ.get("OUTPUT_DIN", "/data/local_storage/din")
-    os.makedirs(output_dir, exist_ok=True)
 
-    base_name = os.path.splitext(original_name or os.path.basename(input_path))[0]
-    output_video_path = os.path.join(output_dir, f"{base_name}.mp4")
-    output_txt_path = os.path.join(output_dir, f"{base_name}.txt")
+def _effective_stride(fps: float, frame_stride: int = None, target_fps: float = None) -> int:
+    frame_stride = frame_stride or env_number("DIN_FRAME_STRIDE", None, int)
+    target_fps = target_fps or env_number("DIN_TARGET_FPS", None, float)
+    if frame_stride:
+        return max(1, int(frame_stride))
+    if target_fps and fps:
+        return max(1, int(round(fps / target_fps)))
+    return 1
+
+
+def _motion_frame(frame: np.ndarray) -> np.ndarray:
+    h, w = frame.shape[:2]
+    small = cv2.resize(frame, (MOTION_FRAME_WIDTH, max(1, h * MOTION_FRAME_WIDTH // w)),
+                       interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+
+def _changed_fraction(gray: np.ndarray, ref: np.ndarray) -> float:
+    return float(np.count_nonzero(cv2.absdiff(gray, ref) > MOTION_PIXEL_DELTA)) / gray.size
+
+
+class FrameSampler:
+    """ตัดสินว่าเฟรมไหนต้อง detect: ตาม stride แล้วกรองเฟรมนิ่งด้วย motion gate"""
+
+    def __init__(self, stride: int = 1, motion_threshold: float = 0.0, max_skip: int = 25):
+        self.stride = stride
+        self.motion_threshold = motion_threshold
+        self.max_skip = max_skip
+        self._last_gray = None
+        self._last_idx = None
+
+    def __call__(self, frame_idx: int, frame: np.ndarray) -> bool:
+        if frame_idx % self.stride != 0:
+            return False
+        if self.motion_threshold > 0:
+            gray = _motion_frame(frame)
+            if (self._last_gray is not None and frame_idx - self._last_idx < self.max_skip
+                    and _changed_fraction(gray, self._last_gray) < self.motion_threshold):
+                return False
+            self._last_gray = gray
+        self._last_idx = frame_idx
+        return True
+
+
+class EarlyStop:
+    """ตัดสินว่าหยุดวิเคราะห์คลิปได้หรือยัง (time budget / ผลนิ่งแล้ว / ทุกตัวขยับแล้ว)"""
+
+    def __init__(self, fps: float, time_budget: float = 0, converge_seconds: float = 0,
+                 stop_all_moved: bool = False, min_seconds: float = 3):
+        self.fps = fps or 25
+        self.time_budget = time_budget
+        self.converge_seconds = converge_seconds
+        self.stop_all_moved = stop_all_moved
+        self.min_seconds = min_seconds
+        self._started = time.monotonic()
+        self._signature = None
+        self._since_idx = 0
+
+    def check(self, frame_idx: int, session: "TrackingSession"):
+        """คืนค่าเหตุผลที่หยุด (str) หรือ None ถ้ายังต้องวิเคราะห์ต่อ"""
+        if self.time_budget and time.monotonic() - self._started >= self.time_budget:
+            return f"time budget {self.time_budget:g}s"
+
+        signature = (len(session.prev_positions), len(session.moved_once))
+        if signature != self._signature:
+            self._signature, self._since_idx = signature, frame_idx
+
+        if frame_idx / self.fps < self.min_seconds:
+            return None
+        total, moved = signature
+        if self.stop_all_moved and total > 0 and moved == total:
+            return "ทุกตัวเคยขยับแล้ว"
+        if self.converge_seconds and (frame_idx - self._since_idx) / self.fps >= self.converge_seconds:
+            return f"ผลไม่เปลี่ยน {self.converge_seconds:g}s"
+        return None
+
+
+# --------------------------
+# DECODE / DETECT
+# --------------------------
+def _open_video(input_path):
+    """
+    เปิดวิดีโอเป็น generator ของเฟรม BGR -> (frames, fps, (width, height)) หรือ None
+    ใช้ OpenCV ก่อน (ได้ BGR ตรงๆ ไม่ต้องแปลงสี) ถ้าเปิดไม่ได้ค่อยใช้ imageio (RGB -> แปลงครั้งเดียว)
+    """
+    cap = cv2.VideoCapture(input_path)
+    if cap.isOpened():
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+        def frame_generator_cv2():
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield frame
+            finally:
+                cap.release()
+
+        return frame_generator_cv2(), fps, size
+    cap.release()
 
-    # ------------------------------
-    # เปิด video
-    # ------------------------------
     try:
         reader = imageio.get_reader(input_path)
         meta = reader.get_meta_data()
-        fps = meta.get("fps", 25)
-        size = meta.get("size", None)
     except Exception as e:
         print(f"⚠️ imageio เปิดไม่ได้: {e}")
-        reader, fps, size = None, None, None
+        return None
 
-    if size is None:
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
-            print("❌ ทั้ง imageio และ OpenCV ไม่สามารถเปิดวิดีโอได้")
-            return
+    def frame_generator_imageio():
+        try:
+            for frame in reader:
+                yield cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        finally:
+            reader.close()
 
-        fps = cap.get(cv2.CAP_PROP_FPS) or 25
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        size = (width, height)
+    return frame_generator_imageio(), meta.get("fps", 25), meta.get("size")
 
-        def frame_generator_cv2(path):
-            cap = cv2.VideoCapture(path)
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            cap.release()
 
-        reader = frame_generator_cv2(input_path)
+def _clip_frame_count(input_path: str) -> int:
+    cap = cv2.VideoCapture(input_path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if cap.isOpened() else 0
+    cap.release()
+    return max(0, count)
 
-    width, height = size
-    writer = imageio.get_writer(output_video_path, fps=fps)
-    prev_positions = {}
 
-    # ------------------------------
-    # วน loop frame
-    # ------------------------------
-    for frame in reader:
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+def _video_roi(input_path: str, pond_id=None):
+    """ROI ของบ่อ (utils/roi.py) เป็น pixel (x1, y1, x2, y2) ของเฟรม หรือ None = ใช้เฟรมเต็ม"""
+    if pond_id is None or roi_mode() == "off":
+        return None
+    cap = cv2.VideoCapture(input_path)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        return None
+    box = roi_for("din", pond_id, frame)
+    return to_pixels(box, frame.shape[1], frame.shape[0]) if box is not None else None
+
+
+def detect_frames(model, frames: list, roi=None) -> list:
+    """
+    detect หลายเฟรม (BGR) ใน model.predict ครั้งเดียว
+    คืนค่า list ของ (boxes xyxy (N, 4), scores (N,)) เป็น numpy ตามลำดับเฟรม
+    roi = (x1, y1, x2, y2) pixel -> detect เฉพาะในกรอบ แล้วเลื่อน box กลับเป็นพิกัดเฟรมเต็ม
+    """
+    if not frames:
+        return []
+    if roi is not None:
+        x1, y1, x2, y2 = roi
+        frames = [frame[y1:y2, x1:x2] for frame in frames]
+    results = model.predict(
+        frames,
+        conf=CONFIDENCE_THRESHOLD,
+        iou=NMS_IOU_THRESHOLD,
+        agnostic_nms=True,
+        imgsz=inference_imgsz("din"),
+        verbose=False,
+    )
+    detections = [(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy()) for r in results]
+    if roi is not None:
+        offset = np.array([roi[0], roi[1], roi[0], roi[1]], dtype=np.float32)
+        detections = [(boxes + offset, scores) for boxes, scores in detections]
+    return detections
+
 
-        results = model.predict(source=frame, conf=CONFIDENCE_THRESHOLD, verbose=False)
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        scores = results[0].boxes.conf.cpu().numpy()
+def _detected_frames(frames, model, sampler: FrameSampler, batch_size: int, start: int = 0, roi=None):
+    """
+    อ่านเฟรมล่วงหน้าจนได้ batch_size เฟรมที่ต้อง detect แล้ว predict รวดเดียว
+    yield (frame_idx, frame, detections หรือ None ถ้าเฟรมนั้นข้าม) ตามลำดับเฟรมเดิม
+    start = index ของเฟรมแรก (ใช้ตอนวิเคราะห์เป็นช่วงๆ ให้ index ตรงกับทั้งคลิป)
+    roi   = กรอบ pixel ที่ detect (ดู detect_frames)
+    """
+    max_chunk = batch_size * MAX_CHUNK_BATCHES  # จำกัดจำนวนเฟรมที่ค้างในหน่วยความจำตอน motion gate ข้ามยาวๆ
+    chunk = []
 
-        # 🔹 NMS
-        if len(boxes) > 0:
-            boxes_tensor = torch.tensor(boxes, dtype=torch.float32)
-            scores_tensor = torch.tensor(scores, dtype=torch.float32)
-            keep = nms(boxes_tensor, scores_tensor, iou_threshold=0.5)
-            boxes = boxes[keep.numpy()]
-            scores = scores[keep.numpy()]
+    def flush():
+        to_detect = [frame for _, frame, detect in chunk if detect]
+        detections = iter(detect_frames(model, to_detect, roi))
+        for frame_idx, frame, detect in chunk:
+            yield frame_idx, frame, next(detections) if detect else None
 
+    n_detect = 0
+    for frame_idx, frame in enumerate(frames, start):
+        detect = sampler(frame_idx, frame)
+        chunk.append((frame_idx, frame, detect))
+        n_detect += detect
+        if n_detect >= batch_size or len(chunk) >= max_chunk:
+            yield from flush()
+            chunk, n_detect = [], 0
+    yield from flush()
+
+
+class TrackingSession:
+    """
+    สถานะของการวิเคราะห์วิดีโอ 1 คลิป: tracker, ตำแหน่ง / trajectory และสถานะขยับของแต่ละ track
+    สร้างใหม่ทุกครั้งที่เรียก analyze_video -> track id / สถานะ "เคยขยับ" ไม่ปนข้ามวิดีโอ
+    วิเคราะห์หลายวิดีโอพร้อมกันได้ และหน่วยความจำถูกคืนเมื่อวิเคราะห์จบ
+    """
+
+    def __init__(self, tracker=None):
+        self.tracker = tracker if tracker is not None else make_tracker()
+        self.prev_positions = {}   # track_id -> (cx, cy, frame_idx)
+        self.trajectories = {}     # track_id -> [(frame_idx, cx, cy), ...]
+        self.records = []          # (track_id, frame_idx, x1, y1, x2, y2, conf) ทุกจุด -> process/din_tracks.py
+        self.moved_once = set()
+        self.movement_status = {}
+
+    def update(self, frame_idx: int, frame: np.ndarray, boxes: np.ndarray, scores: np.ndarray) -> list:
+        """ป้อน detection ของเฟรมหนึ่ง คืนค่า list ของ (x1, y1, x2, y2, label, color) สำหรับวาด"""
         # DeepSort input
         detections = [([x1, y1, x2 - x1, y2 - y1], score, None)
-                      for (x1, y1, x2, y2), score in zip(boxes, scores)
-                      if score >= CONFIDENCE_THRESHOLD]
+                      for (x1, y1, x2, y2), score in zip(boxes, scores)]
 
-        tracks = tracker.update_tracks(detections, frame=frame)
+        tracks = self.tracker.update_tracks(detections, frame=frame)
 
+        drawn = []
         for track in tracks:
             if not track.is_confirmed():
                 continue
@@ -107,57 +268,285 @@ def analyze_video(input_path, original_name: str = None):
             x1, y1, x2, y2 = map(int, track.to_ltrb())
             cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
 
-            if track_id in prev_positions:
-                dx, dy = cx - prev_positions[track_id][0], cy - prev_positions[track_id][1]
+            if track_id in self.prev_positions:
+                px, py, prev_idx = self.prev_positions[track_id]
+                dx, dy = cx - px, cy - py
                 dist = np.sqrt(dx ** 2 + dy ** 2)
+                # เทียบเป็นระยะต่อ 1 เฟรมของ fps เต็ม (ข้ามมา k เฟรม -> threshold x k)
+                move_threshold = NO_MOVE_THRESHOLD * max(1, frame_idx - prev_idx)
 
                 # 🔹 Logic เวอร์ชันสอง
-                if track_id in shrimp_moved_once:
-                    movement_status[track_id] = "good"
+                if track_id in self.moved_once:
+                    self.movement_status[track_id] = "good"
                     color = (0, 255, 0)
                 else:
-                    if dist > NO_MOVE_THRESHOLD:
-                        shrimp_moved_once.add(track_id)
-                        movement_status[track_id] = "good"
+                    if dist > move_threshold:
+                        self.moved_once.add(track_id)
+                        self.movement_status[track_id] = "good"
                         color = (0, 255, 0)
                     else:
-                        movement_status[track_id] = "sick"
+                        self.movement_status[track_id] = "sick"
                         color = (0, 0, 255)
             else:
-                movement_status[track_id] = "sick"
+                self.movement_status[track_id] = "sick"
                 color = (0, 0, 255)
 
-            prev_positions[track_id] = (cx, cy)
-            label = f"id_{track_id} ({movement_status.get(track_id, 'None')})"
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, label, (x1, y1 - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            self.prev_positions[track_id] = (cx, cy, frame_idx)
+            self.trajectories.setdefault(track_id, []).append((frame_idx, cx, cy))
+            conf = getattr(track, "det_conf", None)
+            self.records.append((int(track_id), frame_idx, x1, y1, x2, y2, np.nan if conf is None else conf))
+            label = f"id_{track_id} ({self.movement_status.get(track_id, 'None')})"
+            drawn.append((x1, y1, x2, y2, label, color))
+        return drawn
+
+    def summary(self) -> dict:
+        summary = make_summary(len(self.prev_positions), len(self.moved_once))
+        summary["status"] = {tid: self.movement_status.get(tid, "รอข้อมูล") for tid in sorted(self.prev_positions)}
+        return summary
+
+
+def make_summary(total: int, moved: int, healthy_percent: float = HEALTHY_MOVED_PERCENT) -> dict:
+    """สรุป total / moved / % / สถานะรวม (ใช้ร่วมกันทุก engine)"""
+    moved_percent = (moved / total) * 100 if total > 0 else 0
+    return {
+        "total": total,
+        "moved": moved,
+        "moved_percent": moved_percent,
+        "overall_status": "✅ สุขภาพดี" if moved_percent >= healthy_percent else "❌ มีตัวไม่ขยับเยอะ",
+    }
+
+
+def summary_lines(summary: dict, notes: list = ()) -> list:
+    """ข้อความสรุปของ din (รูปแบบ txt เดิม)"""
+    return [
+        f"🦐 จำนวนกุ้งทั้งหมด: {summary['total']} ตัว",
+        f"✅ เคยขยับ: {summary['moved']} ตัว ({summary['moved_percent']:.2f}%)",
+        f"📊 สถานะรวม: {summary['overall_status']}",
+        *notes,
+        "",
+        *[f"id_{tid}: {status}" for tid, status in summary.get("status", {}).items()],
+    ]
+
+
+def write_summary(output_txt_path: str, summary: dict, notes: list = ()):
+    with open(output_txt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(summary_lines(summary, notes)) + "\n")
+
+
+def make_result(summary: dict, notes: list = (), artifact: str = None) -> AnalysisResult:
+    """AnalysisResult ของ din (ใช้ร่วมกันทุก engine) artifact .mp4 = video นอกนั้น (contact sheet / ภาพสรุป) = image"""
+    metrics = {
+        "total": int(summary["total"]),
+        "moved": int(summary["moved"]),
+        "moved_percent": float(summary["moved_percent"]),
+        "overall_status": summary["overall_status"],
+        "healthy": summary["moved_percent"] >= HEALTHY_MOVED_PERCENT,
+    }
+    detections = [{"track_id": tid, "status": status} for tid, status in summary.get("status", {}).items()]
+    is_video = bool(artifact) and artifact.lower().endswith(".mp4")
+    return AnalysisResult("din", metrics, detections, summary_lines(summary, notes),
+                          image=None if is_video else artifact, video=artifact if is_video else None)
+
+
+def output_paths(input_path: str, original_name: str = None) -> tuple[str, str]:
+    """(โฟลเดอร์ผลลัพธ์, ชื่อไฟล์ผลลัพธ์ไม่มีนามสกุล)"""
+    # ===============================
+    # ใช้ path ของ Railway (/data)
+    # ===============================
+    output_dir = os.environ.get("OUTPUT_DIN", "/data/local_storage/din")
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(original_name or os.path.basename(input_path))[0]
+    return output_dir, base_name
+
+
+def _draw(frame, drawn, roi=None):
+    if roi is not None:
+        cv2.rectangle(frame, (roi[0], roi[1]), (roi[2] - 1, roi[3] - 1), (200, 200, 200), 1)
+    for x1, y1, x2, y2, label, color in drawn:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+
+def _is_borderline(summary: dict) -> bool:
+    margin = env_number("DIN_FAST_MARGIN", 15.0, float)
+    return summary["total"] == 0 or abs(summary["moved_percent"] - HEALTHY_MOVED_PERCENT) <= margin
+
+
+def analyze_video(input_path, original_name: str = None, engine: str = None, output_mode: str = None,
+                  pond_id=None, **options):
+    """
+    เลือก engine ของการวิเคราะห์กุ้งดิ้น (ENV DIN_ENGINE หรือพารามิเตอร์ engine):
+        yolo : YOLO + tracker + วิดีโอ annotate เต็ม (default, ดู analyze_video_full)
+        fast : background subtraction + connected components (process/din_fast.py) ได้แค่ภาพสรุป + txt
+        auto : รัน fast ก่อน ถ้าผลก้ำกึ่งเกณฑ์ 70% (± DIN_FAST_MARGIN) หรือหาตัวไม่เจอ ค่อยรัน yolo
+    output_mode : none / keyframes / preview / full (ดู process/din_output.py)
+    pond_id     : ใช้ ROI ของบ่อนี้ (ดู utils/roi.py) ทั้ง 2 engine วิเคราะห์เฉพาะในกรอบ
+    คืนค่า AnalysisResult (ดู make_result) หรือ None ถ้าเปิดวิดีโอไม่ได้  options อื่นส่งต่อให้ analyze_video_full
+    """
+    engine = (engine or os.environ.get("DIN_ENGINE") or "yolo").lower()
+    if engine not in ("yolo", "fast", "auto"):
+        raise ValueError(f"❌ Unknown din engine: {engine}")
+
+    roi = _video_roi(input_path, pond_id) if os.path.exists(input_path) else None
+    if engine != "yolo":
+        from process.din_fast import analyze_video_fast, screen_video
+
+        summary = screen_video(input_path, roi)
+        if summary is not None and (engine == "fast" or not _is_borderline(summary)):
+            return analyze_video_fast(input_path, original_name, summary, roi, output_mode=output_mode)
+        if engine == "fast":
+            print(f"❌ fast engine เปิดวิดีโอไม่ได้: {input_path}")
+            return
+        if summary is not None:
+            print(f"🔁 fast engine ก้ำกึ่ง ({summary['moved_percent']:.1f}%), รัน YOLO เต็ม")
+
+    return analyze_video_full(input_path, original_name, output_mode=output_mode, roi=roi, **options)
 
-        writer.append_data(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
 
-    if hasattr(reader, "close"):
+def analyze_video_full(input_path, original_name: str = None, frame_stride: int = None,
+                       target_fps: float = None, motion_threshold: float = None, tracker: str = None,
+                       time_budget: float = None, converge_seconds: float = None, stop_all_moved: bool = None,
+                       segments: int = None, pipeline: bool = None, output_mode: str = None, roi=None):
+    """
+    frame_stride / target_fps : detect เฉพาะบางเฟรม (เฟรมที่ข้ามจะวาด track ล่าสุดต่อไป)
+    motion_threshold          : ข้าม detect ถ้าเฟรมแทบไม่ต่างจากเฟรมที่ detect ล่าสุด
+    tracker                   : engine ของ tracker ("deepsort" / "sort", default = ENV DIN_TRACKER)
+    time_budget / converge_seconds / stop_all_moved : หยุดก่อนจบคลิป (ดู EarlyStop) วิดีโอผลลัพธ์จะยาวเท่าที่วิเคราะห์
+    segments                  : แบ่งคลิปยาวเป็นหลายช่วงแล้ววิเคราะห์ขนานกัน (ดู process/din_segments.py)
+    pipeline                  : decode / encode ใน process แยกผ่าน shared memory (ดู process/din_pipeline.py)
+    output_mode               : none / keyframes / preview / full (ดู process/din_output.py)
+    roi                       : (x1, y1, x2, y2) pixel ที่ detect (ROI ของบ่อ) None = เฟรมเต็ม
+    ระยะขยับถูกเทียบกับ NO_MOVE_THRESHOLD x จำนวนเฟรมที่ห่างกัน ผลจึงเทียบกับการรันทุกเฟรมได้
+    """
+    if not os.path.exists(input_path):
+        print(f"❌ ไม่พบวิดีโอ: {input_path}")
+        return
+
+    from process.din_segments import analyze_video_segmented, segment_count
+
+    mode = resolve_output_mode(output_mode)
+    n_segments = segment_count(input_path, segments)
+    if n_segments > 1:
+        return analyze_video_segmented(input_path, original_name, n_segments, frame_stride=frame_stride,
+                                       target_fps=target_fps, motion_threshold=motion_threshold, tracker=tracker,
+                                       output_mode=mode, roi=roi)
+
+    output_dir, base_name = output_paths(input_path, original_name)
+    output_path = artifact_path(mode, output_dir, base_name)
+
+    # ------------------------------
+    # เปิด video
+    # ------------------------------
+    opened = _open_video(input_path)
+    if opened is None:
+        print("❌ ทั้ง imageio และ OpenCV ไม่สามารถเปิดวิดีโอได้")
+        return
+    frames, fps, size = opened
+
+    model = get_model("din")
+    tracker = tracker_name(tracker)
+    session = TrackingSession(make_tracker(tracker))
+
+    stride = _effective_stride(fps, frame_stride, target_fps)
+    if motion_threshold is None:
+        motion_threshold = env_number("DIN_MOTION_THRESHOLD", 0.0, float)
+    sampler = FrameSampler(
+        stride=stride,
+        motion_threshold=motion_threshold,
+        max_skip=env_number("DIN_MOTION_MAX_SKIP", max(1, int(round(fps or 25))), int),
+    )
+    batch_size = max(1, env_number("DIN_BATCH_SIZE", 8, int))
+    clip_frames = _clip_frame_count(input_path)
+
+    if pipeline is None:
+        pipeline = os.environ.get("DIN_PIPELINE", "0") == "1"
+    if pipeline:
+        from process.din_pipeline import FramePipeline
+
+        frames.close()
+        slots = batch_size * MAX_CHUNK_BATCHES + env_number("DIN_PIPELINE_SLOTS", 8, int)
+        pipe = FramePipeline(input_path, output_path if mode == "full" else None, fps, size, slots)
+        frames = pipe.frames()
+
+    early_stop = EarlyStop(
+        fps,
+        time_budget=time_budget if time_budget is not None else env_number("DIN_TIME_BUDGET", 0.0, float),
+        converge_seconds=(converge_seconds if converge_seconds is not None
+                          else env_number("DIN_CONVERGE_SECONDS", 0.0, float)),
+        stop_all_moved=(stop_all_moved if stop_all_moved is not None
+                        else os.environ.get("DIN_STOP_ALL_MOVED", "0") == "1"),
+        min_seconds=env_number("DIN_MIN_SECONDS", 3.0, float),
+    )
+    stop_reason = None
+    drawn = []  # (x1, y1, x2, y2, label, color) ของ track ล่าสุด ใช้วาดต่อบนเฟรมที่ข้าม
+    frames_total = frames_detected = 0
+
+    # ------------------------------
+    # วน loop frame
+    # ------------------------------
+    notes = []
+    sink = encode_stats = t = None
+    try:
+        # full + pipeline: encoder ของ pipeline เป็นคนเขียนวิดีโอ ไม่ต้องมี sink
+        sink = None if pipeline and mode == "full" else make_sink(mode, output_path, fps, clip_frames)
+        for frame_idx, frame, detection in _detected_frames(frames, model, sampler, batch_size, roi=roi):
+            frames_total += 1
+
+            if detection is not None:
+                frames_detected += 1
+                boxes, scores = detection
+                drawn = session.update(frame_idx, frame, boxes, scores)
+                stop_reason = early_stop.check(frame_idx, session)
+
+            if sink is None or sink.wants(frame_idx):
+                _draw(frame, drawn, roi)
+                if sink is not None:
+                    sink.write(frame_idx, frame)
+            if pipeline:
+                pipe.write(frame)  # ส่งต่อให้ encoder หรือคืน slot ให้ decoder
+            if stop_reason:
+                print(f"⏹️ หยุดที่เฟรม {frame_idx + 1}: {stop_reason}")
+                break
+    finally:
+        # ปิดทุกอย่างแม้ loop จะ error: ffmpeg / decoder / encoder process และ shared memory ต้องไม่ค้างใน server
         try:
-            reader.close()
-        except Exception:
-            pass
-    writer.close()
+            frames.close()
+            if sink is not None:
+                output_path = sink.close()
+                encode_stats = getattr(sink, "stats", None)
+        finally:
+            if pipeline:
+                t = pipe.close()
+    if pipeline:
+        encode_stats = encode_stats or t.get("encode_stats")
+        notes.append(f"⏲️ decode {t['decode']:.1f}s | infer {t['infer']:.1f}s | encode {t['encode']:.1f}s "
+                     f"| รวม {t['wall']:.1f}s")
+    if encode_stats:
+        notes.append(describe(encode_stats))
 
     # ------------------------------
     # Summary
     # ------------------------------
-    total = len(prev_positions)
-    moved = len(shrimp_moved_once)
-    moved_percent = (moved / total) * 100 if total > 0 else 0
-    overall_status = "✅ สุขภาพดี" if moved_percent >= 70 else "❌ มีตัวไม่ขยับเยอะ"
+    clip_frames = max(clip_frames, frames_total)
+    coverage = f"⏱️ วิเคราะห์ {frames_total / fps:.1f}/{clip_frames / fps:.1f} วินาทีของคลิป"
+    coverage += f" ({frames_total / clip_frames * 100:.0f}%)" if clip_frames else ""
+    coverage += f" หยุดก่อนจบ: {stop_reason}" if stop_reason else ""
 
-    with open(output_txt_path, "w", encoding="utf-8") as f:
-        f.write(f"🦐 จำนวนกุ้งทั้งหมด: {total} ตัว\n")
-        f.write(f"✅ เคยขยับ: {moved} ตัว ({moved_percent:.2f}%)\n")
-        f.write(f"📊 สถานะรวม: {overall_status}\n\n")
-        for tid in sorted(prev_positions.keys()):
-            f.write(f"id_{tid}: {movement_status.get(tid, 'รอข้อมูล')}\n")
+    from process.din_tracks import save_enabled, save_tracks, tracks_path
 
-    print(f"✅ บันทึกวิดีโอที่: {output_video_path}")
-    print(f"📄 บันทึกผลข้อความที่: {output_txt_path}")
-    return output_video_path, output_txt_path
+    if save_enabled():
+        npz_path = save_tracks(tracks_path(output_dir, base_name), session.records, fps=fps, stride=stride,
+                               tracker=tracker, source=original_name or os.path.basename(input_path))
+        notes.append(f"💾 trajectory: {os.path.basename(npz_path)}")
+    result = make_result(session.summary(), [
+        f"🎞️ detect {frames_detected}/{frames_total} เฟรม (stride {stride}, tracker {tracker})",
+        coverage,
+        *notes,
+    ], output_path)
 
+    if output_path:
+        print(f"✅ บันทึกผลลัพธ์ ({mode}) ที่: {output_path}")
+    if result.save_text(os.path.join(output_dir, f"{base_name}.txt")):
+        print(f"📄 บันทึกผลข้อความที่: {result.text_path}")
+    return result
@@ -0,0 +1,196 @@
+"""
+Fast engine ของ din (กุ้งดิ้น): คัดกรองว่ากุ้งส่วนใหญ่ขยับหรือไม่ โดยไม่ใช้ YOLO / tracker
+1) เฟรมแรก (ย่อ + gray) -> Otsu threshold + connected components = ตัวกุ้งแต่ละตัว (นับ total, mask รายตัว)
+2) เฟรมถัดๆ ไป (sample ที่ DIN_FAST_FPS, เฟรมที่ข้ามแค่ grab ไม่ retrieve) เข้า background subtractor (MOG2)
+   ที่เริ่มจากเฟรมแรก -> สะสม mask ของ pixel ที่เคยเป็น foreground
+3) กุ้งตัวไหนมี pixel ที่เคยเป็น foreground "บนตัวของมันเอง" (mask ของ component ไม่ใช่ bbox)
+   >= DIN_FAST_MOVED_RATIO ของพื้นที่ตัว = "เคยขยับ" (ขยับ = ตำแหน่งเดิมของตัวกลายเป็นพื้นถาด)
+   ตัวอื่นที่ว่ายเข้ามาใน bbox ของตัวที่นิ่งจึงไม่ทำให้ตัวที่นิ่งถูกนับว่าขยับ (ยกเว้นทับตัวกันจริงๆ)
+ได้ summary ช่องเดียวกับ YOLO engine (total / moved / % / สถานะรวม) + ภาพสรุป 1 ภาพ
+
+ตั้งค่าผ่าน ENV:
+    DIN_FAST_FPS           fps ที่ sample มาเทียบ (default 5)
+    DIN_FAST_MOVED_RATIO   สัดส่วน pixel บนตัวที่เคยเป็น foreground เทียบพื้นที่ตัว ที่ถือว่าขยับ (default 0.3)
+    DIN_FAST_MIN_AREA      พื้นที่ขั้นต่ำของ 1 ตัว เป็นสัดส่วนของภาพ (default 0.00005)
+    DIN_FAST_MAX_AREA      พื้นที่สูงสุดของ 1 ตัว เป็นสัดส่วนของภาพ (default 0.02)
+    DIN_FAST_HISTORY       history ของ MOG2 (จำนวนเฟรมที่ sample, default 500 = ตัวที่นิ่งทั้งคลิปยังเป็นพื้นหลังเดิม)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+from process.din import _open_video, make_result, make_summary, output_paths
+from process.din_output import resolve_output_mode
+
+from utils.env import env_number
+
+FAST_WIDTH = 480          # ย่อเฟรมก่อนประมวลผล
+FAST_VAR_THRESHOLD = 32   # varThreshold ของ MOG2 (ระยะ Mahalanobis^2 ที่ถือว่า pixel ไม่ใช่พื้นหลัง)
+FAST_BBOX_PAD = 2         # ขยาย bbox ของแต่ละตัวตอนวาดภาพสรุป
+
+
+def _prep(frame: np.ndarray, roi=None) -> np.ndarray:
+    if roi is not None:
+        x1, y1, x2, y2 = roi
+        frame = frame[y1:y2, x1:x2]
+    h, w = frame.shape[:2]
+    if w > FAST_WIDTH:
+        frame = cv2.resize(frame, (FAST_WIDTH, max(1, h * FAST_WIDTH // w)), interpolation=cv2.INTER_AREA)
+    return cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+
+def _segment(gray: np.ndarray):
+    """
+    connected components ของตัวกุ้งในเฟรมอ้างอิง
+    -> (labels (H, W) int32: 0 = พื้นหลัง / ตัวที่ถูกกรองทิ้ง, i = ตัวที่ i, stats (N, 5) [x, y, w, h, area])
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # ตัวกุ้งคือฝั่งที่มีพื้นที่น้อยกว่า (ถาดเป็นพื้นหลังส่วนใหญ่)
+    if np.count_nonzero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    min_area = env_number("DIN_FAST_MIN_AREA", 0.00005, float) * gray.size
+    max_area = env_number("DIN_FAST_MAX_AREA", 0.02, float) * gray.size
+    area = stats[:, cv2.CC_STAT_AREA]
+    keep = (area >= min_area) & (area <= max_area)
+    keep[0] = False  # พื้นหลัง
+    # เลข label ใหม่เรียง 1..N เฉพาะตัวที่ผ่านเกณฑ์พื้นที่
+    relabel = np.zeros(len(stats), dtype=np.int32)
+    relabel[keep] = np.arange(1, np.count_nonzero(keep) + 1)
+    return relabel[labels], stats[keep]
+
+
+def _sampled_frames(input_path: str):
+    """
+    (generator ของ (frame_idx, เฟรม BGR หรือ None ถ้าเป็นเฟรมที่ข้าม), fps) หรือ None ถ้าเปิดไม่ได้
+    OpenCV: เฟรมที่ข้ามใช้ grab() อย่างเดียว (ไม่ retrieve / แปลงสีเป็น BGR)
+    imageio (fallback) ต้อง decode ทุกเฟรมอยู่แล้ว แค่ไม่ส่งเฟรมที่ข้ามออกไป
+    """
+    sample_fps = env_number("DIN_FAST_FPS", 5.0, float)
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        cap.release()
+        opened = _open_video(input_path)
+        if opened is None:
+            return None
+        frames, fps, _ = opened
+        stride = max(1, int(round((fps or 25) / sample_fps)))
+        return ((i, frame if i % stride == 0 else None) for i, frame in enumerate(frames)), fps
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    stride = max(1, int(round(fps / sample_fps)))
+
+    def generator():
+        try:
+            frame_idx = 0
+            while True:
+                if frame_idx % stride:
+                    ok, frame = cap.grab(), None
+                else:
+                    ok, frame = cap.read()
+                if not ok:
+                    break
+                yield frame_idx, frame
+                frame_idx += 1
+        finally:
+            cap.release()
+
+    return generator(), fps
+
+
+def screen_video(input_path: str, roi=None):
+    """
+    คัดกรองการขยับของกุ้งทั้งคลิป คืนค่า summary (dict) หรือ None ถ้าเปิดวิดีโอไม่ได้
+    summary มี key เดียวกับ TrackingSession.summary() + "boxes", "moved_mask", "keyframe" ไว้วาดภาพสรุป
+    roi = (x1, y1, x2, y2) พิกัดในเฟรมเต็ม (เช่นขอบถาด) ถ้ามี
+    """
+    if not os.path.exists(input_path):
+        return None
+    opened = _sampled_frames(input_path)
+    if opened is None:
+        return None
+    frames, _ = opened
+
+    subtractor = cv2.createBackgroundSubtractorMOG2(
+        history=max(1, env_number("DIN_FAST_HISTORY", 500, int)),
+        varThreshold=FAST_VAR_THRESHOLD,
+        detectShadows=False,
+    )
+    ref = keyframe = changed = None
+    frames_total = frames_used = 0
+    kernel = np.ones((3, 3), np.uint8)
+    for _, frame in frames:
+        frames_total += 1
+        if frame is None:
+            continue
+        frames_used += 1
+        gray = _prep(frame, roi)
+        if ref is None:
+            # พื้นหลังเริ่มต้น = เฟรมแรก (ตัวที่นิ่งอยู่จึงเป็นส่วนหนึ่งของพื้นหลัง)
+            subtractor.apply(gray, learningRate=1.0)
+            ref, keyframe = gray, frame
+            changed = np.zeros(gray.shape, dtype=np.uint8)
+            continue
+        foreground = subtractor.apply(gray)
+        changed |= cv2.morphologyEx((foreground > 0).astype(np.uint8), cv2.MORPH_OPEN, kernel)
+
+    if ref is None:
+        return None
+
+    labels, stats = _segment(ref)
+    # pixel บนตัวของแต่ละตัว (ตาม mask ของ component) ที่เคยเป็น foreground
+    changed_px = np.bincount(labels[changed > 0], minlength=len(stats) + 1)[1:]
+    moved_mask = changed_px >= env_number("DIN_FAST_MOVED_RATIO", 0.3, float) * stats[:, cv2.CC_STAT_AREA]
+
+    summary = make_summary(len(stats), int(np.count_nonzero(moved_mask)))
+    summary["status"] = {i + 1: "good" if m else "sick" for i, m in enumerate(moved_mask)}
+
+    # แปลง bbox กลับเป็นพิกัดเฟรมเต็ม (ไว้วาดบน keyframe)
+    h, w = ref.shape
+    x1 = np.clip(stats[:, 0] - FAST_BBOX_PAD, 0, w)
+    y1 = np.clip(stats[:, 1] - FAST_BBOX_PAD, 0, h)
+    x2 = np.clip(stats[:, 0] + stats[:, 2] + FAST_BBOX_PAD, 0, w)
+    y2 = np.clip(stats[:, 1] + stats[:, 3] + FAST_BBOX_PAD, 0, h)
+    scale = (keyframe.shape[1] if roi is None else roi[2] - roi[0]) / w
+    offset = np.array([roi[0], roi[1]] * 2) if roi is not None else np.zeros(4)
+    summary["boxes"] = (np.stack([x1, y1, x2, y2], axis=1).reshape(-1, 4) * scale + offset).astype(int)
+    summary["moved_mask"] = moved_mask
+    summary["keyframe"] = keyframe
+    summary["frames"] = (frames_used, frames_total)
+    return summary
+
+
+def analyze_video_fast(input_path: str, original_name: str = None, summary: dict = None, roi=None,
+                       output_mode: str = None):
+    """
+    เขียนภาพสรุป (.jpg) ของ fast engine คืนค่า AnalysisResult แบบเดียวกับ analyze_video
+    fast engine ไม่มีวิดีโอ ทุก output mode จึงได้ภาพสรุปภาพเดียว ยกเว้น none ที่ไม่เขียนภาพ (image = None)
+    """
+    summary = summary if summary is not None else screen_video(input_path, roi)
+    if summary is None:
+        print(f"❌ ไม่พบวิดีโอ / เปิดไม่ได้: {input_path}")
+        return
+
+    output_dir, base_name = output_paths(input_path, original_name)
+    output_img_path = None
+
+    if resolve_output_mode(output_mode) != "none":
+        output_img_path = os.path.join(output_dir, f"{base_name}.jpg")
+        image = summary["keyframe"].copy()
+        for tid, ((x1, y1, x2, y2), moved) in enumerate(zip(summary["boxes"], summary["moved_mask"]), start=1):
+            color = (0, 255, 0) if moved else (0, 0, 255)
+            cv2.rectangle(image, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+            cv2.putText(image, f"id_{tid}", (int(x1), int(y1) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        cv2.imwrite(output_img_path, image)
+        print(f"✅ บันทึกภาพสรุปที่: {output_img_path}")
+
+    frames_used, frames_total = summary["frames"]
+    result = make_result(summary, [f"⚡ fast engine: ใช้ {frames_used}/{frames_total} เฟรม"], output_img_path)
+
+    if result.save_text(os.path.join(output_dir, f"{base_name}.txt")):
+        print(f"📄 บันทึกผลข้อความที่: {result.text_path}")
+    return result
@@ -0,0 +1,144 @@
+"""
+รูปแบบผลลัพธ์ (artifact) ของ din นอกจาก txt สรุป
+    none       txt อย่างเดียว ไม่วาดกรอบ / ไม่ encode อะไรเลย
+    keyframes  ภาพ contact sheet (.jpg) ของเฟรมที่วาดกรอบแล้ว DIN_KEYFRAMES เฟรม กระจายทั้งคลิป
+    preview    mp4 fps ต่ำ + ย่อขนาด (DIN_PREVIEW_FPS, DIN_PREVIEW_WIDTH)
+    full       mp4 annotate เต็ม fps เต็มขนาด (แบบเดิม, default)
+แอปส่วนใหญ่แสดงผล din เป็นภาพเล็กๆ การ encode วิดีโอเต็มจึงเป็น CPU ส่วนใหญ่ที่ไม่มีใครดู
+
+เลือกได้ต่อ request (พารามิเตอร์ output_mode) หรือต่อบ่อ / ทั้งระบบผ่าน ENV:
+    DIN_OUTPUT_MODE_POND<N>  เช่น DIN_OUTPUT_MODE_POND2=preview
+    DIN_OUTPUT_MODE          default ของทุกบ่อ (default full)
+    DIN_KEYFRAMES            จำนวนเฟรมใน contact sheet (default 6)
+    DIN_PREVIEW_FPS          fps ของ preview (default 5)
+    DIN_PREVIEW_WIDTH        ความกว้างของ preview (pixel, default 480)
+"""
+
+import math
+import os
+
+import cv2
+import numpy as np
+
+from utils.env import env_number
+from utils.video_writer import VideoWriter
+
+OUTPUT_MODES = ("none", "keyframes", "preview", "full")
+KEYFRAME_WIDTH = 320   # ความกว้างของแต่ละช่องใน contact sheet
+
+
+def resolve_output_mode(mode: str = None, pond_id=None) -> str:
+    """output mode ที่จะใช้: พารามิเตอร์ > DIN_OUTPUT_MODE_POND<N> > DIN_OUTPUT_MODE > full"""
+    if not mode and pond_id is not None:
+        mode = os.environ.get(f"DIN_OUTPUT_MODE_POND{pond_id}")
+    mode = (mode or os.environ.get("DIN_OUTPUT_MODE") or "full").lower()
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"❌ Unknown din output mode: {mode} (ใช้ได้: {', '.join(OUTPUT_MODES)})")
+    return mode
+
+
+def artifact_path(mode: str, output_dir: str, base_name: str):
+    """path ของไฟล์ผลลัพธ์ตาม mode (None ถ้า mode = none)"""
+    ext = {"keyframes": ".jpg", "preview": ".mp4", "full": ".mp4"}.get(mode)
+    return os.path.join(output_dir, f"{base_name}{ext}") if ext else None
+
+
+def preview_step(fps: float) -> int:
+    """เก็บทุกๆ กี่เฟรมของคลิปเดิมใน preview"""
+    return max(1, int(round((fps or 25) / env_number("DIN_PREVIEW_FPS", 5.0, float))))
+
+
+def keyframe_targets(total_frames: int, count: int = None) -> set:
+    """index ของเฟรมที่จะเก็บ: กึ่งกลางของ count ช่วงเท่าๆ กัน (ไม่เอาเฟรมแรกที่ track ยังไม่ confirmed)"""
+    count = count or env_number("DIN_KEYFRAMES", 6, int)
+    if total_frames <= 0 or count <= 0:
+        return set()
+    return {int((i + 0.5) * total_frames / count) for i in range(count)}
+
+
+def _fit_width(frame: np.ndarray, width: int) -> np.ndarray:
+    h, w = frame.shape[:2]
+    if w <= width:
+        return frame
+    return cv2.resize(frame, (width, max(1, h * width // w)), interpolation=cv2.INTER_AREA)
+
+
+def save_contact_sheet(frames: list, path: str):
+    """frames = [(frame_idx, thumb BGR), ...] -> ภาพ grid เดียว เรียงตามเวลา คืน path (None ถ้าไม่มีเฟรม)"""
+    if not frames:
+        return None
+    thumbs = [thumb for _, thumb in sorted(frames, key=lambda item: item[0])]
+    cols = math.ceil(math.sqrt(len(thumbs)))
+    rows = math.ceil(len(thumbs) / cols)
+    h = max(t.shape[0] for t in thumbs)
+    w = max(t.shape[1] for t in thumbs)
+    sheet = np.zeros((rows * h, cols * w, 3), dtype=np.uint8)
+    for i, thumb in enumerate(thumbs):
+        r, c = divmod(i, cols)
+        sheet[r * h:r * h + thumb.shape[0], c * w:c * w + thumb.shape[1]] = thumb
+    cv2.imwrite(path, sheet)
+    return path
+
+
+# ===================== sinks =====================
+# ทุก sink มี wants(frame_idx) -> ต้องวาดเฟรมนี้ไหม, write(frame_idx, frame), close() -> path ของผลลัพธ์ / None
+class NullSink:
+    def wants(self, frame_idx: int) -> bool:
+        return False
+
+    def write(self, frame_idx: int, frame: np.ndarray):
+        pass
+
+    def close(self):
+        return None
+
+
+class VideoSink:
+    """mp4 ผ่าน utils.video_writer (step > 1 / width = preview) frame_idx เป็นเลขเฟรมของคลิปเดิม"""
+
+    def __init__(self, path: str, fps: float, step: int = 1, width: int = None):
+        self.path = path
+        self.step = step
+        self.fps = fps / step
+        self.stats = None
+        self._writer = VideoWriter(path, self.fps, width=width)
+
+    def wants(self, frame_idx: int) -> bool:
+        return frame_idx % self.step == 0
+
+    def write(self, frame_idx: int, frame: np.ndarray):
+        if self.wants(frame_idx):
+            self._writer.write(frame)
+
+    def close(self):
+        self.stats = self._writer.close()
+        return self.path
+
+
+class KeyframeSink:
+    """เก็บ thumbnail ของเฟรมใน targets ไว้ในหน่วยความจำ แล้วรวมเป็น contact sheet ตอน close (path=None = ไม่บันทึก)"""
+
+    def __init__(self, path: str, targets: set):
+        self.path = path
+        self.targets = targets
+        self.frames = []
+
+    def wants(self, frame_idx: int) -> bool:
+        return frame_idx in self.targets
+
+    def write(self, frame_idx: int, frame: np.ndarray):
+        if self.wants(frame_idx):
+            self.frames.append((frame_idx, _fit_width(frame, KEYFRAME_WIDTH).copy()))
+
+    def close(self):
+        return save_contact_sheet(self.frames, self.path) if self.path else None
+
+
+def make_sink(mode: str, path: str, fps: float, total_frames: int):
+    if mode == "none":
+        return NullSink()
+    if mode == "keyframes":
+        return KeyframeSink(path, keyframe_targets(total_frames))
+    if mode == "preview":
+        return VideoSink(path, fps, preview_step(fps), env_number("DIN_PREVIEW_WIDTH", 480, int))
+    return VideoSink(path, fps)
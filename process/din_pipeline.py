@@ -0,0 +1,237 @@
+"""
+Pipeline decode -> infer -> encode ของวิดีโอ din แบบ 3 stage
+- decoder process : อ่านเฟรมด้วย OpenCV แล้วเขียนลง ring buffer ใน multiprocessing.shared_memory
+- infer (process เดิม) : YOLO + tracker + วาดกรอบลงบนเฟรมใน ring buffer โดยตรง
+- encoder process : อ่านเฟรมที่วาดแล้วจาก ring buffer ส่งเข้า utils.video_writer (ffmpeg) เป็น mp4
+ระหว่าง stage ส่งแค่เลข slot ผ่าน queue (ไม่ pickle array) จำนวน slot มีจำกัด -> decoder รอเองถ้า infer ช้า (backpressure)
+decode / encode จึงทำงานซ้อนกับ inference แทนที่จะต่อท้ายกัน
+
+ถ้า decoder / encoder ตาย (เช่น ffmpeg crash) slot ที่ค้างอยู่จะไม่ถูกคืน -> infer stage รอเฟรมแบบมี timeout
+แล้วเช็คว่าทั้งสอง process ยังทำงานอยู่ ถ้าไม่ใช่จะ raise แทนการรอไปตลอด
+
+เปิดใช้ด้วย ENV DIN_PIPELINE=1 (หรือ analyze_video(..., pipeline=True))
+    DIN_PIPELINE_SLOTS  จำนวน slot เพิ่มเติมนอกเหนือจากที่ batch ต้องใช้ (default 8)
+"""
+
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+_POLL_SECONDS = 1.0   # ช่วงเช็คว่า decoder / encoder ยังอยู่ ระหว่างรอเฟรม
+_JOIN_SECONDS = 10.0  # เวลารอ process ปิดตัวเองก่อน terminate
+
+
+class FrameRing:
+    """ring buffer ของเฟรม BGR ขนาดเท่ากันใน shared memory (slot ละ 1 เฟรม)"""
+
+    def __init__(self, slots: int, shape: tuple, name: str = None):
+        self.slots = slots
+        self.shape = shape
+        nbytes = int(np.prod(shape)) * slots
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            # process ลูก (spawn) ใช้ resource_tracker ตัวเดียวกับ process แม่ -> ตัวแม่เป็นคน unlink
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots, *shape), dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self, unlink: bool = False):
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # ยังมี view ของเฟรมค้างอยู่ หน่วยความจำจะถูกคืนเมื่อ view ถูกทิ้ง
+        if unlink:
+            self.shm.unlink()
+
+
+# ===================== decoder / encoder process =====================
+def _decoder(input_path: str, ring_name: str, slots: int, shape: tuple,
+             free_q, decoded_q, stop_event, timings_q):
+    ring = FrameRing(slots, shape, ring_name)
+    cap = cv2.VideoCapture(input_path)
+    busy = wait = 0.0
+    frames = 0
+    try:
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            slot = free_q.get()
+            wait += time.perf_counter() - started
+            if slot is None:
+                break
+
+            started = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                free_q.put(slot)
+                break
+            if frame.shape != shape:
+                frame = cv2.resize(frame, (shape[1], shape[0]))
+            ring.frames[slot] = frame
+            busy += time.perf_counter() - started
+            frames += 1
+            decoded_q.put(slot)
+    finally:
+        decoded_q.put(None)
+        cap.release()
+        ring.close()
+        timings_q.put({"decode": busy, "decode_wait": wait, "decode_frames": frames})
+
+
+def _encoder(output_path: str, fps: float, ring_name: str, slots: int, shape: tuple,
+             encode_q, free_q, timings_q):
+    from utils.video_writer import VideoWriter
+
+    ring = FrameRing(slots, shape, ring_name)
+    writer = VideoWriter(output_path, fps, size=(shape[1], shape[0]))
+    wait = 0.0
+    stats = {"seconds": 0.0, "frames": 0}
+    try:
+        while True:
+            started = time.perf_counter()
+            slot = encode_q.get()
+            wait += time.perf_counter() - started
+            if slot is None:
+                break
+            writer.write(ring.frames[slot])
+            free_q.put(slot)
+    finally:
+        try:
+            stats = writer.close()
+        finally:
+            ring.close()
+            timings_q.put({"encode": stats["seconds"], "encode_wait": wait,
+                           "encode_frames": stats["frames"], "encode_stats": stats})
+
+
+# ===================== infer stage (process ที่เรียกใช้) =====================
+class FramePipeline:
+    """
+    ใช้แทน reader + writer เดิมใน analyze_video_full:
+        for frame in pipeline.frames(): ... pipeline.write(frame) ...
+        timings = pipeline.close()
+    frame ที่ได้จาก frames() เป็น view ใน shared memory วาดลงไปได้เลย แล้วส่งต่อด้วย write()
+    เฟรมที่ถือไว้พร้อมกันได้สูงสุด = slots - 1 (ต้องมากกว่าจำนวนเฟรมที่ batch ค้างไว้)
+    output_path = None -> ไม่มี encoder (output mode อื่นที่ไม่ใช่ full) write() แค่คืน slot ให้ decoder
+    """
+
+    def __init__(self, input_path: str, output_path: str, fps: float, size: tuple, slots: int):
+        width, height = size
+        self.shape = (height, width, 3)
+        self.slots = slots
+        self.ring = FrameRing(slots, self.shape)
+
+        ctx = multiprocessing.get_context("spawn")
+        self._free_q = ctx.Queue()
+        self._decoded_q = ctx.Queue()
+        self._encode_q = ctx.Queue()
+        self._timings_q = ctx.Queue()
+        self._stop = ctx.Event()
+        for slot in range(slots):
+            self._free_q.put(slot)
+
+        self._slot_of = {}  # id ของ view -> slot
+        self._decoded_done = False
+        self._timings = None
+        self._started = time.perf_counter()
+        self._wait = 0.0
+        self._decoder = ctx.Process(
+            target=_decoder, name="din-decoder", daemon=True,
+            args=(input_path, self.ring.name, slots, self.shape,
+                  self._free_q, self._decoded_q, self._stop, self._timings_q),
+        )
+        self._encoder = None
+        if output_path:
+            self._encoder = ctx.Process(
+                target=_encoder, name="din-encoder", daemon=True,
+                args=(output_path, fps, self.ring.name, slots, self.shape,
+                      self._encode_q, self._free_q, self._timings_q),
+            )
+            self._encoder.start()
+        self._decoder.start()
+
+    def _next_decoded(self):
+        """slot ถัดไปจาก decoder (None = หมดคลิป) raise ถ้า decoder / encoder ตายระหว่างรอ"""
+        while True:
+            try:
+                return self._decoded_q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                pass
+            if self._encoder is not None and not self._encoder.is_alive():
+                raise RuntimeError(f"❌ din encoder หยุดทำงาน (exit code {self._encoder.exitcode})")
+            if not self._decoder.is_alive():
+                try:
+                    # decoder ที่จบปกติส่ง None ไว้ก่อนออกเสมอ
+                    return self._decoded_q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    raise RuntimeError(f"❌ din decoder หยุดทำงาน (exit code {self._decoder.exitcode})")
+
+    def frames(self):
+        while True:
+            started = time.perf_counter()
+            slot = self._next_decoded()
+            self._wait += time.perf_counter() - started
+            if slot is None:
+                self._decoded_done = True
+                return
+            frame = self.ring.frames[slot]
+            self._slot_of[id(frame)] = slot
+            yield frame
+
+    def write(self, frame: np.ndarray):
+        slot = self._slot_of.pop(id(frame))
+        (self._encode_q if self._encoder else self._free_q).put(slot)
+
+    @staticmethod
+    def _join(process):
+        process.join(_JOIN_SECONDS)
+        if process.is_alive():
+            print(f"⚠️ {process.name} ไม่ปิดตัวเอง -> terminate")
+            process.terminate()
+            process.join()
+
+    def close(self) -> dict:
+        """
+        หยุดทุก stage (รวมกรณีหยุดก่อนจบคลิป / loop error / stage อื่นตาย) แล้วคืนเวลาของแต่ละ stage (วินาที)
+        เรียกซ้ำได้ shared memory ถูก unlink เสมอ
+        """
+        if self._timings is not None:
+            return self._timings
+        timings = {"decode": 0.0, "encode": 0.0}
+        try:
+            self._stop.set()
+            self._free_q.put(None)  # ปลุก decoder ที่อาจรอ slot อยู่
+            # เฟรมที่ decoder ส่งมาแล้วแต่ยังไม่ได้ใช้ (หยุดก่อนจบคลิป) ไม่ต้อง encode
+            while not self._decoded_done:
+                try:
+                    self._decoded_done = self._decoded_q.get(timeout=_POLL_SECONDS) is None
+                except queue.Empty:
+                    if not self._decoder.is_alive():
+                        break
+            self._join(self._decoder)
+            stages = [self._decoder]
+            if self._encoder:
+                self._encode_q.put(None)
+                self._join(self._encoder)
+                stages.append(self._encoder)
+
+            wall = time.perf_counter() - self._started
+            timings.update({"wall": wall, "infer": wall - self._wait, "infer_wait": self._wait})
+            # process จบแล้ว ข้อมูลที่ส่งไว้อยู่ใน queue ครบ (stage ที่ตายกลางทางอาจไม่มี timings)
+            for _ in stages:
+                try:
+                    timings.update(self._timings_q.get(timeout=2))
+                except queue.Empty:
+                    break
+        finally:
+            self.ring.close(unlink=True)
+            self._timings = timings
+        return timings
@@ -0,0 +1,370 @@
+"""
+วิเคราะห์วิดีโอ din ยาวๆ แบบแบ่งช่วงเวลา แล้วรันแต่ละช่วงขนานกันใน process แยก (แต่ละช่วงมี tracker ของตัวเอง)
+- ช่วงที่ k+1 เริ่มก่อนรอยต่อ DIN_SEGMENT_OVERLAP วินาที เพื่อให้ track ของสองช่วงเห็นเฟรมเดียวกัน
+- ต่อ track ข้ามรอยต่อด้วยระยะเฉลี่ยของตำแหน่งในเฟรมที่ซ้อนกัน (หรือจุดปลาย-จุดเริ่มถ้าไม่มีเฟรมซ้อน)
+- track ที่ต่อกันแล้วถือว่า "เคยขยับ" ถ้าส่วนไหนเคยขยับ แล้วรวมเป็น summary เดียว
+- วิดีโอ annotate ของแต่ละช่วง (เฉพาะเฟรมที่ไม่ซ้อน) ถูกต่อกันเป็น mp4 ไฟล์เดียว รูปแบบผลลัพธ์เหมือนเดิม
+  (output mode keyframes: แต่ละช่วงส่ง thumbnail กลับมารวมเป็น contact sheet เดียว, none: ไม่เขียนอะไร)
+- process ที่วิเคราะห์แต่ละช่วงอยู่ใน pool ที่สร้างครั้งเดียวแล้วใช้ซ้ำทุกคลิป (โหลด YOLO แค่ตอน process เริ่ม)
+  สร้างใหม่เฉพาะเมื่อไฟล์โมเดล din เปลี่ยน (reload) หรือต้องใช้ process มากกว่าเดิม
+
+ตั้งค่าผ่าน ENV:
+    DIN_SEGMENTS              จำนวนช่วง (default 1 = ไม่แบ่ง)
+    DIN_SEGMENT_MIN_SECONDS   ความยาวขั้นต่ำต่อช่วง (default 10) คลิปที่สั้นกว่า 2 เท่าของค่านี้ไม่ถูกแบ่ง
+                              (รันแบบเดิมใน process เดียว ไม่ใช้ pool) คลิปที่ยาวกว่าได้ไม่เกิน ความยาว / ค่านี้ ช่วง
+    DIN_SEGMENT_OVERLAP       ความยาวช่วงที่ซ้อนกันตรงรอยต่อ (วินาที, default 1)
+    DIN_SEGMENT_WORKERS       จำนวน process (default = DIN_SEGMENTS ไม่เกินจำนวน CPU)
+    DIN_STITCH_DIST           ระยะ (pixel) สูงสุดที่ถือว่าเป็นกุ้งตัวเดียวกันตรงรอยต่อ (default 25)
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+from process.din import (FrameSampler, TrackingSession, _clip_frame_count, _detected_frames, _draw,
+                         _effective_stride, make_result, make_summary, output_paths)
+from process.din_output import artifact_path, make_sink, preview_step, save_contact_sheet
+from process.din_tracks import save_enabled, save_tracks, tracks_path
+from process.trackers import make_tracker, tracker_name
+from utils.env import env_number
+from utils.model_registry import get_model, registry
+from utils.video_writer import VideoWriter, describe, ffmpeg_exe
+
+
+def _clip_fps(input_path: str) -> float:
+    cap = cv2.VideoCapture(input_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0
+    cap.release()
+    return fps or 25
+
+
+def segment_count(input_path: str, segments: int = None) -> int:
+    """
+    จำนวนช่วงที่จะแบ่งจริง (ไม่ให้สั้นกว่า DIN_SEGMENT_MIN_SECONDS ต่อช่วง)
+    คืน 1 = ไม่แบ่ง: คลิปสั้นกว่า 2 x DIN_SEGMENT_MIN_SECONDS (default 20 วินาที) วิเคราะห์แบบเดิม
+    """
+    segments = segments or env_number("DIN_SEGMENTS", 1, int)
+    if segments <= 1 or not os.path.exists(input_path):
+        return 1
+    min_frames = env_number("DIN_SEGMENT_MIN_SECONDS", 10.0, float) * _clip_fps(input_path)
+    return max(1, min(segments, int(_clip_frame_count(input_path) // max(1, min_frames))))
+
+
+def plan_segments(total_frames: int, segments: int, overlap: int) -> list:
+    """[(start, write_from, end), ...] -> ประมวลผล [start, end) แต่เขียนวิดีโอเฉพาะ [write_from, end)"""
+    bounds = np.linspace(0, total_frames, segments + 1).astype(int)
+    return [(max(0, int(b0) - overlap), int(b0), int(b1)) for b0, b1 in zip(bounds[:-1], bounds[1:])]
+
+
+# ===================== ฝั่ง worker process =====================
+def _init_segment_worker(threads: int, model_path: str = None):
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if model_path:
+        registry.reload("din", model_path)
+
+
+def _segment_frames(input_path: str, start: int, end: int):
+    cap = cv2.VideoCapture(input_path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for _ in range(start, end):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def analyze_segment(input_path: str, start: int, write_from: int, end: int, part_path: str,
+                    fps: float, stride: int, motion_threshold: float, tracker: str,
+                    output_mode: str = "full", total_frames: int = 0, roi=None) -> dict:
+    """
+    วิเคราะห์เฟรม [start, end) ด้วย tracker ของตัวเอง คืน trajectory + สถานะขยับของทุก track
+    (+ thumbnail ของ keyframe ที่อยู่ในช่วงนี้ ถ้า output_mode = keyframes)
+    """
+    model = get_model("din")
+    session = TrackingSession(make_tracker(tracker))
+    sampler = FrameSampler(
+        stride=stride,
+        motion_threshold=motion_threshold,
+        max_skip=env_number("DIN_MOTION_MAX_SKIP", max(1, int(round(fps))), int),
+    )
+    batch_size = max(1, env_number("DIN_BATCH_SIZE", 8, int))
+
+    sink = make_sink(output_mode, part_path, fps, total_frames)
+    drawn = []
+    frames_written = frames_detected = 0
+    frames = _segment_frames(input_path, start, end)
+    try:
+        for frame_idx, frame, detection in _detected_frames(frames, model, sampler, batch_size, start, roi):
+            if detection is not None:
+                frames_detected += 1
+                boxes, scores = detection
+                drawn = session.update(frame_idx, frame, boxes, scores)
+            if frame_idx >= write_from:
+                if sink.wants(frame_idx):
+                    _draw(frame, drawn, roi)
+                    sink.write(frame_idx, frame)
+                frames_written += 1
+    finally:
+        frames.close()
+        sink.close()
+
+    return {
+        "tracks": {
+            tid: {"points": points, "moved": tid in session.moved_once}
+            for tid, points in session.trajectories.items()
+        },
+        "frames_written": frames_written,
+        "frames_detected": frames_detected,
+        "records": session.records,
+        "keyframes": getattr(sink, "frames", []),
+        "encode_stats": getattr(sink, "stats", None),
+    }
+
+
+# ===================== ฝั่ง process หลัก =====================
+_pool = None
+_pool_key = None      # (ไฟล์โมเดล, version) ที่ worker ใน pool โหลดไว้
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _segment_pool(workers: int, model_path: str = None, version: str = None) -> ProcessPoolExecutor:
+    """
+    pool ของ process ที่วิเคราะห์แต่ละช่วง สร้างครั้งเดียวแล้วใช้ซ้ำ (worker spawn + โหลด YOLO ครั้งเดียว)
+    สร้างใหม่เมื่อโมเดล din เปลี่ยน หรือคลิปนี้ต้องใช้ process มากกว่า pool เดิม
+    """
+    global _pool, _pool_key, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_key != (model_path, version) or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_segment_worker,
+                initargs=(threads, model_path),
+            )
+            _pool_key, _pool_workers = (model_path, version), workers
+        return _pool
+
+
+def _discard_segment_pool(pool: ProcessPoolExecutor):
+    """ทิ้ง pool ที่เสีย (worker ตาย) ครั้งหน้าจะสร้างใหม่"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _match_cost(a_points: list, c_points: list, boundary: int, overlap: int):
+    """ระยะเฉลี่ยของสอง track ในเฟรมที่ซ้อนกัน (ไม่มีเฟรมซ้อน -> ระยะจุดปลายถึงจุดเริ่ม ถ้าห่างกันไม่เกิน overlap)"""
+    a_pos = {f: (x, y) for f, x, y in a_points if f >= boundary - overlap}
+    c_pos = {f: (x, y) for f, x, y in c_points if f < boundary}
+    common = a_pos.keys() & c_pos.keys()
+    if common:
+        diff = np.array([a_pos[f] for f in common], dtype=np.float64) - np.array([c_pos[f] for f in common])
+        return float(np.hypot(diff[:, 0], diff[:, 1]).mean())
+    a_last, c_first = a_points[-1], c_points[0]
+    if 0 <= c_first[0] - a_last[0] <= max(overlap, 1):
+        return float(np.hypot(c_first[1] - a_last[1], c_first[2] - a_last[2]))
+    return None
+
+
+def stitch_tracks(results: list, plan: list, overlap: int, max_dist: float) -> list:
+    """
+    ต่อ track ข้ามรอยต่อของแต่ละช่วง
+    คืน list ของ track ที่รวมแล้ว [{"parts": [(segment, tid), ...], "first": frame, "moved": bool}] เรียงตามเฟรมแรก
+    """
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            key = parent[key]
+        return key
+
+    for seg, result in enumerate(results):
+        for tid in result["tracks"]:
+            find((seg, tid))
+
+    for seg in range(len(results) - 1):
+        boundary = plan[seg + 1][1]
+        costs = []
+        for a_tid, a in results[seg]["tracks"].items():
+            for c_tid, c in results[seg + 1]["tracks"].items():
+                cost = _match_cost(a["points"], c["points"], boundary, overlap)
+                if cost is not None and cost <= max_dist:
+                    costs.append((cost, a_tid, c_tid))
+        used_a, used_c = set(), set()
+        for _, a_tid, c_tid in sorted(costs, key=lambda item: item[0]):
+            if a_tid in used_a or c_tid in used_c:
+                continue
+            used_a.add(a_tid)
+            used_c.add(c_tid)
+            parent[find((seg + 1, c_tid))] = find((seg, a_tid))
+
+    groups = {}
+    for seg, result in enumerate(results):
+        for tid, track in result["tracks"].items():
+            group = groups.setdefault(find((seg, tid)), {"parts": [], "first": None, "moved": False})
+            group["parts"].append((seg, tid))
+            first = track["points"][0][0]
+            group["first"] = first if group["first"] is None else min(group["first"], first)
+            group["moved"] |= track["moved"]
+    return sorted(groups.values(), key=lambda group: group["first"])
+
+
+def merged_records(results: list, plan: list, merged: list) -> list:
+    """
+    trajectory ของทุกช่วงด้วย id ของ track ที่ต่อแล้ว (1..N ตาม merged) สำหรับ process/din_tracks.py
+    เฟรมที่ซ้อนกันตรงรอยต่อของ track ที่ต่อกับช่วงก่อนหน้าได้ เก็บจากช่วงก่อนหน้าอย่างเดียว (ไม่ให้มีจุดซ้ำในเฟรมเดียวกัน)
+    track ที่ต่อไม่ได้เก็บทุกจุด (รวมที่อยู่ในเฟรมซ้อนอย่างเดียว) ทุก track ที่นับใน summary จึงมีใน .npz
+    """
+    new_id = {(seg, int(tid)): i for i, group in enumerate(merged, start=1) for seg, tid in group["parts"]}
+    continued = {(seg, int(tid)) for group in merged for seg, tid in group["parts"]
+                 if any(other == seg - 1 for other, _ in group["parts"])}
+    records = []
+    for seg, result in enumerate(results):
+        write_from = plan[seg][1]
+        for tid, frame_idx, *rest in result["records"]:
+            if (seg, tid) not in new_id:
+                continue
+            if frame_idx >= write_from or (seg, tid) not in continued:
+                records.append((new_id[(seg, tid)], frame_idx, *rest))
+    return records
+
+
+def concat_videos(parts: list, output_path: str, fps: float):
+    """ต่อ mp4 หลายไฟล์เป็นไฟล์เดียว: ffmpeg concat แบบไม่ encode ใหม่ ถ้าไม่ได้ค่อย decode/encode ใหม่"""
+    try:
+        list_path = f"{output_path}.parts.txt"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part in parts:
+                f.write(f"file '{os.path.abspath(part)}'\n")
+        args = ["-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy"]
+        if os.environ.get("VIDEO_FASTSTART", "1") == "1":
+            args += ["-movflags", "+faststart"]
+        subprocess.run([ffmpeg_exe(), *args, output_path], check=True)
+        os.remove(list_path)
+        return
+    except Exception as e:
+        print(f"⚠️ ffmpeg concat ไม่สำเร็จ ({e}), encode ใหม่แทน")
+
+    writer = VideoWriter(output_path, fps)
+    for part in parts:
+        cap = cv2.VideoCapture(part)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.close()
+
+
+def analyze_video_segmented(input_path, original_name: str = None, segments: int = 2, frame_stride: int = None,
+                            target_fps: float = None, motion_threshold: float = None, tracker: str = None,
+                            output_mode: str = "full", roi=None):
+    """
+    เหมือน analyze_video_full แต่แบ่งคลิปเป็น segments ช่วงแล้วรันขนานกัน ได้ AnalysisResult รูปแบบเดิม
+    (early termination ไม่ถูกใช้ในโหมดนี้ เพราะแต่ละช่วงไม่รู้ผลของช่วงอื่น)
+    """
+    output_dir, base_name = output_paths(input_path, original_name)
+    output_path = artifact_path(output_mode, output_dir, base_name)
+
+    fps = _clip_fps(input_path)
+    total_frames = _clip_frame_count(input_path)
+    overlap = int(round(env_number("DIN_SEGMENT_OVERLAP", 1.0, float) * fps))
+    plan = plan_segments(total_frames, segments, overlap)
+
+    stride = _effective_stride(fps, frame_stride, target_fps)
+    if motion_threshold is None:
+        motion_threshold = env_number("DIN_MOTION_THRESHOLD", 0.0, float)
+    tracker = tracker_name(tracker)
+
+    # ขนาด pool ตาม DIN_SEGMENTS (ไม่ใช่จำนวนช่วงของคลิปนี้) คลิปที่ถูกแบ่งน้อยกว่าจึงใช้ pool เดิมได้
+    wanted = max(len(plan), env_number("DIN_SEGMENTS", 1, int))
+    workers = max(1, min(wanted, env_number("DIN_SEGMENT_WORKERS", os.cpu_count() or 1, int)))
+    entry = registry.entry("din") if registry.is_loaded("din") else None
+    pool = _segment_pool(workers, entry and entry["path"], entry and entry["version"])
+    print(f"🧩 แบ่งวิดีโอ {total_frames} เฟรมเป็น {len(plan)} ช่วง ({workers} process, overlap {overlap} เฟรม)")
+
+    tmp_dir = tempfile.mkdtemp(prefix=f"{base_name}_parts_")
+    try:
+        video_mode = output_mode in ("preview", "full")
+        part_paths = [os.path.join(tmp_dir, f"part_{i:03d}.mp4") if video_mode else None
+                      for i in range(len(plan))]
+        futures = [
+            pool.submit(analyze_segment, input_path, start, write_from, end, part_path,
+                        fps, stride, motion_threshold, tracker, output_mode, total_frames, roi)
+            for (start, write_from, end), part_path in zip(plan, part_paths)
+        ]
+        try:
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            _discard_segment_pool(pool)
+            raise
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        if video_mode:
+            concat_videos(part_paths, output_path, fps / preview_step(fps) if output_mode == "preview" else fps)
+        elif output_mode == "keyframes":
+            output_path = save_contact_sheet([kf for r in results for kf in r["keyframes"]], output_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # ------------------------------
+    # Summary (track ที่ต่อกันแล้วได้ id ใหม่ 1..N ตามลำดับที่เจอ)
+    # ------------------------------
+    merged = stitch_tracks(results, plan, overlap, env_number("DIN_STITCH_DIST", 25.0, float))
+    summary = make_summary(len(merged), sum(group["moved"] for group in merged))
+    summary["status"] = {i: "good" if group["moved"] else "sick" for i, group in enumerate(merged, start=1)}
+    npz_path = None
+    if save_enabled():
+        npz_path = save_tracks(tracks_path(output_dir, base_name), merged_records(results, plan, merged),
+                               fps=fps, stride=stride, tracker=tracker, segments=len(plan),
+                               source=original_name or os.path.basename(input_path))
+
+    frames_written = sum(r["frames_written"] for r in results)
+    frames_detected = sum(r["frames_detected"] for r in results)
+    notes = [
+        f"🎞️ detect {frames_detected}/{frames_written} เฟรม (stride {stride}, tracker {tracker})",
+        f"🧩 แบ่ง {len(plan)} ช่วง, ต่อ track ข้ามรอยต่อ "
+        f"{sum(len(r['tracks']) for r in results) - len(merged)} ครั้ง",
+    ]
+    part_stats = [r["encode_stats"] for r in results if r["encode_stats"]]
+    if part_stats and os.path.exists(output_path):
+        notes.append(describe({
+            "backend": part_stats[0]["backend"],
+            "frames": sum(st["frames"] for st in part_stats),
+            "seconds": sum(st["seconds"] for st in part_stats),  # เวลารวมของทุก process
+            "bytes": os.path.getsize(output_path),
+        }))
+    if npz_path:
+        notes.append(f"💾 trajectory: {os.path.basename(npz_path)}")
+    result = make_result(summary, notes, output_path)
+
+    if output_path:
+        print(f"✅ บันทึกผลลัพธ์ ({output_mode}) ที่: {output_path}")
+    if result.save_text(os.path.join(output_dir, f"{base_name}.txt")):
+        print(f"📄 บันทึกผลข้อความที่: {result.text_path}")
+    return result
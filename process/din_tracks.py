@@ -0,0 +1,117 @@
+"""
+Trajectory ของ din ทุก track (track_id, frame, bbox, confidence) เก็บเป็น .npz ข้างไฟล์ผลลัพธ์
+-> เปลี่ยนเกณฑ์ NO_MOVE_THRESHOLD / HEALTHY_MOVED_PERCENT แล้วคำนวณผลใหม่ได้ทันทีโดยไม่ต้อง decode / inference ซ้ำ
+
+ไฟล์ {base_name}.tracks.npz:
+    track_id (N,) int32, frame (N,) int32, bbox (N, 4) int32 ltrb, conf (N,) float32 (NaN = ไม่มี detection ในเฟรมนั้น)
+    meta     JSON (fps, stride, tracker, เกณฑ์ที่ใช้ตอนวิเคราะห์, ชื่อคลิป, เวลาที่สร้าง)
+
+rescore() ใช้ logic เดียวกับ TrackingSession.update แบบ vectorized:
+    track "เคยขยับ" ถ้ามีช่วงใดที่ระยะ centroid ระหว่างสองจุดติดกัน > threshold x จำนวนเฟรมที่ห่างกัน
+
+ตั้งค่าผ่าน ENV:
+    DIN_SAVE_TRACKS   1 = บันทึก .npz ทุกครั้งที่วิเคราะห์ (default 1)
+CLI: python -m utils.rescore_din (ดู utils/rescore_din.py)
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from process.din import HEALTHY_MOVED_PERCENT, NO_MOVE_THRESHOLD, make_summary, write_summary
+
+TRACKS_SUFFIX = ".tracks.npz"
+
+
+def tracks_path(output_dir: str, base_name: str) -> str:
+    return os.path.join(output_dir, f"{base_name}{TRACKS_SUFFIX}")
+
+
+def save_enabled() -> bool:
+    return os.environ.get("DIN_SAVE_TRACKS", "1") == "1"
+
+
+def to_arrays(records: list) -> dict:
+    """records = [(track_id, frame, x1, y1, x2, y2, conf), ...] (จาก TrackingSession.records)"""
+    rows = np.asarray(records, dtype=np.float64).reshape(-1, 7)
+    return {
+        "track_id": rows[:, 0].astype(np.int32),
+        "frame": rows[:, 1].astype(np.int32),
+        "bbox": rows[:, 2:6].astype(np.int32),
+        "conf": rows[:, 6].astype(np.float32),
+    }
+
+
+def save_tracks(path: str, records: list, **meta) -> str:
+    meta = {
+        "version": 1,
+        "no_move_threshold": NO_MOVE_THRESHOLD,
+        "healthy_percent": HEALTHY_MOVED_PERCENT,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        **meta,
+    }
+    np.savez_compressed(path, meta=np.array(json.dumps(meta, ensure_ascii=False)), **to_arrays(records))
+    return path
+
+
+def load_tracks(path: str) -> dict:
+    """คืน dict ของ array + "meta" (dict)"""
+    with np.load(path) as data:
+        tracks = {key: data[key] for key in ("track_id", "frame", "bbox", "conf")}
+        tracks["meta"] = json.loads(str(data["meta"]))
+    return tracks
+
+
+# ===================== rescoring =====================
+def max_speed(tracks: dict):
+    """
+    (track ids ที่ไม่ซ้ำ เรียงจากน้อยไปมาก, ระยะ centroid ต่อเฟรมที่มากที่สุดของแต่ละ track)
+    track "เคยขยับ" ที่ threshold t  <=>  max_speed > t  จึงเทียบได้ทีละหลาย threshold จากการคำนวณครั้งเดียว
+    track ที่มีจุดเดียวได้ -1 (ไม่มีทางขยับ)
+    """
+    tid, frame, bbox = tracks["track_id"], tracks["frame"], tracks["bbox"]
+    if len(tid) == 0:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+    order = np.lexsort((frame, tid))
+    tid, frame, bbox = tid[order], frame[order], bbox[order]
+
+    # centroid แบบเดียวกับตอนวิเคราะห์ ((x1 + x2) // 2 บน bbox ที่เป็น int)
+    cx = (bbox[:, 0] + bbox[:, 2]) // 2
+    cy = (bbox[:, 1] + bbox[:, 3]) // 2
+    same = tid[1:] == tid[:-1]
+    speed = np.hypot(np.diff(cx), np.diff(cy)) / np.maximum(1, np.diff(frame))
+
+    ids, inverse = np.unique(tid, return_inverse=True)
+    best = np.full(len(ids), -1.0)
+    np.maximum.at(best, inverse[1:][same], speed[same])
+    return ids, best
+
+
+def moved_tracks(tracks: dict, no_move_threshold: float = NO_MOVE_THRESHOLD):
+    """(track ids ที่ไม่ซ้ำ, bool array ว่าแต่ละ track เคยขยับไหม)"""
+    ids, speed = max_speed(tracks)
+    return ids, speed > no_move_threshold
+
+
+def rescore(tracks: dict, no_move_threshold: float = NO_MOVE_THRESHOLD,
+            healthy_percent: float = HEALTHY_MOVED_PERCENT) -> dict:
+    """summary รูปแบบเดียวกับ TrackingSession.summary() จาก trajectory ที่บันทึกไว้"""
+    ids, moved = moved_tracks(tracks, no_move_threshold)
+    summary = make_summary(len(ids), int(moved.sum()), healthy_percent)
+    summary["status"] = {int(t): "good" if m else "sick" for t, m in zip(ids, moved)}
+    return summary
+
+
+def rescore_file(path: str, no_move_threshold: float = NO_MOVE_THRESHOLD,
+                 healthy_percent: float = HEALTHY_MOVED_PERCENT, output_txt_path: str = None) -> dict:
+    """rescore ไฟล์ .npz หนึ่งไฟล์ ถ้าส่ง output_txt_path มาจะเขียน txt สรุปใหม่ (รูปแบบเดิม) ด้วย"""
+    tracks = load_tracks(path)
+    summary = rescore(tracks, no_move_threshold, healthy_percent)
+    if output_txt_path:
+        write_summary(output_txt_path, summary, [
+            f"🔁 rescore จาก {os.path.basename(path)} (threshold {no_move_threshold}, healthy {healthy_percent}%)",
+        ])
+    summary["meta"] = tracks["meta"]
+    return summary
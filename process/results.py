@@ -0,0 +1,83 @@
+"""
+ผลลัพธ์ของ analyzer แบบมีโครงสร้าง (size / shrimp / water / din คืนค่า AnalysisResult)
+ตัวเลขเก็บเป็น float เต็มความละเอียด main.py ใช้ metrics ได้ตรงๆ ไม่ต้องเขียน txt แล้วอ่านกลับมา regex
+ข้อความสรุป (lines / text) เป็นแค่การแสดงผลที่สร้างจาก metrics เดียวกัน ใส่ใน JSON ผลลัพธ์ (text_content)
+
+ส่งข้าม process pool ได้ (pickle ได้ทั้งก้อน ค่าใน metrics / detections เป็น type พื้นฐานของ Python)
+
+ตั้งค่าผ่าน ENV:
+    RESULT_WRITE_TXT   1 = เขียน .txt ข้างไฟล์ผลลัพธ์ด้วยแบบเดิม (default 0)
+"""
+
+import copy
+import os
+
+
+def write_txt_enabled() -> bool:
+    return os.environ.get("RESULT_WRITE_TXT", "0") == "1"
+
+
+class AnalysisResult:
+    """
+    kind        size / shrimp / water / din
+    metrics     dict ค่าสรุป (เช่น avg_weight_g, count, moved_percent)
+    detections  list ของ dict ต่อ 1 ตัว / 1 track
+    lines       ข้อความสรุปทีละบรรทัด (รูปแบบเดียวกับ txt เดิม)
+    image / video / text_path  path ของไฟล์ผลลัพธ์ (None = ไม่มี, image เป็น list ได้ถ้ามีหลายภาพ)
+    reused      True = ผลเดิมที่ scene gate นำมาใช้ซ้ำ (ไม่ได้รันโมเดลกับภาพนี้)
+    """
+
+    def __init__(self, kind: str, metrics: dict = None, detections: list = None, lines: list = (),
+                 image: str = None, video: str = None):
+        self.kind = kind
+        self.metrics = metrics or {}
+        self.detections = detections or []
+        self.lines = list(lines)
+        self.image = image
+        self.video = video
+        self.text_path = None
+        self.reused = False
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    @property
+    def artifact(self):
+        """ไฟล์หลักที่แสดงในแอป (วิดีโอก่อน แล้วค่อยภาพ)"""
+        return self.video or self.image
+
+    def paths(self) -> list:
+        """path ของไฟล์ทั้งหมดที่ผลนี้อ้างถึง"""
+        images = self.image if isinstance(self.image, list) else [self.image]
+        return [p for p in (*images, self.video, self.text_path) if p]
+
+    def as_reused(self) -> "AnalysisResult":
+        """สำเนาที่ติดป้าย reused (ไม่แก้ตัวที่ scene gate เก็บไว้)"""
+        reused = copy.copy(self)
+        reused.reused = True
+        return reused
+
+    def save_text(self, path: str, force: bool = False):
+        """เขียน text ลง path ถ้าเปิด RESULT_WRITE_TXT (หรือ force) คืน path ที่เขียน / None"""
+        if not (force or write_txt_enabled()):
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.text)
+        self.text_path = path
+        return path
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "metrics": self.metrics,
+            "detections": self.detections,
+            "text": self.text,
+            "image": self.image,
+            "video": self.video,
+            "text_path": self.text_path,
+            "reused": self.reused,
+        }
+
+    def __repr__(self):
+        return f"AnalysisResult({self.kind!r}, artifact={self.artifact!r}, metrics={self.metrics!r})"
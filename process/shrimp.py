@@ -1,10 +1,15 @@
 import cv2
-from ultralytics import YOLO
+import numpy as np
 import os
 
-# โหลดโมเดลกุ้งลอยน้ำจากโฟลเดอร์ Model/
-model_path = os.environ.get("MODEL_SHRIMP", os.path.join("Model", "shrimp.pt"))
-model = YOLO(model_path)
+from process.results import AnalysisResult
+from utils.batching import predict_batched, predict_many
+from utils.image_io import decode_for_model, full_resolution, source_stem
+from utils.model_registry import inference_imgsz
+from utils.tiling import nms, tile_grid
+
+# โมเดลกุ้งลอยน้ำถูกโหลดแบบ lazy ผ่าน utils.model_registry (key = "shrimp")
+# และรวม batch กับ request อื่นที่เข้ามาพร้อมกันผ่าน utils.batching
 
 output_folder = os.environ.get("OUTPUT_SHRIMP", "/data/local_storage/shrimp")
 os.makedirs(output_folder, exist_ok=True)
@@ -12,15 +17,23 @@ os.makedirs(output_folder, exist_ok=True)
 # ตั้งค่า threshold
 CONFIDENCE_THRESHOLD = float(os.environ.get("SHRIMP_CONF", 0.8))  # ปรับค่าได้ผ่าน env, default = 0.5
 
-def analyze_kuny(image_path, original_name: str = None):
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"❌ ไม่พบภาพที่ path: {image_path}")
-
-    # เพิ่ม conf threshold
-    results = model.predict(image_path, conf=CONFIDENCE_THRESHOLD)
-    shrimp_count, info_list = 0, []
-
+# tiled mode: decode ภาพเต็มความละเอียด แบ่งเป็น tile ซ้อนกัน detect ทุก tile ใน batch เดียว แล้วรวมด้วย NMS
+# กุ้งที่ลอยไกลกล้องจะไม่ถูกย่อจนเหลือไม่กี่ pixel (ดู utils/tiling.py)
+SHRIMP_TILED = os.environ.get("SHRIMP_TILED", "0") == "1"                 # default ปิด (detect ทั้งภาพแบบเดิม)
+TILE_SIZE = int(os.environ.get("SHRIMP_TILE_SIZE", 640))                  # ขนาด tile (pixel ของภาพเต็ม)
+TILE_OVERLAP = float(os.environ.get("SHRIMP_TILE_OVERLAP", 0.2))          # สัดส่วนที่ tile ติดกันซ้อนกัน
+TILE_MAX = int(os.environ.get("SHRIMP_TILE_MAX", 12))                     # จำนวน tile สูงสุด (เกินนี้ tile จะถูกขยาย)
+TILE_NMS_IOU = float(os.environ.get("SHRIMP_TILE_NMS_IOU", 0.5))
+TILE_NMS_IOS = float(os.environ.get("SHRIMP_TILE_NMS_IOS", 0.8))          # ตัวที่ถูกขอบ tile ตัดแล้วซ้อนกับตัวเต็ม
+TILE_FULL_IMAGE = os.environ.get("SHRIMP_TILE_FULL", "1") == "1"          # รวมภาพเต็มใน batch ด้วย (ตัวใหญ่ที่ tile ตัด)
+
+def detect_float_shrimp(results, decoded=None, offset=(0, 0)):
+    """
+    คืน [(x1, y1, x2, y2, score), ...] ของกุ้งลอยที่ confidence ถึง threshold
+    ถ้าส่ง decoded (utils.image_io.DecodedImage) มา พิกัดจะถูก map กลับเป็นพิกัดของภาพต้นฉบับ
+    offset = มุมซ้ายบนของ tile ใน decoded.image (results มาจาก tile นั้น)
+    """
+    detections = []
     for r in results:
         for box in r.boxes:
             cls_id = int(box.cls[0])
@@ -28,30 +41,84 @@ def analyze_kuny(image_path, original_name: str = None):
             name = r.names[cls_id]
 
             if name.lower() == "shrimp" and score >= CONFIDENCE_THRESHOLD:
-                shrimp_count += 1
-                label = f"shrimp float id{shrimp_count} ({score:.2f})"
-                info_list.append(label)
-
-                x1, y1, x2, y2 = box.xyxy[0].int().tolist()
-                cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                cv2.putText(image, label, (x1, y1-10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 0, 0), 3)
+                x1, y1, x2, y2 = box.xyxy[0].tolist()
+                x1, y1, x2, y2 = x1 + offset[0], y1 + offset[1], x2 + offset[0], y2 + offset[1]
+                if decoded is not None:
+                    (x1, y1), (x2, y2) = decoded.to_original([[x1, y1], [x2, y2]])
+                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                detections.append((x1, y1, x2, y2, score))
+    return detections
+
+def detect_tiled(decoded, imgsz: int):
+    """
+    detect บน tile ซ้อนกันของ decoded.image (ทุก tile + ภาพเต็มใน batch เดียว) แล้วรวมด้วย NMS
+    คืน (detections แบบเดียวกับ detect_float_shrimp เรียงตาม score, จำนวน tile)
+    """
+    image = decoded.image
+    h, w = image.shape[:2]
+    tiles = tile_grid(w, h, TILE_SIZE * decoded.scale_x, TILE_OVERLAP, TILE_MAX)
+    crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    offsets = [(x1, y1) for x1, y1, _, _ in tiles]
+    if TILE_FULL_IMAGE and len(tiles) > 1:
+        crops.append(image)
+        offsets.append((0, 0))
+
+    results = predict_many("shrimp", crops, conf=CONFIDENCE_THRESHOLD, imgsz=imgsz)
+    detections = [d for result, offset in zip(results, offsets) for d in detect_float_shrimp([result], decoded, offset)]
+    if not detections:
+        return [], len(tiles)
+    boxes = np.array([d[:4] for d in detections], dtype=np.float64)
+    keep = nms(boxes, [d[4] for d in detections], TILE_NMS_IOU, TILE_NMS_IOS)
+    return [detections[i] for i in keep], len(tiles)
+
+def analyze_kuny(source, original_name: str = None, tiled: bool = None):
+    """
+    source = path / bytes ของไฟล์ภาพ / ndarray BGR (ถ้าไม่ใช่ path ควรส่ง original_name มาด้วย)
+    tiled  = detect แบบแบ่ง tile (default = ENV SHRIMP_TILED)
+    คืนค่า AnalysisResult (metrics: count / tiles, detections: box พิกัดภาพเต็ม + score)
+    """
+    imgsz = inference_imgsz("shrimp")
+    tiled = SHRIMP_TILED if tiled is None else tiled
+    if tiled:
+        # ต้องใช้ความละเอียดเต็มถึงจะเห็นตัวเล็กๆ (imgsz=0 = ไม่ย่อตอน decode)
+        decoded = decode_for_model(source, 0)
+        detected, tiles = detect_tiled(decoded, imgsz)
+    else:
+        # decode ครั้งเดียวที่ความละเอียดที่โมเดลต้องใช้ (JPEG DCT scaling)
+        decoded = decode_for_model(source, imgsz)
+        # เพิ่ม conf threshold
+        results = predict_batched("shrimp", decoded.image, conf=CONFIDENCE_THRESHOLD, imgsz=imgsz)
+        detected, tiles = detect_float_shrimp(results, decoded), 1
+    # ภาพที่ย่อใช้กับโมเดลอย่างเดียว วาดผลบนภาพเต็ม (box เป็นพิกัดภาพเต็มอยู่แล้ว)
+    image = full_resolution(source, decoded)
+    shrimp_count, info_list, detections = 0, [], []
+
+    for x1, y1, x2, y2, score in detected:
+        shrimp_count += 1
+        label = f"shrimp float id{shrimp_count} ({score:.2f})"
+        info_list.append(label)
+        detections.append({"id": shrimp_count, "box": [x1, y1, x2, y2], "score": score})
+
+        cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        cv2.putText(image, label, (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 0, 0), 3)
 
     header_text, color = ("HAVE SHRIMPS", (0, 0, 255)) if shrimp_count > 0 else ("NO SHRIMP", (0, 255, 0))
-    cv2.putText(image, header_text, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, color, 5)
+    cv2.putText(image, header_text, (20, 50),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.5, color, 5)
 
-    filename = os.path.splitext(original_name or os.path.basename(image_path))[0]
+    filename = source_stem(source, original_name)
 
-    txt_path = os.path.join(output_folder, f"{filename}.txt")
-    text = f"🦐 พบกุ้งลอยผิวน้ำ {shrimp_count} ตัว\n" + "\n".join(info_list) if shrimp_count > 0 else "🆗 ไม่พบกุ้งลอยผิวน้ำในภาพนี้"
-    with open(txt_path, "w", encoding="utf-8") as f:
-        f.write(text)
+    lines = [f"🦐 พบกุ้งลอยผิวน้ำ {shrimp_count} ตัว", *info_list] if shrimp_count > 0 else ["🆗 ไม่พบกุ้งลอยผิวน้ำในภาพนี้"]
 
     image_output_path = os.path.join(output_folder, f"{filename}.jpg")
     cv2.imwrite(image_output_path, image)
 
-    print("✅ ประมวลผลเสร็จ:", text)
-    return image_output_path, txt_path
+    result = AnalysisResult("shrimp", {"count": shrimp_count, "tiles": tiles}, detections, lines,
+                            image=image_output_path)
+    result.save_text(os.path.join(output_folder, f"{filename}.txt"))
+    print("✅ ประมวลผลเสร็จ:", result.text)
+    return result
 
 
 
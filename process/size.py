@@ -1,14 +1,28 @@
 import cv2
-import math
-from ultralytics import YOLO
+import json
 import os
 from datetime import datetime
 import numpy as np
 
-# โหลดโมเดลวัดขนาดจากโฟลเดอร์ Model/
-model_path = os.environ.get("MODEL_SIZE", os.path.join("Model", "size.pt"))
-model = YOLO(model_path)
+from process.results import AnalysisResult
+from utils.batching import predict_batched, predict_many
+from utils.image_io import decode_for_model, full_resolution, source_stem
+from utils.model_registry import inference_imgsz
+from utils.roi import roi_for, stored_roi, to_pixels
+
+# โมเดลวัดขนาดถูกโหลดแบบ lazy ผ่าน utils.model_registry (key = "size")
+# และรวม batch กับ request อื่นที่เข้ามาพร้อมกันผ่าน utils.batching
 class_id = 0
+DEFAULT_A, DEFAULT_B = 0.0089, 3.0751   # ค่า a, b ของสมการน้ำหนัก (มาตรฐานไทย)
+KEYPOINT_CONFIDENCE = 0.5
+
+# (น้ำหนักเฉลี่ยไม่เกิน g, อัตรารอดของช่วงนั้น) -> อัตรารอดสะสมคูณไล่จนถึงช่วงของน้ำหนักปัจจุบัน
+SURVIVAL_TABLE = [(2, 1.00), (5, 0.97), (10, 0.95), (20, 0.93), (30, 0.90), (50, 0.88), (9999, 0.85)]
+# (น้ำหนักเฉลี่ยไม่เกิน g, % อาหารต่อน้ำหนักกุ้ง, เบอร์อาหาร)
+FEED_PLAN = [(2, 6.0, 3), (5, 5.0, 4), (10, 4.7, '4หรือ5'), (15, 3.5, 5), (20, 3.2, 6),
+             (25, 2.8, 6), (30, 2.5, 6), (50, 2.0, 6)]
+FEED_PLAN_DEFAULT = (2.0, 6)
+KEYPOINTS_SUFFIX = ".keypoints.npz"  # keypoint ของทุกตัวที่วัด (ดู process/size_recompute.py)
 
 # ===================== Helper Function =====================
 def get_thai_datetime_string(dt):
@@ -17,15 +31,9 @@ def get_thai_datetime_string(dt):
     return f"{day:02d}/{month:02d}/{year} เวลา {time_str}"
 
 def get_feed_plan(weight_avg):
-    if weight_avg <= 2: return 6.0, 3
-    elif weight_avg <= 5: return 5.0, 4
-    elif weight_avg <= 10: return 4.7, '4หรือ5'
-    elif weight_avg <= 15: return 3.5, 5
-    elif weight_avg <= 20: return 3.2, 6
-    elif weight_avg <= 25: return 2.8, 6
-    elif weight_avg <= 30: return 2.5, 6
-    elif weight_avg <= 50: return 2.0, 6
-    else: return 2.0, 6
+    for threshold, feed_percent, feed_size in FEED_PLAN:
+        if weight_avg <= threshold: return feed_percent, feed_size
+    return FEED_PLAN_DEFAULT
 
 def calc_feed_per_day(avg_weight, n_alive, feed_percent):
     total_biomass = avg_weight * n_alive
@@ -39,10 +47,9 @@ def get_cumulative_survival(total_larvae, weight_avg):
     if weight_avg <= 0:  # ป้องกัน division error
         return 1.0, total_larvae
 
-    survival_table = [(2,1.00),(5,0.97),(10,0.95),(20,0.93),(30,0.90),(50,0.88),(9999,0.85)]
     n_current = total_larvae
     print("\n📊 คำนวนอัตรารอดแต่ละช่วง (สะสม):")
-    for threshold, rate in survival_table:
+    for threshold, rate in SURVIVAL_TABLE:
         print(f" - น้ำหนัก < {threshold} g: x {rate:.2f} (เหลือ {int(n_current*rate)})")
         n_current *= rate
         if weight_avg <= threshold: break
@@ -51,32 +58,13 @@ def get_cumulative_survival(total_larvae, weight_avg):
     print(f"✅ กุ้งรอดสะสม: {int(n_current)} ตัว\n")
     return survival_rate_cumulative, int(n_current)
 
-# ===================== Main Function =====================
-def analyze_shrimp(input_path, total_larvae=None, pond_number=None,
-                   a_weight=None, b_weight=None, pixel_per_cm=6):
-    print("\n🚀 เริ่มการวิเคราะห์กุ้ง (size.py)")
-    DEFAULT_A, DEFAULT_B = 0.0089, 3.0751
-    a, b = a_weight or DEFAULT_A, b_weight or DEFAULT_B
-    print(f"📘 ใช้ค่า a={a:.5f}, b={b:.3f} (มาตรฐานไทย)")
-
-    # ===================== PATH =====================
-    output_dir_output = os.environ.get("OUTPUT_SIZE", "/data/local_storage/size")
-    os.makedirs(output_dir_output, exist_ok=True)
-    # =================================================
-
-    now = datetime.now()
-    timestamp = now.strftime("%Y%m%d_%H%M%S")
-    thai_datetime_str = get_thai_datetime_string(now)
-    filename = os.path.splitext(os.path.basename(input_path))[0]
-
-    output_img_path_output = os.path.join(output_dir_output, f"{filename}_{timestamp}.jpg")
-    output_txt_path_output = os.path.join(output_dir_output, f"{filename}_{timestamp}.txt")
-
-    # ===================== RUN YOLO =====================
-    results = model(input_path)
-    img = cv2.imread(input_path)
-    shrimp_data = []
+def extract_shrimp_keypoints(results):
+    """คืน keypoints (head, middle, tail) ของกุ้งทุกตัวที่ผ่านเงื่อนไข class / confidence"""
+    return [kp for kp, _ in extract_shrimp_detections(results)]
 
+def extract_shrimp_detections(results):
+    """เหมือน extract_shrimp_keypoints แต่คืน (keypoints (3, 2), confidence) ของแต่ละตัว"""
+    shrimp_kps = []
     for result in results:
         if result.keypoints is None or result.boxes is None: 
             continue
@@ -87,62 +75,97 @@ def analyze_shrimp(input_path, total_larvae=None, pond_number=None,
         for i, kp in enumerate(keypoints):
             if i >= len(boxes_cls) or i >= len(boxes_conf): 
                 continue
-            if int(boxes_cls[i]) != class_id or boxes_conf[i] <= 0.5: 
+            if int(boxes_cls[i]) != class_id or boxes_conf[i] <= KEYPOINT_CONFIDENCE: 
                 continue
             if len(kp) < 3: 
                 continue
-
-            head, middle, tail = kp[0], kp[1], kp[2]
-            dist = lambda p1,p2: math.sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
-            total_length_cm = (dist(head, middle)+dist(middle, tail)) / pixel_per_cm if pixel_per_cm > 0 else 0
-            weight = a * (total_length_cm ** b) if total_length_cm > 0 else 0
-            shrimp_data.append((head[0], head[1], total_length_cm, weight))
-
-            for (x,y) in [head,middle,tail]:
-                cv2.circle(img,(int(x),int(y)),5,(0,255,0),-1)
-            cv2.line(img,(int(head[0]),int(head[1])),(int(middle[0]),int(middle[1])),(255,0,0),2)
-            cv2.line(img,(int(middle[0]),int(middle[1])),(int(tail[0]),int(tail[1])),(255,0,0),2)
-
-    # ===================== สรุปผล =====================
-    shrimp_data.sort(key=lambda p:(p[1],p[0]))
-    output_lines = []
-
-    print(f"\n🦐 พบกุ้งทั้งหมด: {len(shrimp_data)} ตัว")
-    for idx,(x,y,length_cm,weight_g) in enumerate(shrimp_data,start=1):
-        print(f" - Shrimp {idx}: {length_cm:.2f} cm / {weight_g:.2f} g")
-
-        # วาดเลข ID (แดง)
-        cv2.putText(
-            img, f"{idx}",
-            (int(x), int(y)-15),
-            cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-            (0,0,255), 2, cv2.LINE_AA
-        )
-
-        # วาดความยาว cm (ฟ้าเหมือนเส้น)
-        cv2.putText(
-            img, f"{length_cm:.2f}cm",
-            (int(x), int(y)+15),
-            cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-            (255,0,0), 1, cv2.LINE_AA
-        )
-
-        output_lines.append(f"Shrimp {idx}: {length_cm:.2f} cm / {weight_g:.2f} g")
-
-    count = len(shrimp_data)
-    avg_weight = np.mean([w for *_,w in shrimp_data]) if shrimp_data else 0
-
+            shrimp_kps.append((kp[:3], float(boxes_conf[i])))
+    return shrimp_kps
+
+# ===================== vectorized core =====================
+def lengths_cm(keypoints, pixel_per_cm) -> np.ndarray:
+    """keypoints (N, 3, 2), pixel_per_cm scalar / (N,) -> ความยาว (N,) cm (pixel_per_cm <= 0 ได้ 0)"""
+    keypoints = np.asarray(keypoints, dtype=np.float64).reshape(-1, 3, 2)
+    pixels = np.linalg.norm(np.diff(keypoints, axis=1), axis=2).sum(axis=1)
+    pixel_per_cm = np.broadcast_to(np.asarray(pixel_per_cm, dtype=np.float64), pixels.shape)
+    return np.divide(pixels, pixel_per_cm, out=np.zeros_like(pixels), where=pixel_per_cm > 0)
+
+def weights_g(lengths, a, b) -> np.ndarray:
+    """a * L^b (a, b scalar / ต่อตัว) ตัวที่ยาว 0 ได้ 0"""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    safe = np.where(lengths > 0, lengths, 1.0)
+    return np.where(lengths > 0, a * safe ** b, 0.0)
+
+def shrimp_length_cm(kp, pixel_per_cm):
+    return float(lengths_cm(kp, pixel_per_cm)[0])
+
+def measure_shrimp(results, decoded, offset=(0, 0), pixel_per_cm=6, a=DEFAULT_A, b=DEFAULT_B) -> dict:
+    """
+    ทุกตัวใน results -> array เรียงตามตำแหน่งหัว (y แล้ว x) = ลำดับ Shrimp 1..N
+        keypoints (N, 3, 2) พิกัดภาพที่ decode, keypoints_original (N, 3, 2) พิกัดภาพเต็ม (ใช้วัด / วาด)
+        conf (N,), length_cm (N,), weight_g (N,)
+    offset = มุมซ้ายบนของ ROI ที่ crop ก่อนเข้าโมเดล
+    (pixel_per_cm คาลิเบรตจากภาพเต็ม ความยาวจึงคิดบนพิกัดภาพเต็มเสมอ)
+    """
+    detections = extract_shrimp_detections(results)
+    keypoints = np.array([kp for kp, _ in detections], dtype=np.float32).reshape(-1, 3, 2)
+    keypoints += np.asarray(offset, dtype=np.float32)
+    conf = np.array([c for _, c in detections], dtype=np.float32)
+    order = np.lexsort((keypoints[:, 0, 0], keypoints[:, 0, 1]))
+    keypoints, conf = keypoints[order], conf[order]
+    keypoints_original = decoded.to_original(keypoints)
+    length = lengths_cm(keypoints_original, pixel_per_cm)
+    return {"keypoints": keypoints, "keypoints_original": keypoints_original, "conf": conf,
+            "length_cm": length, "weight_g": weights_g(length, a, b)}
+
+def feed_summary(avg_weight, total_larvae):
+    """อัตรารอด / จำนวนที่รอด / แผนอาหารจากน้ำหนักเฉลี่ย (key เดียวกับ metrics ของผลลัพธ์)"""
     survival_rate_cumulative, n_alive = get_cumulative_survival(total_larvae, avg_weight)
-
     feed_percent, feed_size = get_feed_plan(avg_weight)
     feed_g_per_day, total_weight = calc_feed_per_day(avg_weight, n_alive, feed_percent)
+    return {
+        "survival_rate": float(survival_rate_cumulative),
+        "n_alive": int(n_alive),
+        "biomass_kg": float(total_weight / 1000),
+        "feed_size": feed_size,
+        "feed_percent": feed_percent,
+        "feed_kg": float(feed_g_per_day / 1000),
+        "feed_morning_kg": float(feed_g_per_day * 0.3 / 1000),
+        "feed_evening_kg": float(feed_g_per_day * 0.7 / 1000),
+    }
+
+def pooled_stats(lengths, weights, bin_cm=None) -> dict:
+    """ค่าเฉลี่ย / CV (%) ของความยาวและน้ำหนัก + histogram ความยาว (ช่องละ bin_cm, default ENV SIZE_HIST_BIN_CM หรือ 1 cm)"""
+    lengths = np.asarray(lengths, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    bin_cm = bin_cm or float(os.environ.get("SIZE_HIST_BIN_CM") or 1.0)
+    cv = lambda x: float(x.std(ddof=1) / x.mean() * 100) if len(x) > 1 and x.mean() > 0 else 0.0
+    if len(lengths) == 0:
+        return {"count": 0, "avg_length_cm": None, "avg_weight_g": None, "cv_length_percent": None,
+                "cv_weight_percent": None, "histogram": {"bin_cm": bin_cm, "edges": [], "counts": []}}
+    low = np.floor(lengths.min() / bin_cm)
+    high = max(low + 1, np.ceil(lengths.max() / bin_cm))
+    edges = np.arange(low, high + 1) * bin_cm
+    counts, _ = np.histogram(lengths, edges)
+    return {
+        "count": int(len(lengths)),
+        "avg_length_cm": float(lengths.mean()),
+        "avg_weight_g": float(weights.mean()),
+        "cv_length_percent": cv(lengths),
+        "cv_weight_percent": cv(weights),
+        "histogram": {"bin_cm": bin_cm, "edges": edges.round(3).tolist(), "counts": counts.tolist()},
+    }
+
+def format_summary(thai_datetime_str, pond_number, lengths, weights, avg_weight, survival_rate_cumulative,
+                   n_alive, total_weight, feed_size, feed_g_per_day):
+    """ข้อความสรุป (txt) ของการวัดขนาด 1 ภาพ ใช้ร่วมกับ process/size_recompute.py"""
     morning_feed, evening_feed = feed_g_per_day*0.3, feed_g_per_day*0.7
-
-    summary_lines = [
+    return [
         f"วันที่ {thai_datetime_str}",
         f"บ่อ {pond_number}",
-        f"จำนวนกุ้งบนยอ : {count}",
-        *output_lines,
+        f"จำนวนกุ้งบนยอ : {len(lengths)}",
+        *[f"Shrimp {idx}: {length_cm:.2f} cm / {weight_g:.2f} g"
+          for idx, (length_cm, weight_g) in enumerate(zip(lengths, weights), start=1)],
         f"น้ำหนักกุ้งเฉลี่ยต่อตัว: {avg_weight:.2f} g",
         f"อัตราการรอด: {survival_rate_cumulative*100:.1f}%",
         f"จำนวนกุ้งที่เหลืออยู่: {n_alive}",
@@ -153,17 +176,203 @@ def analyze_shrimp(input_path, total_larvae=None, pond_number=None,
         f" - ตอนเย็น: {evening_feed/1000:.2f} kg",
     ]
 
+def save_keypoints(path, keypoints, confidences, **meta):
+    """keypoints (N, 3, 2) พิกัดภาพเต็ม + confidence (N,) + meta (JSON) -> .npz"""
+    meta = {"version": 1, "created": datetime.now().isoformat(timespec="seconds"), **meta}
+    np.savez_compressed(
+        path,
+        keypoints=np.asarray(keypoints, dtype=np.float32).reshape(-1, 3, 2),
+        conf=np.asarray(confidences, dtype=np.float32).reshape(-1),
+        meta=np.array(json.dumps(meta, ensure_ascii=False)),
+    )
+    return path
+
+def _prepare(source, pond_id, imgsz):
+    """
+    decode ที่ความละเอียดที่โมเดลต้องใช้ + ROI ของบ่อ
+    คืน (decoded, ภาพที่ส่งเข้าโมเดล, กรอบ ROI pixel ของ decoded.image หรือ None)
+    """
+    decoded = decode_for_model(source, imgsz, region=stored_roi("size", pond_id))
+    img = decoded.image
+    roi = roi_for("size", pond_id, img)
+    if roi is None:
+        return decoded, img, None
+    x0, y0, x1, y1 = box = to_pixels(roi, img.shape[1], img.shape[0])
+    return decoded, img[y0:y1, x0:x1].copy(), box
+
+def _annotate(source, decoded, measured, box=None):
+    """
+    วาดผลบนภาพต้นฉบับขนาดเต็ม (ภาพที่ย่อตอน decode ใช้กับโมเดลอย่างเดียว)
+    keypoint ใช้พิกัดภาพเต็ม กรอบ ROI (พิกัด decoded.image) ถูก map กลับด้วย decoded.to_original
+    """
+    img = full_resolution(source, decoded)
+    if box is not None:
+        (x0, y0), (x1, y1) = decoded.to_original([box[:2], box[2:]]).round().astype(int).tolist()
+        cv2.rectangle(img, (x0, y0), (x1 - 1, y1 - 1), (200, 200, 200), 1)
+    for idx, (kp, length_cm) in enumerate(zip(measured["keypoints_original"], measured["length_cm"]), start=1):
+        head, middle, tail = kp.astype(int).tolist()
+        for (x,y) in [head,middle,tail]:
+            cv2.circle(img,(x,y),5,(0,255,0),-1)
+        cv2.line(img,tuple(head),tuple(middle),(255,0,0),2)
+        cv2.line(img,tuple(middle),tuple(tail),(255,0,0),2)
+
+        # วาดเลข ID (แดง)
+        cv2.putText(img, f"{idx}", (head[0], head[1] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (0,0,255), 2, cv2.LINE_AA)
+        # วาดความยาว cm (ฟ้าเหมือนเส้น)
+        cv2.putText(img, f"{length_cm:.2f}cm", (head[0], head[1] + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    (255,0,0), 1, cv2.LINE_AA)
+    return img
+
+def _detections(measured, **extra) -> list:
+    return [
+        {**extra, "length_cm": float(length_cm), "weight_g": float(weight_g), "conf": round(float(conf), 4),
+         "keypoints": np.round(kp, 1).tolist()}
+        for length_cm, weight_g, conf, kp in zip(measured["length_cm"], measured["weight_g"], measured["conf"],
+                                                 measured["keypoints_original"])
+    ]
+
+def _save_measured(output_dir, base_name, measured, decoded, **meta):
+    # เก็บ keypoint (พิกัดภาพเต็ม เรียงตามลำดับ detections) ไว้คำนวณใหม่เมื่อคาลิเบรตกล้อง / เปลี่ยน a, b
+    if os.environ.get("SIZE_SAVE_KEYPOINTS", "1") == "1":
+        save_keypoints(os.path.join(output_dir, f"{base_name}{KEYPOINTS_SUFFIX}"),
+                       measured["keypoints_original"], measured["conf"],
+                       image=f"{base_name}.jpg", image_size=list(decoded.original_size), **meta)
+
+# ===================== Main Function =====================
+def analyze_shrimp(input_path, total_larvae=None, pond_number=None,
+                   a_weight=None, b_weight=None, pixel_per_cm=6, original_name=None, pond_id=None):
+    """
+    input_path = path / bytes ของไฟล์ภาพ / ndarray BGR (ถ้าไม่ใช่ path ควรส่ง original_name มาด้วย)
+    pond_id    = ใช้ ROI ของบ่อนี้ (crop เฉพาะถาดก่อนเข้าโมเดล ดู utils/roi.py)
+    คืนค่า AnalysisResult (metrics: ค่าเฉลี่ย / อัตรารอด / แผนอาหาร, detections: ความยาว / น้ำหนัก / keypoints ต่อตัว)
+    """
+    print("\n🚀 เริ่มการวิเคราะห์กุ้ง (size.py)")
+    a, b = a_weight or DEFAULT_A, b_weight or DEFAULT_B
+    print(f"📘 ใช้ค่า a={a:.5f}, b={b:.3f} (มาตรฐานไทย)")
+
+    # ===================== PATH =====================
+    output_dir_output = os.environ.get("OUTPUT_SIZE", "/data/local_storage/size")
+    os.makedirs(output_dir_output, exist_ok=True)
+    # =================================================
+
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
+    thai_datetime_str = get_thai_datetime_string(now)
+    base_name = f"{source_stem(input_path, original_name)}_{timestamp}"
+    output_img_path_output = os.path.join(output_dir_output, f"{base_name}.jpg")
+
+    # ===================== RUN YOLO =====================
+    # ถ้ามี ROI: crop เฉพาะถาด แล้วบวก offset กลับเป็นพิกัดภาพที่ decode ก่อน map เป็นภาพเต็ม
+    imgsz = inference_imgsz("size")
+    decoded, crop, box = _prepare(input_path, pond_id, imgsz)
+    results = predict_batched("size", crop, imgsz=imgsz)
+    measured = measure_shrimp(results, decoded, box[:2] if box else (0, 0), pixel_per_cm, a, b)
+    img = _annotate(input_path, decoded, measured, box)
+
+    # ===================== สรุปผล =====================
+    lengths, weights = measured["length_cm"], measured["weight_g"]
+    print(f"\n🦐 พบกุ้งทั้งหมด: {len(lengths)} ตัว")
+    for idx, (length_cm, weight_g) in enumerate(zip(lengths, weights), start=1):
+        print(f" - Shrimp {idx}: {length_cm:.2f} cm / {weight_g:.2f} g")
+
+    avg_weight = float(weights.mean()) if len(weights) else 0
+    plan = feed_summary(avg_weight, total_larvae)
+    summary_lines = format_summary(thai_datetime_str, pond_number, lengths, weights, avg_weight,
+                                   plan["survival_rate"], plan["n_alive"], plan["biomass_kg"] * 1000,
+                                   plan["feed_size"], plan["feed_kg"] * 1000)
+    metrics = {
+        "count": len(lengths),
+        "avg_length_cm": float(lengths.mean()) if len(lengths) else None,
+        "avg_weight_g": avg_weight if len(weights) else None,
+        **plan,
+        "pixel_per_cm": pixel_per_cm,
+        "a": a,
+        "b": b,
+    }
+
     # ===================== Save Output =====================
     cv2.imwrite(output_img_path_output, img)
-    with open(output_txt_path_output,"w",encoding="utf-8") as f:
-        f.write("\n".join(summary_lines))
+    result = AnalysisResult("size", metrics, _detections(measured), summary_lines, image=output_img_path_output)
+    result.save_text(os.path.join(output_dir_output, f"{base_name}.txt"))
+    _save_measured(output_dir_output, base_name, measured, decoded, pixel_per_cm=pixel_per_cm, a=a, b=b,
+                   total_larvae=total_larvae, pond_number=pond_number, pond_id=pond_id,
+                   source=source_stem(input_path, original_name))
 
     print(f"\n✅ บันทึกรูปภาพ: {output_img_path_output}")
-    print(f"✅ บันทึกผลลัพธ์: {output_txt_path_output}\n")
-
-    return output_img_path_output, output_txt_path_output
-
+    if result.text_path:
+        print(f"✅ บันทึกผลลัพธ์: {result.text_path}\n")
 
+    return result
 
+def session_lines(stats, photo_counts):
+    """บรรทัดเพิ่มเติมของรอบสุ่มวัด: จำนวนภาพ / ความยาวเฉลี่ย / CV / การกระจายขนาด"""
+    lines = [
+        f"จำนวนภาพในรอบ: {len(photo_counts)} ภาพ ({' / '.join(str(n) for n in photo_counts)} ตัว)",
+    ]
+    if stats["count"]:
+        lines += [
+            f"ความยาวเฉลี่ย: {stats['avg_length_cm']:.2f} cm (CV {stats['cv_length_percent']:.1f}%)",
+            f"CV น้ำหนัก: {stats['cv_weight_percent']:.1f}%",
+            "การกระจายขนาด:",
+        ]
+        edges, counts = stats["histogram"]["edges"], stats["histogram"]["counts"]
+        lines += [f" - {low:.1f}-{high:.1f} cm: {n} ตัว" for low, high, n in zip(edges[:-1], edges[1:], counts)]
+    return lines
+
+def analyze_sampling_session(sources, total_larvae=None, pond_number=None, a_weight=None, b_weight=None,
+                             pixel_per_cm=6, original_names=None, pond_id=None):
+    """
+    รอบสุ่มวัด 1 รอบ (ยกยอหลายครั้ง): sources = list ของ path / bytes / ndarray ของทุกภาพในรอบ
+    ส่งทุกภาพเข้าโมเดลพร้อมกัน (utils.batching.predict_many) แล้วรวมทุกตัวเป็นชุดเดียว
+    -> ค่าเฉลี่ย / CV / histogram + อัตรารอดและแผนอาหารชุดเดียวจากน้ำหนักเฉลี่ยรวม (ไม่ใช่ต่อภาพ)
+    คืนค่า AnalysisResult (image = list ภาพ annotate ของแต่ละภาพ, detections มี photo = ลำดับภาพ เริ่ม 1)
+    """
+    print(f"\n🚀 เริ่มวิเคราะห์รอบสุ่มวัด {len(sources)} ภาพ (size.py)")
+    a, b = a_weight or DEFAULT_A, b_weight or DEFAULT_B
+    original_names = original_names or [None] * len(sources)
 
+    output_dir_output = os.environ.get("OUTPUT_SIZE", "/data/local_storage/size")
+    os.makedirs(output_dir_output, exist_ok=True)
+    now = datetime.now()
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
 
+    imgsz = inference_imgsz("size")
+    prepared = [_prepare(source, pond_id, imgsz) for source in sources]
+    results = predict_many("size", [crop for _, crop, _ in prepared], imgsz=imgsz)
+
+    image_paths, detections, photo_counts, lengths, weights = [], [], [], [], []
+    for photo, ((decoded, _, box), result, source, name) in enumerate(
+            zip(prepared, results, sources, original_names), start=1):
+        measured = measure_shrimp([result], decoded, box[:2] if box else (0, 0), pixel_per_cm, a, b)
+        img = _annotate(source, decoded, measured, box)
+        base_name = f"{source_stem(source, name)}_{timestamp}_{photo}"
+        image_path = os.path.join(output_dir_output, f"{base_name}.jpg")
+        cv2.imwrite(image_path, img)
+        _save_measured(output_dir_output, base_name, measured, decoded, pixel_per_cm=pixel_per_cm, a=a, b=b,
+                       total_larvae=total_larvae, pond_number=pond_number, pond_id=pond_id,
+                       source=source_stem(source, name), session=timestamp)
+
+        image_paths.append(image_path)
+        detections += _detections(measured, photo=photo)
+        photo_counts.append(len(measured["length_cm"]))
+        lengths.append(measured["length_cm"])
+        weights.append(measured["weight_g"])
+
+    lengths = np.concatenate(lengths) if lengths else np.zeros(0)
+    weights = np.concatenate(weights) if weights else np.zeros(0)
+    stats = pooled_stats(lengths, weights)
+    avg_weight = stats["avg_weight_g"] or 0
+    plan = feed_summary(avg_weight, total_larvae)
+    print(f"🦐 รวม {stats['count']} ตัวจาก {len(sources)} ภาพ, เฉลี่ย {avg_weight:.2f} g")
+
+    lines = format_summary(get_thai_datetime_string(now), pond_number, lengths, weights, avg_weight,
+                           plan["survival_rate"], plan["n_alive"], plan["biomass_kg"] * 1000,
+                           plan["feed_size"], plan["feed_kg"] * 1000)
+    lines += session_lines(stats, photo_counts)
+    metrics = {**stats, **plan, "photos": len(sources), "photo_counts": photo_counts,
+               "pixel_per_cm": pixel_per_cm, "a": a, "b": b}
+
+    result = AnalysisResult("size", metrics, detections, lines, image=image_paths)
+    result.save_text(os.path.join(output_dir_output, f"session_pond{pond_id}_{timestamp}.txt"))
+    return result
@@ -0,0 +1,174 @@
+"""
+คำนวณผลวัดขนาดกุ้งใหม่จาก keypoint ที่บันทึกไว้ (*.keypoints.npz ดู save_keypoints ใน process/size.py)
+ไม่ต้องโหลดภาพ / inference ซ้ำ -> คาลิเบรต pixel_per_cm ใหม่ หรือเปลี่ยน a, b แล้วคิดย้อนหลังทั้งเดือนได้ทันที
+
+ไฟล์ {filename}_{timestamp}.keypoints.npz:
+    keypoints (N, 3, 2) float32  head / middle / tail พิกัดภาพเต็ม เรียงตามลำดับ Shrimp 1..N ในผลลัพธ์
+    conf      (N,) float32       confidence ของแต่ละตัว
+    meta      JSON (pixel_per_cm, a, b, total_larvae, pond_number, pond_id, source, image, image_size, created)
+
+recompute() โหลดทุกไฟล์ต่อกันเป็น array เดียวแล้วคิดทุกขั้นแบบ vectorized:
+    ความยาว -> น้ำหนัก (a * L^b) -> น้ำหนักเฉลี่ยต่อภาพ (bincount) -> อัตรารอดสะสม / เบอร์อาหาร (searchsorted)
+ค่าที่ไม่ได้ override ใช้ค่าที่บันทึกไว้ตอนวิเคราะห์ของแต่ละไฟล์ (ผลจึงตรงกับผลเดิม)
+
+ตั้งค่าผ่าน ENV:
+    SIZE_SAVE_KEYPOINTS   1 = บันทึก .npz ทุกครั้งที่วิเคราะห์ (default 1)
+CLI: python -m utils.recompute_size (ดู utils/recompute_size.py)
+"""
+
+import glob
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from process.size import (DEFAULT_A, DEFAULT_B, FEED_PLAN, FEED_PLAN_DEFAULT, KEYPOINTS_SUFFIX, SURVIVAL_TABLE,
+                          format_summary, get_thai_datetime_string, lengths_cm, weights_g)
+
+DEFAULT_TOTAL_LARVAE = 10000
+
+_SURVIVAL_THRESHOLDS = np.array([threshold for threshold, _ in SURVIVAL_TABLE], dtype=np.float64)
+_SURVIVAL_CUMULATIVE = np.cumprod([rate for _, rate in SURVIVAL_TABLE])
+_FEED_THRESHOLDS = np.array([threshold for threshold, _, _ in FEED_PLAN], dtype=np.float64)
+_FEED_PERCENT = np.array([percent for _, percent, _ in FEED_PLAN] + [FEED_PLAN_DEFAULT[0]], dtype=np.float64)
+_FEED_SIZE = [size for _, _, size in FEED_PLAN] + [FEED_PLAN_DEFAULT[1]]
+
+
+def load_keypoints(path: str) -> dict:
+    """คืน {"keypoints", "conf", "meta" (dict)}"""
+    with np.load(path) as data:
+        loaded = {"keypoints": data["keypoints"].reshape(-1, 3, 2), "conf": data["conf"]}
+        loaded["meta"] = json.loads(str(data["meta"]))
+    return loaded
+
+
+def find_keypoints(directory: str, since: str = None, until: str = None, pond_id=None) -> list:
+    """path ของ .keypoints.npz ที่สร้างในช่วงวันที่ [since, until] (YYYY-MM-DD, ตาม meta "created") ของบ่อ pond_id"""
+    paths = []
+    for path in sorted(glob.glob(os.path.join(directory, f"*{KEYPOINTS_SUFFIX}"))):
+        if since or until or pond_id is not None:
+            meta = load_keypoints(path)["meta"]
+            day = meta.get("created", "")[:10]
+            if (since and day < since) or (until and day > until):
+                continue
+            if pond_id is not None and str(meta.get("pond_id")) != str(pond_id):
+                continue
+        paths.append(path)
+    return paths
+
+
+# ===================== vectorized core =====================
+def cumulative_survival(avg_weight, total_larvae=DEFAULT_TOTAL_LARVAE):
+    """(อัตรารอดสะสม, จำนวนที่รอด int) แบบเดียวกับ get_cumulative_survival แต่รับ array"""
+    avg_weight = np.asarray(avg_weight, dtype=np.float64)
+    total_larvae = np.asarray(total_larvae, dtype=np.float64)
+    idx = np.minimum(np.searchsorted(_SURVIVAL_THRESHOLDS, avg_weight, side="left"), len(_SURVIVAL_THRESHOLDS) - 1)
+    rate = np.where(avg_weight <= 0, 1.0, _SURVIVAL_CUMULATIVE[idx])
+    return rate, (total_larvae * rate).astype(np.int64)
+
+
+def feed_plan(avg_weight):
+    """(% อาหารต่อน้ำหนักกุ้ง (N,), เบอร์อาหาร list) แบบเดียวกับ get_feed_plan แต่รับ array"""
+    idx = np.searchsorted(_FEED_THRESHOLDS, np.asarray(avg_weight, dtype=np.float64), side="left")
+    return _FEED_PERCENT[idx], [_FEED_SIZE[i] for i in np.atleast_1d(idx)]
+
+
+def load_batch(paths: list) -> dict:
+    """ต่อ keypoint ทุกไฟล์เป็น array เดียว + file_index (M,) บอกว่าแต่ละตัวมาจากไฟล์ไหน"""
+    loaded = [load_keypoints(path) for path in paths]
+    counts = np.array([len(item["conf"]) for item in loaded], dtype=np.int64)
+    return {
+        "paths": list(paths),
+        "metas": [item["meta"] for item in loaded],
+        "keypoints": (np.concatenate([item["keypoints"] for item in loaded]) if loaded
+                      else np.zeros((0, 3, 2), dtype=np.float32)),
+        "conf": (np.concatenate([item["conf"] for item in loaded]) if loaded
+                 else np.zeros(0, dtype=np.float32)),
+        "file_index": np.repeat(np.arange(len(loaded)), counts),
+    }
+
+
+def _per_file(metas: list, key: str, override, default) -> np.ndarray:
+    if override is not None:
+        return np.full(len(metas), float(override))
+    return np.array([meta.get(key) if meta.get(key) is not None else default for meta in metas], dtype=np.float64)
+
+
+def recompute(batch: dict, pixel_per_cm: float = None, a: float = None, b: float = None,
+              total_larvae: int = None, min_conf: float = None) -> list:
+    """
+    ผลใหม่ต่อไฟล์ (เรียงตาม batch["paths"]) ค่าที่เป็น None ใช้ค่าใน meta ของแต่ละไฟล์
+    min_conf = ตัดตัวที่ confidence ต่ำกว่านี้ออก (ต้องสูงกว่าเกณฑ์ตอนวิเคราะห์ถึงจะมีผล)
+    """
+    metas = batch["metas"]
+    n_files = len(metas)
+    file_index = batch["file_index"]
+    keep = np.ones(len(file_index), dtype=bool) if min_conf is None else batch["conf"] > min_conf
+    file_index = file_index[keep]
+
+    ppcm = _per_file(metas, "pixel_per_cm", pixel_per_cm, 6)
+    a_file = _per_file(metas, "a", a, DEFAULT_A)
+    b_file = _per_file(metas, "b", b, DEFAULT_B)
+    larvae = _per_file(metas, "total_larvae", total_larvae, DEFAULT_TOTAL_LARVAE)
+
+    lengths = lengths_cm(batch["keypoints"][keep], ppcm[file_index])
+    weights = weights_g(lengths, a_file[file_index], b_file[file_index])
+
+    counts = np.bincount(file_index, minlength=n_files)
+    sums = np.bincount(file_index, weights=weights, minlength=n_files)
+    avg_weight = np.divide(sums, counts, out=np.zeros(n_files), where=counts > 0)
+
+    survival, n_alive = cumulative_survival(avg_weight, larvae)
+    feed_percent, feed_size = feed_plan(avg_weight)
+    biomass = avg_weight * n_alive
+    feed_g = biomass * feed_percent / 100
+
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    results = []
+    for i, meta in enumerate(metas):
+        part = slice(bounds[i], bounds[i + 1])
+        results.append({
+            "path": batch["paths"][i],
+            "source": meta.get("source"),
+            "created": meta.get("created"),
+            "pond_number": meta.get("pond_number"),
+            "pond_id": meta.get("pond_id"),
+            "pixel_per_cm": float(ppcm[i]),
+            "a": float(a_file[i]),
+            "b": float(b_file[i]),
+            "count": int(counts[i]),
+            "lengths_cm": lengths[part].tolist(),
+            "weights_g": weights[part].tolist(),
+            "avg_weight_g": float(avg_weight[i]),
+            "survival_rate": float(survival[i]),
+            "n_alive": int(n_alive[i]),
+            "biomass_kg": float(biomass[i] / 1000),
+            "feed_size": feed_size[i],
+            "feed_kg": float(feed_g[i] / 1000),
+            "feed_morning_kg": float(feed_g[i] * 0.3 / 1000),
+            "feed_evening_kg": float(feed_g[i] * 0.7 / 1000),
+        })
+    return results
+
+
+def write_result(result: dict, output_txt_path: str) -> str:
+    """เขียน txt สรุปรูปแบบเดียวกับ analyze_shrimp จากผลของ recompute()"""
+    created = result.get("created")
+    thai_datetime_str = get_thai_datetime_string(datetime.fromisoformat(created) if created else datetime.now())
+    lines = format_summary(thai_datetime_str, result["pond_number"], result["lengths_cm"], result["weights_g"],
+                           result["avg_weight_g"], result["survival_rate"], result["n_alive"],
+                           result["biomass_kg"] * 1000, result["feed_size"], result["feed_kg"] * 1000)
+    lines.append(f"🔁 คำนวณใหม่: pixel_per_cm={result['pixel_per_cm']:g}, a={result['a']:.5f}, b={result['b']:.3f}")
+    with open(output_txt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return output_txt_path
+
+
+def recompute_files(paths: list, write: bool = False, **calibration) -> list:
+    """recompute ทุกไฟล์ใน paths ถ้า write=True เขียน {base}.recomputed.txt ข้างไฟล์เดิมด้วย"""
+    results = recompute(load_batch(paths), **calibration)
+    if write:
+        for result in results:
+            write_result(result, result["path"][:-len(KEYPOINTS_SUFFIX)] + ".recomputed.txt")
+    return results
@@ -0,0 +1,180 @@
+"""
+Tracker engines สำหรับ din (กุ้งดิ้น)
+ทุก engine ใช้ interface เดียวกับ deep_sort_realtime.DeepSort:
+    tracker.update_tracks([([left, top, w, h], score, cls), ...], frame=frame) -> list ของ track
+    track.track_id, track.is_confirmed(), track.to_ltrb()
+TrackingSession ใน process/din.py จึงใช้ logic การขยับชุดเดิมได้กับทุก engine
+
+engine ที่มี (เลือกด้วย ENV DIN_TRACKER หรือพารามิเตอร์ tracker ของ analyze_video):
+    deepsort  DeepSort + appearance embedder (default, แบบเดิม)
+    sort      IoU + Kalman (SORT-style) ไม่มี embedder -> เร็วกว่ามากบน CPU
+              กุ้งบนถาดตัวเล็ก หน้าตาคล้ายกัน และขยับช้า appearance feature จึงช่วยได้น้อย
+"""
+
+import os
+
+import numpy as np
+
+TRACKER_MAX_AGE = 30
+TRACKER_N_INIT = 3
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU ระหว่าง box ชุด a (N,4) กับชุด b (M,4) แบบ ltrb -> (N,M)"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(iou: np.ndarray, threshold: float):
+    """จับคู่ (row, col) จาก IoU สูงสุดลงมาจนต่ำกว่า threshold"""
+    matches = []
+    if iou.size == 0:
+        return matches
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows, used_cols = set(), set()
+    for i in order:
+        r, c = int(rows[i]), int(cols[i])
+        if r in used_rows or c in used_cols:
+            continue
+        matches.append((r, c))
+        used_rows.add(r)
+        used_cols.add(c)
+    return matches
+
+
+# --------------------------
+# SORT-style (IoU + Kalman)
+# --------------------------
+class _KalmanBox:
+    """Kalman filter ความเร็วคงที่ของ state [cx, cy, w, h, vcx, vcy, vw, vh] (noise ปรับตามขนาด box แบบ DeepSort)"""
+
+    STD_POSITION = 1.0 / 20
+    STD_VELOCITY = 1.0 / 160
+
+    _F = np.eye(8)
+    _F[:4, 4:] = np.eye(4)
+    _H = np.eye(4, 8)
+
+    def __init__(self, box_cxcywh: np.ndarray):
+        self.mean = np.r_[box_cxcywh, np.zeros(4)]
+        size = max(box_cxcywh[2], box_cxcywh[3])
+        std = np.r_[[2 * self.STD_POSITION * size] * 4, [10 * self.STD_VELOCITY * size] * 4]
+        self.cov = np.diag(std ** 2)
+
+    def predict(self):
+        size = max(self.mean[2], self.mean[3])
+        q = np.diag(np.r_[[self.STD_POSITION * size] * 4, [self.STD_VELOCITY * size] * 4] ** 2)
+        self.mean = self._F @ self.mean
+        self.cov = self._F @ self.cov @ self._F.T + q
+
+    def update(self, box_cxcywh: np.ndarray):
+        size = max(self.mean[2], self.mean[3])
+        r = np.diag(np.full(4, (self.STD_POSITION * size) ** 2))
+        s = self._H @ self.cov @ self._H.T + r
+        gain = np.linalg.solve(s, self._H @ self.cov).T
+        self.mean = self.mean + gain @ (box_cxcywh - self._H @ self.mean)
+        self.cov = self.cov - gain @ self._H @ self.cov
+
+    def ltrb(self) -> np.ndarray:
+        cx, cy, w, h = self.mean[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+
+def _ltwh_to_cxcywh(ltwh) -> np.ndarray:
+    left, top, w, h = ltwh
+    return np.array([left + w / 2, top + h / 2, w, h], dtype=np.float64)
+
+
+class SortTrack:
+    def __init__(self, track_id: int, ltwh, score: float, n_init: int):
+        self.track_id = track_id
+        self.det_conf = score
+        self.hits = 1
+        self.time_since_update = 0
+        self._n_init = n_init
+        self._kf = _KalmanBox(_ltwh_to_cxcywh(ltwh))
+
+    def is_confirmed(self) -> bool:
+        return self.hits >= self._n_init
+
+    def to_ltrb(self) -> np.ndarray:
+        return self._kf.ltrb()
+
+
+class SortTracker:
+    """
+    SORT-style tracker: Kalman predict -> จับคู่ด้วย IoU (greedy) -> update
+    track ใหม่ต้องเจอ n_init ครั้งติดกันถึงจะ confirmed, หายเกิน max_age ครั้งถูกลบ (ค่าเดียวกับ DeepSort เดิม)
+    """
+
+    def __init__(self, max_age: int = TRACKER_MAX_AGE, n_init: int = TRACKER_N_INIT, iou_threshold: float = 0.3):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self._next_id = 1
+
+    def update_tracks(self, detections, frame=None) -> list:
+        for track in self.tracks:
+            track._kf.predict()
+            track.time_since_update += 1
+
+        det_boxes = np.array([[l, t, l + w, t + h] for (l, t, w, h), _, _ in detections], dtype=np.float64)
+        det_boxes = det_boxes.reshape(-1, 4)
+        track_boxes = np.array([track.to_ltrb() for track in self.tracks]).reshape(-1, 4)
+
+        matched_dets = set()
+        for t_idx, d_idx in greedy_match(iou_matrix(track_boxes, det_boxes), self.iou_threshold):
+            track = self.tracks[t_idx]
+            ltwh, score, _ = detections[d_idx]
+            track._kf.update(_ltwh_to_cxcywh(ltwh))
+            track.det_conf = score
+            track.hits += 1
+            track.time_since_update = 0
+            matched_dets.add(d_idx)
+
+        # track ที่ยังไม่ confirmed แล้วหลุด -> ลบทันที, confirmed แล้วรอได้ไม่เกิน max_age
+        self.tracks = [
+            track for track in self.tracks
+            if track.time_since_update == 0
+            or (track.is_confirmed() and track.time_since_update <= self.max_age)
+        ]
+
+        for d_idx, (ltwh, score, _) in enumerate(detections):
+            if d_idx not in matched_dets:
+                self.tracks.append(SortTrack(self._next_id, ltwh, score, self.n_init))
+                self._next_id += 1
+        return list(self.tracks)
+
+
+# --------------------------
+# Registry
+# --------------------------
+def _deepsort():
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+    return DeepSort(max_age=TRACKER_MAX_AGE, n_init=TRACKER_N_INIT, max_cosine_distance=0.3)
+
+
+TRACKERS = {
+    "deepsort": _deepsort,
+    "sort": SortTracker,
+}
+
+
+def tracker_name(name: str = None) -> str:
+    """ชื่อ engine ที่จะใช้ (default = ENV DIN_TRACKER หรือ deepsort)"""
+    name = (name or os.environ.get("DIN_TRACKER") or "deepsort").lower()
+    if name not in TRACKERS:
+        raise ValueError(f"❌ Unknown tracker: {name} (ใช้ได้: {', '.join(TRACKERS)})")
+    return name
+
+
+def make_tracker(name: str = None):
+    return TRACKERS[tracker_name(name)]()
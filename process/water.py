@@ -1,33 +1,38 @@
-import cv2
 import os
-from ultralytics import YOLO
 
-# โหลดโมเดลสีน้ำจากโฟลเดอร์ Model/
-model_path = os.environ.get("MODEL_WATER", os.path.join("Model", "water_class.pt"))
-model = YOLO(model_path)
+from process.results import AnalysisResult
+from utils.batching import predict_batched
+from utils.image_io import decode_for_model, save_original, source_stem
+from utils.model_registry import inference_imgsz
+
+# โมเดลสีน้ำถูกโหลดแบบ lazy ผ่าน utils.model_registry (key = "water")
+# และรวม batch กับ request อื่นที่เข้ามาพร้อมกันผ่าน utils.batching
 
 output_folder = os.environ.get("OUTPUT_WATER", "/data/local_storage/water")
 os.makedirs(output_folder, exist_ok=True)
 
-def analyze_water(image_path: str, original_name: str = None):
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"❌ ไม่พบภาพที่ path: {image_path}")
+def analyze_water(source, original_name: str = None):
+    """
+    source = path / bytes ของไฟล์ภาพ / ndarray BGR (ถ้าไม่ใช่ path ควรส่ง original_name มาด้วย)
+    คืนค่า AnalysisResult (metrics: class, confidence)
+    """
+    # classify resize ด้านสั้นเป็น imgsz -> decode ให้ด้านสั้นไม่ต่ำกว่า imgsz ก็พอ
+    imgsz = inference_imgsz("water")
+    image = decode_for_model(source, imgsz, fit="short").image
 
-    results = model.predict(image_path)
+    results = predict_batched("water", image, imgsz=imgsz)
     top1_id = results[0].probs.top1
     class_name = results[0].names[top1_id]
     confidence = results[0].probs.data[top1_id].item()
     result_text = f"{class_name} ({confidence * 100:.0f}%)"
 
-    base_filename = os.path.splitext(original_name or os.path.basename(image_path))[0]
-
-    txt_path = os.path.join(output_folder, f"{base_filename}.txt")
-    with open(txt_path, "w", encoding="utf-8") as f:
-        f.write(result_text)
+    base_filename = source_stem(source, original_name)
 
-    image_output_path = os.path.join(output_folder, f"{base_filename}.jpg")
-    cv2.imwrite(image_output_path, image)
+    # ภาพผลลัพธ์ = ภาพต้นฉบับขนาดเต็ม (ภาพที่ decode ไว้เข้าโมเดลอาจเล็กแค่ 1/8)
+    image_output_path = save_original(source, os.path.join(output_folder, f"{base_filename}.jpg"))
 
+    metrics = {"class": class_name, "confidence": float(confidence)}
+    result = AnalysisResult("water", metrics, [metrics], [result_text], image=image_output_path)
+    result.save_text(os.path.join(output_folder, f"{base_filename}.txt"))
     print(f"✅ วิเคราะห์สีน้ำ: {result_text}")
-    return image_output_path, txt_path
+    return result
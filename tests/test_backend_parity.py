@@ -0,0 +1,147 @@
+"""
+ทดสอบ utils.backend_parity.compare_results ด้วย Results จำลอง (ไม่ต้องมีโมเดล / ภาพจริง / torch)
+และ check_backend ว่าเรียก predict ผ่านเส้นทางเดียวกับ analyzer (decode_for_model + inference_imgsz)
+object จำลองมีเฉพาะ attribute ที่ compare_results ใช้: boxes.xyxy / boxes.conf, keypoints.xy, probs.data / probs.top1
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils.backend_parity import compare_results
+
+
+class _Tensor:
+    """แทน torch.Tensor: รองรับ .cpu().numpy() และ index ด้วย array"""
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+def detect_result(boxes, conf, keypoints=None):
+    result = SimpleNamespace(probs=None, boxes=None, keypoints=None)
+    if boxes is not None:
+        result.boxes = SimpleNamespace(xyxy=_Tensor(np.reshape(boxes, (-1, 4))), conf=_Tensor(conf))
+    if keypoints is not None:
+        result.keypoints = SimpleNamespace(xy=_Tensor(keypoints))
+    return result
+
+
+def classify_result(probs):
+    probs = np.asarray(probs, dtype=np.float32)
+    return SimpleNamespace(probs=SimpleNamespace(data=_Tensor(probs), top1=int(probs.argmax())),
+                           boxes=None, keypoints=None)
+
+
+BOXES = [[10, 10, 50, 60], [100, 120, 180, 200]]
+KEYPOINTS = [[[12, 15], [30, 35], [48, 58]], [[105, 125], [140, 160], [175, 195]]]
+
+
+def test_detect_within_tolerance_matches_boxes_regardless_of_order():
+    ref = detect_result(BOXES, [0.9, 0.8])
+    # backend อื่นเรียงลำดับต่างกันและพิกัดคลาดเล็กน้อย -> ต้องจับคู่ด้วย IoU แล้วผ่าน
+    other = detect_result(np.array(BOXES)[::-1] + 1.5, [0.78, 0.88])
+
+    report = compare_results(ref, other, tol_px=3.0, tol_conf=0.05)
+
+    assert report["ok"]
+    assert report["count_ref"] == report["count_other"] == 2
+    assert report["max_box_diff_px"] == pytest.approx(1.5)
+    assert report["max_conf_diff"] == pytest.approx(0.02, abs=1e-6)
+
+
+@pytest.mark.parametrize("shift, conf_delta", [(5.0, 0.0), (0.0, 0.1)])
+def test_detect_outside_tolerance_fails(shift, conf_delta):
+    ref = detect_result(BOXES, [0.9, 0.8])
+    other = detect_result(np.array(BOXES) + shift, [0.9 - conf_delta, 0.8])
+
+    assert not compare_results(ref, other, tol_px=3.0, tol_conf=0.05)["ok"]
+
+
+def test_detect_count_mismatch_fails():
+    ref = detect_result(BOXES, [0.9, 0.8])
+    other = detect_result(BOXES[:1], [0.9])
+
+    report = compare_results(ref, other)
+
+    assert not report["ok"]
+    assert (report["count_ref"], report["count_other"]) == (2, 1)
+
+
+def test_detect_no_boxes_on_one_side_fails():
+    report = compare_results(detect_result(BOXES, [0.9, 0.8]), detect_result(None, None))
+
+    assert not report["ok"]
+    assert report["count_other"] == 0
+    assert "max_box_diff_px" not in report
+
+
+def test_detect_both_empty_passes():
+    assert compare_results(detect_result(None, None), detect_result(None, None))["ok"]
+
+
+def test_pose_keypoint_tolerance():
+    ref = detect_result(BOXES, [0.9, 0.8], KEYPOINTS)
+    close = detect_result(BOXES, [0.9, 0.8], np.array(KEYPOINTS) + 1.0)
+    far = detect_result(BOXES, [0.9, 0.8], np.array(KEYPOINTS) + [[[0, 0], [6, 0], [0, 0]]] * 2)
+
+    report = compare_results(ref, close, tol_px=3.0)
+    assert report["ok"]
+    assert report["max_kpt_diff_px"] == pytest.approx(1.0)
+
+    report = compare_results(ref, far, tol_px=3.0)
+    assert not report["ok"]
+    assert report["max_kpt_diff_px"] == pytest.approx(6.0)
+
+
+def test_classify_within_tolerance_passes():
+    report = compare_results(classify_result([0.1, 0.7, 0.2]), classify_result([0.11, 0.69, 0.2]), tol_prob=0.02)
+
+    assert report["ok"]
+    assert report["top1_agree"]
+    assert report["max_prob_diff"] == pytest.approx(0.01, abs=1e-6)
+
+
+def test_classify_top1_disagreement_fails_even_when_probs_are_close():
+    report = compare_results(classify_result([0.49, 0.51]), classify_result([0.51, 0.49]), tol_prob=0.05)
+
+    assert not report["top1_agree"]
+    assert not report["ok"]
+
+
+def test_classify_prob_diff_over_tolerance_fails():
+    report = compare_results(classify_result([0.2, 0.8]), classify_result([0.3, 0.7]), tol_prob=0.02)
+
+    assert report["top1_agree"]
+    assert not report["ok"]
+
+
+def test_check_backend_uses_serving_imgsz_and_decode(monkeypatch, tmp_path):
+    import cv2
+
+    from utils import backend_parity
+
+    image_path = str(tmp_path / "water.jpg")
+    cv2.imwrite(image_path, np.zeros((1200, 1600, 3), dtype=np.uint8))
+    loaded, calls = [], []
+    monkeypatch.setattr(backend_parity, "get_model_path", lambda key: f"/models/{key}.pt")
+    monkeypatch.setattr(backend_parity.registry, "reload", lambda key, path: loaded.append(path))
+    monkeypatch.setattr(backend_parity, "inference_imgsz", lambda key: 224)
+
+    def fake_predict(key, image, **kwargs):
+        calls.append((image.shape, kwargs))
+        return [classify_result([0.1, 0.9])]
+
+    monkeypatch.setattr(backend_parity, "predict_batched", fake_predict)
+
+    assert backend_parity.check_backend("water", "onnx", [image_path])
+    assert loaded == ["/models/water.pt", "/models/water.onnx"]
+    # water decode แบบ fit="short": 1200 / 4 = 300 >= 224 -> JPEG ย่อ 1/4 (ไม่ใช่ภาพเต็มจาก path)
+    assert calls == [((300, 400, 3), {"imgsz": 224})] * 2
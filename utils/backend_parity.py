@@ -0,0 +1,140 @@
+"""
+ตรวจความตรงกันของผลลัพธ์ระหว่าง backend (torch vs onnx / openvino)
+เทียบ boxes, keypoints และ class probabilities ภาพต่อภาพภายใน tolerance ที่กำหนด
+คืน exit code 1 ถ้ามีภาพไหนเกิน tolerance (ใช้รันก่อน deploy backend ใหม่ได้)
+รันผ่านเส้นทางเดียวกับ analyzer: โหลดผ่าน registry, decode_for_model + predict_batched ที่ inference_imgsz
+(ไม่ใช่ model.predict(path) ที่ imgsz default) ผลที่เทียบจึงเป็นผลที่ serving ได้จริง
+ตรรกะของ compare_results ถูกทดสอบอัตโนมัติใน tests/test_backend_parity.py (Results จำลอง ไม่ต้องมีโมเดล)
+
+ตัวอย่าง:
+    python -m utils.backend_parity --models shrimp water --backends onnx openvino
+    python -m utils.backend_parity --models size --images input_raspi1/*.jpg --tol-px 2
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from utils.batching import predict_batched
+from utils.export_models import sample_images
+from utils.image_io import decode_for_model
+from utils.loader_model import BACKENDS, MODEL_FILES, get_backend_artifact_path, get_model_path
+from utils.model_registry import inference_imgsz, registry
+
+# วิธี decode ของแต่ละ analyzer (water = classify resize ด้านสั้น ดู process/water.py)
+DECODE_FIT = {"water": "short"}
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU ระหว่าง box ชุด a (N,4) กับชุด b (M,4) แบบ xyxy -> (N,M)"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def compare_results(ref, other, tol_px: float = 3.0, tol_conf: float = 0.05, tol_prob: float = 0.02) -> dict:
+    """
+    เทียบ ultralytics Results 2 ชุดของภาพเดียวกัน
+    จับคู่ box ด้วย IoU สูงสุด แล้ววัดความต่างของพิกัด / confidence / keypoints
+    """
+    report = {"ok": True}
+
+    if ref.probs is not None:
+        p_ref = ref.probs.data.cpu().numpy()
+        p_other = other.probs.data.cpu().numpy()
+        report["top1_agree"] = int(ref.probs.top1) == int(other.probs.top1)
+        report["max_prob_diff"] = float(np.abs(p_ref - p_other).max())
+        report["ok"] = report["top1_agree"] and report["max_prob_diff"] <= tol_prob
+        return report
+
+    b_ref = ref.boxes.xyxy.cpu().numpy() if ref.boxes is not None else np.zeros((0, 4))
+    b_other = other.boxes.xyxy.cpu().numpy() if other.boxes is not None else np.zeros((0, 4))
+    report["count_ref"], report["count_other"] = len(b_ref), len(b_other)
+    if len(b_ref) != len(b_other):
+        report["ok"] = False
+    if len(b_ref) == 0 or len(b_other) == 0:
+        return report
+
+    match = _box_iou(b_ref, b_other).argmax(axis=1)
+    report["max_box_diff_px"] = float(np.abs(b_ref - b_other[match]).max())
+    c_ref = ref.boxes.conf.cpu().numpy()
+    c_other = other.boxes.conf.cpu().numpy()[match]
+    report["max_conf_diff"] = float(np.abs(c_ref - c_other).max())
+    report["ok"] &= report["max_box_diff_px"] <= tol_px and report["max_conf_diff"] <= tol_conf
+
+    if ref.keypoints is not None and other.keypoints is not None:
+        k_ref = ref.keypoints.xy.cpu().numpy()
+        k_other = other.keypoints.xy.cpu().numpy()[match]
+        report["max_kpt_diff_px"] = float(np.abs(k_ref - k_other).max())
+        report["ok"] &= report["max_kpt_diff_px"] <= tol_px
+
+    return report
+
+
+def serve_predictions(model_key: str, backend: str, images: list[str]) -> tuple[int, list]:
+    """
+    โหลดไฟล์ของ backend นี้ผ่าน registry แล้ว predict ทุกภาพแบบเดียวกับ analyzer
+    ระบุ path ตรงๆ (ไม่มีไฟล์ = FileNotFoundError) ไม่ fallback ไป .pt แบบตอน serving ซึ่งจะกลายเป็นเทียบ torch กับ torch
+    คืน (imgsz ที่ใช้, Results เรียงตาม images)
+    """
+    registry.reload(model_key, get_backend_artifact_path(get_model_path(model_key), backend))
+    imgsz = inference_imgsz(model_key)
+    fit = DECODE_FIT.get(model_key, "long")
+    results = [predict_batched(model_key, decode_for_model(image_path, imgsz, fit=fit).image, imgsz=imgsz)[0]
+               for image_path in images]
+    return imgsz, results
+
+
+def check_backend(model_key: str, backend: str, images: list[str], **tolerances) -> bool:
+    ref_imgsz, refs = serve_predictions(model_key, "torch", images)
+    imgsz, others = serve_predictions(model_key, backend, images)
+
+    all_ok = imgsz == ref_imgsz
+    if not all_ok:
+        print(f"❌ [{model_key}/{backend}] imgsz ไม่ตรงกับ torch: {imgsz} != {ref_imgsz}")
+    for image_path, ref, other in zip(images, refs, others):
+        report = compare_results(ref, other, **tolerances)
+        all_ok &= report["ok"]
+        mark = "✅" if report["ok"] else "❌"
+        details = ", ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}"
+                            for k, v in report.items() if k != "ok")
+        print(f"{mark} [{model_key}/{backend}] {image_path}: {details}")
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare YOLO outputs between inference backends")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_FILES), choices=list(MODEL_FILES))
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"],
+                        choices=[b for b in BACKENDS if b != "torch"])
+    parser.add_argument("--images", nargs="+", default=None, help="ภาพที่ใช้เทียบ (default = raw ล่าสุด)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--tol-px", type=float, default=3.0)
+    parser.add_argument("--tol-conf", type=float, default=0.05)
+    parser.add_argument("--tol-prob", type=float, default=0.02)
+    args = parser.parse_args()
+
+    tolerances = {"tol_px": args.tol_px, "tol_conf": args.tol_conf, "tol_prob": args.tol_prob}
+    all_ok = True
+    for model_key in args.models:
+        images = args.images or sample_images(model_key, args.limit)
+        if not images:
+            print(f"⚠️ [{model_key}] ไม่มีภาพตัวอย่างให้เทียบ (ใช้ --images)")
+            continue
+        for backend in args.backends:
+            try:
+                all_ok &= check_backend(model_key, backend, images, **tolerances)
+            except Exception as e:
+                print(f"❌ [{model_key}/{backend}] {e}")
+                all_ok = False
+
+    print("✅ Parity OK" if all_ok else "❌ Parity FAILED")
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
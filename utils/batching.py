@@ -0,0 +1,115 @@
+"""
+Dynamic micro-batching สำหรับ inference ภาพ
+รวม request ที่เข้ามาพร้อมๆ กัน (สูงสุด N ภาพ หรือรอไม่เกิน M มิลลิวินาที) แล้วรัน model.predict ครั้งเดียว
+ผลลัพธ์ของแต่ละภาพถูกส่งกลับไปยังผู้เรียกคนเดิมผ่าน Future
+
+ตั้งค่าต่อโมเดลผ่าน ENV:
+    BATCH_MAX_SIZE_<KEY>     (default = BATCH_MAX_SIZE หรือ 8)
+    BATCH_MAX_WAIT_MS_<KEY>  (default = BATCH_MAX_WAIT_MS หรือ 15)
+ขนาด batch ที่รันจริงถูกเก็บเป็น histogram "batch_size.<key>" ใน utils.metrics
+(ถ้ารันใน inference worker ค่านี้ถูกส่งกลับ process หลักพร้อมผลของงาน ดู utils.worker_pool -> GET /metrics เห็นครบ)
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import metrics
+from utils.env import env_number
+from utils.model_registry import get_model
+
+
+class MicroBatcher:
+    def __init__(self, model_key: str, max_batch: int = 8, max_wait_ms: float = 15):
+        self.model_key = model_key
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{model_key}", daemon=True)
+        self._thread.start()
+
+    def submit(self, source, **predict_kwargs) -> Future:
+        """ส่งภาพ 1 ภาพเข้าคิว คืน Future ของผล (ultralytics Results ของภาพนั้น)"""
+        future = Future()
+        group_key = tuple(sorted(predict_kwargs.items()))
+        self._queue.put((group_key, source, predict_kwargs, future))
+        return future
+
+    def predict(self, source, **predict_kwargs):
+        """ส่งภาพ 1 ภาพเข้าคิว แล้วรอผล"""
+        return self.submit(source, **predict_kwargs).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # แยกกลุ่มตาม predict kwargs (เช่น conf ต่างกันห้ามรวม batch)
+            groups = {}
+            for group_key, source, kwargs, future in batch:
+                groups.setdefault(group_key, (kwargs, []))[1].append((source, future))
+
+            for kwargs, items in groups.values():
+                sources = [source for source, _ in items]
+                try:
+                    model = get_model(self.model_key)
+                    results = model.predict(sources, **{"verbose": False, **kwargs})
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+
+                metrics.observe(f"batch_size.{self.model_key}", len(items))
+                for (_, future), result in zip(items, results):
+                    future.set_result(result)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_key: str) -> MicroBatcher:
+    batcher = _batchers.get(model_key)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(model_key)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    model_key,
+                    max_batch=env_number("BATCH_MAX_SIZE", 8, int, key=model_key),
+                    max_wait_ms=env_number("BATCH_MAX_WAIT_MS", 15, float, key=model_key),
+                )
+                _batchers[model_key] = batcher
+    return batcher
+
+
+def predict_batched(model_key: str, source, **predict_kwargs):
+    """
+    predict ภาพเดียวผ่าน micro-batcher ของโมเดลนั้น
+    คืนค่าเป็น list ที่มี Results 1 ตัว (หน้าตาเดียวกับ model.predict(source))
+    """
+    return [get_batcher(model_key).predict(source, **predict_kwargs)]
+
+
+def predict_many(model_key: str, sources: list, **predict_kwargs) -> list:
+    """
+    predict หลายภาพของงานเดียวกัน: ส่งเข้าคิวพร้อมกันทั้งหมดก่อนค่อยรอผล
+    จึงถูกรวมเป็น batch เดียว (batch ละไม่เกิน BATCH_MAX_SIZE ภาพ) คืน list ของ Results เรียงตาม sources
+    """
+    batcher = get_batcher(model_key)
+    futures = [batcher.submit(source, **predict_kwargs) for source in sources]
+    return [future.result() for future in futures]
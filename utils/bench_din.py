@@ -0,0 +1,113 @@
+"""
+Benchmark ขั้น detect ของ din (กุ้งดิ้น): แบบเดิมทีละเฟรม vs แบบ batch K เฟรม
+- legacy  : RGB->BGR ต่อเฟรม, model.predict ทีละเฟรม, torchvision nms ซ้ำ, BGR->RGB กลับ (เหมือน analyze_video เดิม)
+- batched : process.din.detect_frames (K เฟรมต่อ predict, NMS ใน ultralytics, postprocess เป็น numpy)
+เฟรมถูก decode เข้าหน่วยความจำก่อน เวลาที่วัดจึงเป็นเฉพาะ detect + postprocess
+รายงาน frames/s และ frames/s ต่อ core (หารด้วยจำนวน torch threads)
+
+ตัวอย่าง:
+    python -m utils.bench_din --video output/din_output/video_pond1_20250911_175013.mp4
+    python -m utils.bench_din --video input_video/clip.mp4 --frames 200 --batch 4 8 16 --threads 1
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+
+from process.din import CONFIDENCE_THRESHOLD, detect_frames
+from utils.model_registry import get_model
+
+
+def load_frames(path: str, limit: int) -> list:
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise ValueError(f"❌ อ่านเฟรมจากวิดีโอไม่ได้: {path}")
+    return frames
+
+
+def run_legacy(model, frames: list) -> int:
+    import torch
+    from torchvision.ops import nms
+
+    n_boxes = 0
+    for frame in frames:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # imageio reader ให้ RGB
+        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+        results = model.predict(source=bgr, conf=CONFIDENCE_THRESHOLD, verbose=False)
+        boxes = results[0].boxes.xyxy.cpu().numpy()
+        scores = results[0].boxes.conf.cpu().numpy()
+        if len(boxes) > 0:
+            keep = nms(torch.tensor(boxes, dtype=torch.float32),
+                       torch.tensor(scores, dtype=torch.float32), iou_threshold=0.5)
+            boxes = boxes[keep.numpy()]
+        n_boxes += len(boxes)
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)  # ก่อน writer.append_data
+    return n_boxes
+
+
+def run_batched(model, frames: list, batch_size: int) -> int:
+    n_boxes = 0
+    for start in range(0, len(frames), batch_size):
+        for boxes, _ in detect_frames(model, frames[start:start + batch_size]):
+            n_boxes += len(boxes)
+    return n_boxes
+
+
+def _timed(fn, *args) -> tuple[float, int]:
+    start = time.perf_counter()
+    n_boxes = fn(*args)
+    return time.perf_counter() - start, n_boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-frame vs batched din detection")
+    parser.add_argument("--video", required=True, help="คลิปอ้างอิง")
+    parser.add_argument("--frames", type=int, default=150, help="จำนวนเฟรมที่ใช้วัด")
+    parser.add_argument("--batch", type=int, nargs="+", default=[8])
+    parser.add_argument("--threads", type=int, default=None, help="torch threads (default = ค่าของ torch)")
+    parser.add_argument("--json", action="store_true", help="พิมพ์ผลเป็น JSON")
+    args = parser.parse_args()
+
+    import torch
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    cores = torch.get_num_threads()
+
+    frames = load_frames(args.video, args.frames)
+    model = get_model("din")
+    detect_frames(model, frames[:1])  # warmup
+
+    rows = []
+    elapsed, n_boxes = _timed(run_legacy, model, frames)
+    rows.append({"mode": "legacy", "batch": 1, "seconds": elapsed, "boxes": n_boxes})
+    for batch_size in args.batch:
+        elapsed, n_boxes = _timed(run_batched, model, frames, batch_size)
+        rows.append({"mode": "batched", "batch": batch_size, "seconds": elapsed, "boxes": n_boxes})
+
+    for row in rows:
+        row["fps"] = round(len(frames) / row["seconds"], 2)
+        row["fps_per_core"] = round(row["fps"] / cores, 2)
+        row["seconds"] = round(row["seconds"], 3)
+
+    if args.json:
+        print(json.dumps({"video": args.video, "frames": len(frames), "cores": cores, "results": rows}, indent=2))
+        return
+
+    print(f"🎞️ {args.video}: {len(frames)} frames, {cores} torch thread(s)")
+    print(f"{'mode':<8} {'batch':>5} {'sec':>8} {'fps':>8} {'fps/core':>9} {'boxes':>7}")
+    for row in rows:
+        print(f"{row['mode']:<8} {row['batch']:>5} {row['seconds']:>8} {row['fps']:>8} "
+              f"{row['fps_per_core']:>9} {row['boxes']:>7}")
+
+
+if __name__ == "__main__":
+    main()
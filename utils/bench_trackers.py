@@ -0,0 +1,187 @@
+"""
+Benchmark + เทียบความสม่ำเสมอของ track id ระหว่าง tracker engine ของ din (ดู process/trackers.py)
+detect ครั้งเดียวต่อคลิป แล้วป้อน detection ชุดเดียวกันให้ทุก engine ผ่าน TrackingSession (logic การขยับชุดเดียวกัน)
+อ่านคลิปแบบ stream: decode + detect ทีละ batch แล้วป้อนทุก engine ไปพร้อมกันเฟรมต่อเฟรม
+(ถือเฟรมไว้แค่ 1 batch ไม่เก็บทั้งคลิปไว้ใน RAM -> 900 เฟรม 1080p ไม่ต้องใช้ ~5.6 GB)
+
+วัดต่อ engine:
+- เวลา tracking ล้วน (ไม่รวม detect) -> frames/s
+- จำนวน track id ที่ confirmed, ผลสรุป total / moved / % / สถานะรวม
+เทียบกับ engine อ้างอิง (default deepsort) โดยจับคู่ track ในแต่ละเฟรมด้วย IoU:
+- id_switches : จำนวนครั้งที่ track ของ engine อ้างอิงถูกจับคู่กับ id ใหม่ของอีก engine
+- id_purity   : สัดส่วนคู่ที่ตรงกับ id ที่จับคู่บ่อยที่สุด (1.0 = id ตรงกันตลอดคลิป)
+
+ตัวอย่าง:
+    python -m utils.bench_trackers                       # ทุกคลิปใน input_video/
+    python -m utils.bench_trackers --videos input_video/a.mp4 --frames 600 --json
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from process.din import TrackingSession, _open_video, detect_frames
+from process.trackers import TRACKERS, iou_matrix, make_tracker
+from utils.model_registry import get_model
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mpeg4")
+
+
+class _Recorder:
+    """ห่อ tracker เพื่อเก็บ track ที่ confirmed ของทุกเฟรม (track_id -> ltrb)"""
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.frames = []
+
+    def update_tracks(self, detections, frame=None):
+        tracks = self.tracker.update_tracks(detections, frame=frame)
+        self.frames.append({t.track_id: np.asarray(t.to_ltrb(), dtype=np.float64)
+                            for t in tracks if t.is_confirmed()})
+        return tracks
+
+
+def _batches(frames, limit: int, batch_size: int):
+    """ตัด generator ของเฟรมเป็น list ละ batch_size เฟรม ไม่เกิน limit เฟรมรวม"""
+    batch, count = [], 0
+    for frame in frames:
+        batch.append(frame)
+        count += 1
+        if len(batch) >= batch_size or count >= limit:
+            yield batch
+            batch = []
+        if count >= limit:
+            break
+    if batch:
+        yield batch
+
+
+class _EngineRun:
+    """TrackingSession ของ 1 engine + เวลา tracking สะสม (ไม่รวม decode / detect)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.recorder = _Recorder(make_tracker(name))
+        self.session = TrackingSession(self.recorder)
+        self.seconds = 0.0
+        self.frames = 0
+
+    def update(self, frame_idx: int, frame, boxes, scores):
+        start = time.perf_counter()
+        self.session.update(frame_idx, frame, boxes, scores)
+        self.seconds += time.perf_counter() - start
+        self.frames += 1
+
+    def report(self) -> dict:
+        summary = self.session.summary()
+        return {
+            "engine": self.name,
+            "seconds": round(self.seconds, 3),
+            "fps": round(self.frames / self.seconds, 1) if self.seconds > 0 else None,
+            "track_ids": len({tid for f in self.recorder.frames for tid in f}),
+            "total": summary["total"],
+            "moved": summary["moved"],
+            "moved_percent": round(summary["moved_percent"], 2),
+            "overall_status": summary["overall_status"],
+            "_frames": self.recorder.frames,
+        }
+
+
+def compare_ids(ref_frames: list, other_frames: list, iou_threshold: float = 0.5) -> dict:
+    """จับคู่ track ของสอง engine ทีละเฟรมด้วย IoU แล้ววัดว่า id ของอีก engine คงที่ตาม id อ้างอิงแค่ไหน"""
+    pairs = defaultdict(Counter)
+    last_match = {}
+    switches = matched = ref_total = 0
+    for ref, other in zip(ref_frames, other_frames):
+        ref_ids, other_ids = list(ref), list(other)
+        ref_total += len(ref_ids)
+        if not ref_ids or not other_ids:
+            continue
+        iou = iou_matrix(np.stack([ref[i] for i in ref_ids]), np.stack([other[i] for i in other_ids]))
+        for r in range(len(ref_ids)):
+            c = int(np.argmax(iou[r]))
+            if iou[r, c] < iou_threshold:
+                continue
+            ref_id, other_id = ref_ids[r], other_ids[c]
+            matched += 1
+            pairs[ref_id][other_id] += 1
+            if ref_id in last_match and last_match[ref_id] != other_id:
+                switches += 1
+            last_match[ref_id] = other_id
+
+    majority = sum(counter.most_common(1)[0][1] for counter in pairs.values())
+    return {
+        "matched_ratio": round(matched / ref_total, 4) if ref_total else None,
+        "id_switches": switches,
+        "id_purity": round(majority / matched, 4) if matched else None,
+    }
+
+
+def bench_clip(path: str, engines: list, reference: str, limit: int, batch_size: int = 8) -> dict:
+    opened = _open_video(path)
+    if opened is None:
+        raise ValueError(f"❌ เปิดวิดีโอไม่ได้: {path}")
+    frames, _, _ = opened
+    model = get_model("din")
+    engine_runs = [_EngineRun(name) for name in engines]
+    frame_idx = 0
+    try:
+        for batch in _batches(frames, limit, batch_size):
+            for frame, (boxes, scores) in zip(batch, detect_frames(model, batch)):
+                for run in engine_runs:
+                    run.update(frame_idx, frame, boxes, scores)
+                frame_idx += 1
+    finally:
+        frames.close()
+
+    runs = {run.name: run.report() for run in engine_runs}
+    if reference in runs:
+        ref_frames = runs[reference]["_frames"]
+        for name, run in runs.items():
+            if name != reference:
+                run["vs_" + reference] = compare_ids(ref_frames, run["_frames"])
+                run["summary_agrees"] = run["overall_status"] == runs[reference]["overall_status"]
+    for run in runs.values():
+        del run["_frames"]
+    return {"video": path, "frames": frame_idx, "engines": list(runs.values())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark din tracker engines and compare track ids")
+    parser.add_argument("--videos", nargs="+", default=None, help="คลิปที่ใช้ (default = input_video/*)")
+    parser.add_argument("--engines", nargs="+", default=list(TRACKERS), choices=list(TRACKERS))
+    parser.add_argument("--reference", default="deepsort", choices=list(TRACKERS))
+    parser.add_argument("--frames", type=int, default=900, help="จำนวนเฟรมสูงสุดต่อคลิป")
+    parser.add_argument("--json", action="store_true", help="พิมพ์ผลเป็น JSON")
+    args = parser.parse_args()
+
+    videos = args.videos or sorted(p for p in glob.glob(os.path.join("input_video", "*"))
+                                   if p.lower().endswith(VIDEO_EXTS))
+    if not videos:
+        print("⚠️ ไม่มีคลิปให้ทดสอบ (ใช้ --videos)")
+        return
+
+    reports = [bench_clip(path, args.engines, args.reference, args.frames) for path in videos]
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+
+    for report in reports:
+        print(f"🎞️ {report['video']} ({report['frames']} frames)")
+        for run in report["engines"]:
+            line = (f"  {run['engine']:<9} {run['fps']:>8} fps  ids={run['track_ids']:<4} "
+                    f"moved={run['moved']}/{run['total']} ({run['moved_percent']}%)")
+            cmp = run.get("vs_" + args.reference)
+            if cmp:
+                line += (f"  switches={cmp['id_switches']} purity={cmp['id_purity']} "
+                         f"matched={cmp['matched_ratio']} same_status={run['summary_agrees']}")
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+อ่านค่าตั้งค่าตัวเลขจาก ENV (ใช้ร่วมกันทุกโมดูล)
+"""
+
+import os
+
+
+def env_number(name: str, default, cast=float, key: str = None):
+    """
+    ค่าของ ENV name แปลงด้วย cast ถ้าไม่ได้ตั้ง (หรือเป็นค่าว่าง) คืน default
+    key = ตั้งค่ารายโมเดล / รายประเภทได้: ลอง {name}_{KEY} ก่อนค่อย name (เช่น BATCH_MAX_SIZE_SHRIMP -> BATCH_MAX_SIZE)
+    """
+    value = os.environ.get(f"{name}_{key.upper()}") if key else None
+    if value in (None, ""):
+        value = os.environ.get(name)
+    return cast(value) if value not in (None, "") else default
@@ -0,0 +1,76 @@
+"""
+Export โมเดล .pt ใน Model/ ให้เป็น ONNX / OpenVINO IR สำหรับรันบน CPU
+ไฟล์ที่ได้จะอยู่ข้างไฟล์ .pt ตามชื่อที่ utils.loader_model.get_backend_artifact_path คาดไว้
+
+ตัวอย่าง:
+    python -m utils.export_models                                  # ทุกโมเดล ทั้ง onnx และ openvino
+    python -m utils.export_models --models size shrimp --backends onnx
+"""
+
+import argparse
+import glob
+import os
+
+from utils.loader_model import MODEL_FILES, get_backend_artifact_path, get_model_path
+from utils.model_registry import MODEL_TASKS, trained_imgsz
+
+# โฟลเดอร์ภาพ raw ที่ใช้เป็นภาพตัวอย่างของแต่ละโมเดล (local_storage/<type>/raw)
+# din ใช้ภาพยอกุ้งชุดเดียวกับ size เพราะเป็นกล้อง/ถาดเดียวกัน
+SAMPLE_IMAGE_TYPES = {
+    "size": "size",
+    "shrimp": "shrimp",
+    "water": "water",
+    "din": "size",
+}
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# backend ที่ export ตรงจาก ultralytics ได้ (onnx_int8 สร้างต่อจาก onnx ด้วย utils.quantize_models)
+EXPORT_FORMATS = ("onnx", "openvino")
+
+
+def sample_images(model_key: str, limit: int = None) -> list[str]:
+    """คืนรายการภาพ raw ล่าสุดของโมเดลนั้นๆ จาก LOCAL_STORAGE_BASE/<type>/raw"""
+    base = os.environ.get("LOCAL_STORAGE_BASE", "/data/local_storage")
+    raw_dir = os.path.join(base, SAMPLE_IMAGE_TYPES[model_key], "raw")
+    files = [p for p in glob.glob(os.path.join(raw_dir, "*")) if p.lower().endswith(IMAGE_EXTS)]
+    files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    return files[:limit] if limit else files
+
+
+def export_model(model_key: str, backend: str, imgsz: int = None) -> str:
+    """export โมเดลหนึ่งตัวเป็น backend ที่กำหนด แล้วคืน path ของไฟล์ที่ได้"""
+    from ultralytics import YOLO
+
+    pt_path = get_model_path(model_key)
+    model = YOLO(pt_path, task=MODEL_TASKS[model_key])
+    imgsz = imgsz or trained_imgsz(model_key, model)
+
+    print(f"📦 Export '{model_key}' -> {backend} (imgsz={imgsz})")
+    # dynamic=True ให้ไฟล์ที่ export รับ batch > 1 ได้ (ใช้กับ utils.batching)
+    exported = model.export(format=backend, imgsz=imgsz, half=False, dynamic=True)
+
+    expected = get_backend_artifact_path(pt_path, backend)
+    if os.path.abspath(str(exported)) != os.path.abspath(expected):
+        print(f"⚠️ ไฟล์ที่ export ได้ ({exported}) ไม่ตรงกับที่ registry คาดไว้ ({expected})")
+    print(f"✅ Exported: {exported}")
+    return str(exported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLO .pt models to ONNX / OpenVINO")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_FILES), choices=list(MODEL_FILES))
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"],
+                        choices=list(EXPORT_FORMATS))
+    parser.add_argument("--imgsz", type=int, default=None, help="override ขนาดภาพตอน export")
+    args = parser.parse_args()
+
+    for model_key in args.models:
+        for backend in args.backends:
+            try:
+                export_model(model_key, backend, args.imgsz)
+            except Exception as e:
+                print(f"❌ Export '{model_key}' -> {backend} failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Decode ภาพให้ได้ขนาดที่โมเดลต้องใช้ตั้งแต่ตอน decode
+ใช้ JPEG DCT scaling ของ OpenCV (IMREAD_REDUCED_COLOR_2/4/8) แทนการ decode เต็มขนาดแล้วค่อยย่อ
+พร้อมเก็บสัดส่วนไว้ map พิกัด box / keypoint กลับไปเป็นพิกัดของภาพต้นฉบับ
+
+รับ input ได้ 3 แบบ: path ของไฟล์, bytes ของไฟล์ภาพ (จาก upload โดยตรง) หรือ ndarray BGR ที่ decode แล้ว
+"""
+
+import io
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+REDUCED_COLOR_FLAGS = {
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+}
+
+
+class DecodedImage:
+    """ภาพที่ decode แล้ว + สัดส่วนเทียบกับภาพต้นฉบับ (decoded = original * scale)"""
+
+    def __init__(self, image: np.ndarray, original_size: tuple[int, int]):
+        self.image = image
+        self.original_size = original_size  # (width, height)
+        self.scale_x = image.shape[1] / original_size[0]
+        self.scale_y = image.shape[0] / original_size[1]
+
+    def to_original(self, xy):
+        """แปลงพิกัด (..., 2) จากภาพที่ decode เป็นพิกัดของภาพต้นฉบับ"""
+        xy = np.asarray(xy, dtype=np.float32)
+        return xy / np.array([self.scale_x, self.scale_y], dtype=np.float32)
+
+    def to_image(self, xy):
+        """แปลงพิกัด (..., 2) ของภาพต้นฉบับกลับมาเป็นพิกัดบนภาพที่ decode (ใช้วาดผล)"""
+        xy = np.asarray(xy, dtype=np.float32)
+        return xy * np.array([self.scale_x, self.scale_y], dtype=np.float32)
+
+
+def _header_size(source) -> tuple[int, int]:
+    """อ่านขนาดภาพจาก header อย่างเดียว (ไม่ decode pixel)"""
+    with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as im:
+        return im.size
+
+
+def _decode(source, flag):
+    if isinstance(source, (bytes, bytearray)):
+        return cv2.imdecode(np.frombuffer(source, dtype=np.uint8), flag)
+    return cv2.imread(source, flag)
+
+
+def describe_source(source) -> str:
+    """ชื่อสั้นๆ ของ input ไว้ใช้ใน error message"""
+    if isinstance(source, (bytes, bytearray)):
+        return f"<{len(source)} bytes>"
+    if isinstance(source, np.ndarray):
+        return f"<ndarray {source.shape}>"
+    return str(source)
+
+
+def source_stem(source, original_name: str = None) -> str:
+    """ชื่อไฟล์ (ไม่มีนามสกุล) ที่ใช้ตั้งชื่อไฟล์ผลลัพธ์"""
+    if original_name:
+        return os.path.splitext(os.path.basename(original_name))[0]
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.splitext(os.path.basename(source))[0]
+    return "image"
+
+
+def save_original(source, path: str) -> str:
+    """
+    บันทึกภาพต้นฉบับขนาดเต็มเป็น path (.jpg)
+    source ที่เป็น JPEG อยู่แล้ว (bytes / path) เขียน bytes เดิมตรงๆ ไม่ต้อง decode / encode ซ้ำ
+    """
+    if isinstance(source, np.ndarray):
+        cv2.imwrite(path, source)
+        return path
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    if data[:2] == b"\xff\xd8":
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+    image = _decode(data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"❌ ไม่พบภาพที่ path: {describe_source(source)}")
+    cv2.imwrite(path, image)
+    return path
+
+
+def full_resolution(source, decoded: DecodedImage) -> np.ndarray:
+    """
+    ภาพต้นฉบับขนาดเต็มไว้วาดผลลัพธ์ (ภาพที่ย่อตอน decode ใช้กับโมเดลอย่างเดียว)
+    ถ้า decoded เต็มขนาดอยู่แล้ว (scale = 1) ใช้ภาพเดิมไม่ decode ซ้ำ
+    """
+    if decoded.scale_x == 1 and decoded.scale_y == 1:
+        return decoded.image
+    image = _decode(source, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"❌ ไม่พบภาพที่ path: {describe_source(source)}")
+    return image
+
+
+def decode_for_model(source, imgsz: int, fit: str = "long", region=None) -> DecodedImage:
+    """
+    decode ภาพด้วย factor 1/2/4/8 ที่ใหญ่ที่สุดที่ยังไม่เล็กกว่า imgsz
+    fit="long"  : ด้านยาวต้อง >= imgsz (detect / pose ที่ letterbox ด้านยาว)
+    fit="short" : ด้านสั้นต้อง >= imgsz (classify ที่ resize ด้านสั้นแล้ว center crop)
+    region      : กรอบสัดส่วน (x1, y1, x2, y2) ที่จะ crop ไปเข้าโมเดล (ดู utils/roi.py) -> วัดขนาดจากกรอบแทนภาพเต็ม
+    ถ้า source เป็น ndarray ที่ decode แล้วจะใช้ตามนั้นเลย (scale = 1)
+    """
+    if isinstance(source, np.ndarray):
+        return DecodedImage(source, (source.shape[1], source.shape[0]))
+
+    try:
+        width, height = _header_size(source)
+    except Exception:
+        raise ValueError(f"❌ ไม่พบภาพที่ path: {describe_source(source)}")
+    if region is not None:
+        width_r, height_r = width * (region[2] - region[0]), height * (region[3] - region[1])
+    else:
+        width_r, height_r = width, height
+    side = max(width_r, height_r) if fit == "long" else min(width_r, height_r)
+
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in REDUCED_COLOR_FLAGS.items():
+        if imgsz and side / factor >= imgsz:
+            flag = reduced_flag
+            break
+
+    image = _decode(source, flag)
+    if image is None:
+        raise ValueError(f"❌ ไม่พบภาพที่ path: {describe_source(source)}")
+
+    # OpenCV หมุนภาพตาม EXIF orientation แต่ header ของ PIL ไม่หมุน -> สลับ w/h ให้ตรงกัน
+    if (image.shape[1] >= image.shape[0]) != (width >= height):
+        width, height = height, width
+    return DecodedImage(image, (width, height))
@@ -3,8 +3,11 @@ import os
 # ===============================
 # PATH CONFIG (Railway Persistent Volume)
 # ===============================
-# ที่เก็บโมเดลทั้งหมด
-BASE_MODEL_DIR = "/data/Model"
+# ที่เก็บโมเดลทั้งหมด (override ได้ผ่าน ENV MODEL_DIR)
+BASE_MODEL_DIR = os.environ.get("MODEL_DIR", "/data/Model")
+
+# โฟลเดอร์ Model/ ใน repo (ใช้ตอนรัน local / Docker ที่ COPY โมเดลมาด้วย)
+LOCAL_MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Model")
 
 # ชื่อไฟล์โมเดลหลักที่ถูก unzip ลงมาจาก Model.zip
 MODEL_FILES = {
@@ -14,9 +17,18 @@ MODEL_FILES = {
     "water": "water_class.pt" # โมเดลวิเคราะห์คุณภาพน้ำ
 }
 
+# ENV ที่ใช้ชี้ path โมเดลแบบเจาะจง (ตรงกับที่ local_config.py ตั้งไว้)
+MODEL_ENV_VARS = {
+    "size": "MODEL_SIZE",
+    "din": "MODEL_DIN",
+    "shrimp": "MODEL_SHRIMP",
+    "water": "MODEL_WATER",
+}
+
 def get_model_path(model_key: str) -> str:
     """
-    คืนค่า path เต็มของโมเดลที่อยู่ใน Railway Volume
+    คืนค่า path เต็มของโมเดล
+    ลำดับการค้นหา: ENV MODEL_<KEY> -> BASE_MODEL_DIR (Railway Volume) -> Model/ ใน repo
     :param model_key: เช่น "size", "din", "shrimp", "water"
     :return: path เต็มของไฟล์ เช่น /data/Model/shrimp.pt
     """
@@ -25,16 +37,88 @@ def get_model_path(model_key: str) -> str:
             f"❌ Unknown model key: {model_key}. "
             f"ใช้ได้แค่ {list(MODEL_FILES.keys())}"
         )
-    
-    # path เต็ม
-    model_path = os.path.join(BASE_MODEL_DIR, MODEL_FILES[model_key])
-    
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(
-            f"❌ Model file not found: {model_path}\n"
-            f"👉 กรุณาตรวจสอบว่าได้ unzip Model.zip ลงใน /data/Model แล้ว"
-        )
-    
-    print(f"✅ Using model: {model_path}")
-    return model_path
 
+    override = os.environ.get(MODEL_ENV_VARS[model_key])
+    if override:
+        candidates = [override]
+    else:
+        candidates = [
+            os.path.join(BASE_MODEL_DIR, MODEL_FILES[model_key]),
+            os.path.join(LOCAL_MODEL_DIR, MODEL_FILES[model_key]),
+        ]
+
+    for model_path in candidates:
+        if os.path.exists(model_path):
+            print(f"✅ Using model: {model_path}")
+            return model_path
+
+    raise FileNotFoundError(
+        f"❌ Model file not found: {candidates[0]}\n"
+        f"👉 กรุณาตรวจสอบว่าได้ unzip Model.zip ลงใน {BASE_MODEL_DIR} แล้ว"
+    )
+
+
+def resolve_allowed_model_path(path: str) -> str:
+    """
+    path ของไฟล์โมเดลที่ส่งมาจากภายนอก (เช่น body ของ POST /models/{key}/reload)
+    ชื่อไฟล์เฉยๆ / path สัมพัทธ์ = อยู่ใน BASE_MODEL_DIR
+    ยอมรับเฉพาะไฟล์ที่ resolve แล้ว (รวม symlink / ..) อยู่ใต้ BASE_MODEL_DIR หรือ Model/ ใน repo
+    เพราะ YOLO(path) unpickle ไฟล์ -> ไฟล์จากที่อื่นรันโค้ดอะไรก็ได้
+    """
+    resolved = os.path.realpath(os.path.join(BASE_MODEL_DIR, path))
+    for model_dir in (BASE_MODEL_DIR, LOCAL_MODEL_DIR):
+        root = os.path.realpath(model_dir)
+        if os.path.commonpath([root, resolved]) == root and resolved != root:
+            return resolved
+    raise PermissionError(f"❌ Model path must be inside {BASE_MODEL_DIR}: {path}")
+
+
+# ===============================
+# INFERENCE BACKENDS
+# ===============================
+# torch    = ไฟล์ .pt ตรงๆ (eager PyTorch)
+# onnx     = <ชื่อโมเดล>.onnx ที่ export ไว้ข้างไฟล์ .pt (รันด้วย ONNX Runtime)
+# openvino = โฟลเดอร์ <ชื่อโมเดล>_openvino_model/ ที่ export ไว้ข้างไฟล์ .pt
+# onnx_int8 = <ชื่อโมเดล>_int8.onnx ที่ quantize แล้ว (สร้างด้วย python -m utils.quantize_models)
+BACKENDS = ("torch", "onnx", "openvino", "onnx_int8")
+
+
+def get_model_backend(model_key: str) -> str:
+    """เลือก backend ต่อโมเดลจาก ENV MODEL_BACKEND_<KEY> หรือ MODEL_BACKEND (default = torch)"""
+    backend = (
+        os.environ.get(f"MODEL_BACKEND_{model_key.upper()}")
+        or os.environ.get("MODEL_BACKEND")
+        or "torch"
+    ).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"❌ Unknown backend: {backend}. ใช้ได้แค่ {list(BACKENDS)}")
+    return backend
+
+
+def get_backend_artifact_path(pt_path: str, backend: str) -> str:
+    """แปลง path ของไฟล์ .pt เป็น path ของไฟล์ที่ export แล้ว (ตามชื่อที่ ultralytics ตั้งให้)"""
+    stem, _ = os.path.splitext(pt_path)
+    if backend == "torch":
+        return pt_path
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    if backend == "onnx_int8":
+        return f"{stem}_int8.onnx"
+    raise ValueError(f"❌ Unknown backend: {backend}. ใช้ได้แค่ {list(BACKENDS)}")
+
+
+def get_model_artifact(model_key: str, backend: str = None) -> tuple[str, str]:
+    """
+    คืน (path, backend) ของไฟล์โมเดลที่จะใช้จริง
+    ถ้ายังไม่ได้ export ไฟล์ของ backend ที่เลือก จะ fallback ไปใช้ .pt พร้อมเตือน
+    """
+    backend = backend or get_model_backend(model_key)
+    pt_path = get_model_path(model_key)
+    artifact = get_backend_artifact_path(pt_path, backend)
+    if not os.path.exists(artifact):
+        print(f"⚠️ ไม่พบไฟล์ {backend} ของโมเดล '{model_key}': {artifact} "
+              f"(รัน python -m utils.export_models ก่อน) -> ใช้ torch แทน")
+        return pt_path, "torch"
+    return artifact, backend
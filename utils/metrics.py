@@ -0,0 +1,53 @@
+"""
+ตัวนับ metrics แบบง่ายใน process (ดูได้ที่ GET /metrics)
+- counter   : นับจำนวนครั้ง เช่น cache hit / miss
+- histogram : นับการกระจายของค่าที่เป็นจำนวนเต็ม เช่น ขนาด batch
+ค่าที่เกิดใน inference worker process ถูกส่งกลับมาพร้อมผลของงาน (drain ใน worker -> merge ใน process หลัก)
+"""
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_histograms = defaultdict(lambda: defaultdict(int))
+
+
+def incr(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, value: int):
+    with _lock:
+        _histograms[name][int(value)] += 1
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: dict(sorted(buckets.items())) for name, buckets in _histograms.items()},
+        }
+
+
+def drain() -> dict:
+    """snapshot แล้วล้างค่าทั้งหมด (ใช้ใน worker process ส่งเฉพาะค่าที่เพิ่มขึ้นกลับไป process หลัก)"""
+    with _lock:
+        delta = {
+            "counters": dict(_counters),
+            "histograms": {name: dict(buckets) for name, buckets in _histograms.items()},
+        }
+        _counters.clear()
+        _histograms.clear()
+    return delta
+
+
+def merge(delta: dict):
+    """บวกค่าจาก drain() ของ process อื่นเข้ากับค่าใน process นี้"""
+    with _lock:
+        for name, amount in delta.get("counters", {}).items():
+            _counters[name] += amount
+        for name, buckets in delta.get("histograms", {}).items():
+            for value, count in buckets.items():
+                _histograms[name][int(value)] += count
@@ -0,0 +1,242 @@
+"""
+Model Registry
+โหลดโมเดล YOLO ทั้ง 4 ตัวแบบ lazy (โหลดครั้งแรกที่มีคนเรียกใช้), warmup ก่อนรายงานว่าพร้อม
+และสลับไฟล์ .pt เวอร์ชันใหม่ได้โดยไม่ต้อง restart process
+"""
+
+import ast
+import hashlib
+import os
+import threading
+import time
+
+from utils.loader_model import MODEL_FILES, get_model_artifact
+
+# task ของแต่ละโมเดล (ใช้ตอนโหลดไฟล์ที่ ultralytics เดา task เองไม่ได้)
+MODEL_TASKS = {
+    "size": "pose",
+    "din": "detect",
+    "shrimp": "detect",
+    "water": "classify",
+}
+
+# ขนาดภาพสำรอง เมื่อไฟล์โมเดลไม่ได้บอก imgsz ที่ train / export ไว้ (classify ใช้ 224 ตาม default ของ YOLO-cls)
+WARMUP_IMGSZ = {
+    "size": 640,
+    "din": 640,
+    "shrimp": 640,
+    "water": 224,
+}
+
+
+def _as_int(imgsz) -> int | None:
+    """imgsz ของ ultralytics เป็น int หรือ [h, w] -> ด้านยาว"""
+    if isinstance(imgsz, str):
+        imgsz = ast.literal_eval(imgsz)
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz) if imgsz else None
+    return int(imgsz) if imgsz else None
+
+
+def _exported_imgsz(path: str) -> int | None:
+    """imgsz ที่ ultralytics เขียนไว้ใน metadata ของไฟล์ที่ export (ONNX / OpenVINO)"""
+    try:
+        if os.path.isdir(path):
+            import yaml
+            with open(os.path.join(path, "metadata.yaml"), "r", encoding="utf-8") as f:
+                return _as_int((yaml.safe_load(f) or {}).get("imgsz"))
+        if path.endswith(".onnx"):
+            import onnxruntime as ort
+            session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+            return _as_int(session.get_modelmeta().custom_metadata_map.get("imgsz"))
+    except Exception as e:
+        print(f"⚠️ อ่าน imgsz จาก metadata ของ {path} ไม่ได้: {e}")
+    return None
+
+
+def trained_imgsz(key: str, model, path: str = None) -> int:
+    """
+    ขนาดภาพที่โมเดลถูก train / export มา: model.overrides["imgsz"] ของ .pt (ค่าเดียวกับที่ utils.export_models ใช้)
+    หรือ metadata ของไฟล์ที่ export แล้ว ถ้าไม่มีทั้งคู่ใช้ WARMUP_IMGSZ
+    """
+    imgsz = _as_int(getattr(model, "overrides", {}).get("imgsz"))
+    if imgsz is None and path:
+        imgsz = _exported_imgsz(path)
+    return imgsz or WARMUP_IMGSZ[key]
+
+
+def _env_imgsz(key: str) -> int | None:
+    value = os.environ.get(f"IMGSZ_{key.upper()}")
+    return int(value) if value else None
+
+
+def inference_imgsz(key: str) -> int:
+    """
+    ขนาดภาพที่ใช้ inference ของแต่ละโมเดล: ENV IMGSZ_<KEY> ถ้าตั้งไว้ ไม่งั้นใช้ imgsz ที่โมเดลที่โหลดอยู่ถูก train มา
+    (โหลดโมเดลถ้ายังไม่ได้โหลด ซึ่ง analyzer ต้องโหลดอยู่แล้ว)
+    """
+    return _env_imgsz(key) or registry.entry(key)["imgsz"]
+
+
+def _file_version(path: str) -> str:
+    """คืน version สั้นๆ ของไฟล์โมเดล (sha256 12 ตัวแรก) รองรับทั้งไฟล์เดี่ยวและโฟลเดอร์ OpenVINO"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path))
+    else:
+        files = [path]
+    h = hashlib.sha256()
+    for file_path in files:
+        if not os.path.isfile(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _backend_of(path: str) -> str:
+    """เดา backend จากชื่อไฟล์ (ใช้ตอน reload ด้วย path ที่ระบุเอง)"""
+    if path.rstrip("/\\").endswith("_openvino_model"):
+        return "openvino"
+    if path.endswith("_int8.onnx"):
+        return "onnx_int8"
+    if path.endswith(".onnx"):
+        return "onnx"
+    return "torch"
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries = {}
+        self._locks = {key: threading.Lock() for key in MODEL_FILES}
+        self._file_versions = {}
+
+    def _load(self, key: str, path: str, backend: str = "torch") -> dict:
+        # import ตรงนี้เพื่อให้ pod ที่ไม่เคยรับงานภาพ/วิดีโอไม่ต้องโหลด torch เลย
+        from ultralytics import YOLO
+
+        started = time.perf_counter()
+        model = YOLO(path, task=MODEL_TASKS[key])
+        load_ms = (time.perf_counter() - started) * 1000
+        imgsz = _env_imgsz(key) or trained_imgsz(key, model, path)
+        warmup_ms = self._warmup(model, imgsz)
+
+        print(f"✅ Model '{key}' ready ({os.path.basename(path)}, {backend}, imgsz={imgsz}) "
+              f"load={load_ms:.0f}ms warmup={warmup_ms:.0f}ms")
+        return {
+            "model": model,
+            "path": path,
+            "backend": backend,
+            "version": _file_version(path),
+            "imgsz": imgsz,
+            "loaded_at": time.time(),
+            "load_ms": round(load_ms, 1),
+            "warmup_ms": round(warmup_ms, 1),
+        }
+
+    def _warmup(self, model, imgsz: int) -> float:
+        """
+        รัน inference บนภาพดำ 1 ครั้ง เพื่อให้ request แรกไม่ต้องจ่ายค่า init
+        ใช้ imgsz เดียวกับ request จริง (inference_imgsz) ไม่งั้น request แรกที่ขนาดนั้นยังต้องจ่ายค่า init อยู่ดี
+        """
+        import numpy as np
+
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        started = time.perf_counter()
+        model.predict(dummy, imgsz=imgsz, verbose=False)
+        return (time.perf_counter() - started) * 1000
+
+    def get(self, key: str):
+        """คืนโมเดลที่พร้อมใช้ (โหลด + warmup ถ้ายังไม่เคยโหลด)"""
+        return self.entry(key)["model"]
+
+    def entry(self, key: str) -> dict:
+        if key not in MODEL_FILES:
+            raise ValueError(f"❌ Unknown model key: {key}")
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._locks[key]:
+                entry = self._entries.get(key)
+                if entry is None:
+                    path, backend = get_model_artifact(key)
+                    entry = self._load(key, path, backend)
+                    self._entries[key] = entry
+        return entry
+
+    def version(self, key: str) -> str:
+        return self.entry(key)["version"]
+
+    def current_version(self, key: str, path: str = None) -> str:
+        """
+        version ของโมเดลที่จะถูกใช้ โดยไม่บังคับโหลดโมเดล
+        (ใช้ version ของตัวที่โหลดอยู่ ถ้ายังไม่โหลดจะ hash ไฟล์ตาม config และจำไว้ตาม mtime)
+        """
+        entry = self._entries.get(key)
+        if entry is not None and path is None:
+            return entry["version"]
+        path = path or get_model_artifact(key)[0]
+        stamp = (path, os.path.getmtime(path))
+        if self._file_versions.get(key, (None,))[0] != stamp:
+            self._file_versions[key] = (stamp, _file_version(path))
+        return self._file_versions[key][1]
+
+    def reload(self, key: str, path: str = None, backend: str = None) -> dict:
+        """
+        โหลดไฟล์โมเดลใหม่ + warmup ให้เสร็จก่อน แล้วค่อยสลับแทนตัวเดิม
+        request ที่กำลังรันอยู่จะใช้ตัวเดิมต่อจนจบ
+        path    = ไฟล์ .pt / .onnx / โฟลเดอร์ _openvino_model (ไม่ส่ง = ใช้ไฟล์ตาม config)
+        backend = สลับ backend ของไฟล์ตาม config (ใช้เมื่อไม่ได้ส่ง path)
+        """
+        if key not in MODEL_FILES:
+            raise ValueError(f"❌ Unknown model key: {key}")
+        if path:
+            backend = _backend_of(path)
+        else:
+            path, backend = get_model_artifact(key, backend)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"❌ Model file not found: {path}")
+
+        new_entry = self._load(key, path, backend)
+        with self._locks[key]:
+            old = self._entries.get(key)
+            self._entries[key] = new_entry
+
+        print(f"🔁 Swapped model '{key}': "
+              f"{old['version'] if old else '-'} -> {new_entry['version']}")
+        return self._describe(key, new_entry)
+
+    def preload(self, keys):
+        """โหลดล่วงหน้าเฉพาะโมเดลที่ระบุ (ใช้ตอน startup)"""
+        for key in keys:
+            try:
+                self.entry(key)
+            except Exception as e:
+                print(f"⚠️ Preload model '{key}' failed: {e}")
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._entries
+
+    def _describe(self, key: str, entry: dict | None) -> dict:
+        if entry is None:
+            return {"key": key, "ready": False}
+        return {
+            "key": key,
+            "ready": True,
+            "path": entry["path"],
+            "backend": entry["backend"],
+            "version": entry["version"],
+            "imgsz": entry["imgsz"],
+            "loaded_at": entry["loaded_at"],
+            "load_ms": entry["load_ms"],
+            "warmup_ms": entry["warmup_ms"],
+        }
+
+    def status(self) -> dict:
+        return {key: self._describe(key, self._entries.get(key)) for key in MODEL_FILES}
+
+
+registry = ModelRegistry()
+
+
+def get_model(key: str):
+    return registry.get(key)
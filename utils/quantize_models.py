@@ -0,0 +1,267 @@
+"""
+INT8 quantization (ONNX Runtime) สำหรับโมเดล size / shrimp / water
++ รายงานเทียบ latency และความคลาดเคลื่อนของผลลัพธ์กับ FP32
+
+ขั้นตอน:
+    1) calibrate: static INT8 โดยใช้ภาพ raw ใน local_storage/<type>/raw เป็น calibration set
+       (ถ้าไม่มีภาพ raw หรือสั่ง --mode dynamic จะทำ dynamic INT8 แทน)
+    2) report: รันทั้ง FP32 (.pt) และ INT8 บนภาพชุดเดียวกัน แล้วสรุป
+       - size   : ความคลาดเคลื่อนของ length_cm (เทียบตามลำดับตัวกุ้ง)
+       - shrimp : จำนวนกุ้งลอยที่ตรวจเจอต่างกันกี่ภาพ
+       - water  : top-1 ตรงกันกี่ %
+
+ตัวอย่าง:
+    python -m utils.quantize_models calibrate --models size shrimp water
+    python -m utils.quantize_models report --models size shrimp water --out int8_report.json
+
+เปิดใช้งานจริงด้วย MODEL_BACKEND_<KEY>=onnx_int8 (opt-in รายโมเดล)
+"""
+
+import argparse
+import ast
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from utils.export_models import export_model, sample_images
+from utils.loader_model import get_backend_artifact_path, get_model_path
+from utils.model_registry import MODEL_TASKS
+
+# din ใช้ DeepSort ต่อท้ายและไวต่อ conf มาก จึงไม่เปิดให้ quantize
+QUANTIZABLE_MODELS = ("size", "shrimp", "water")
+
+
+# ===================== Calibration =====================
+def _letterbox(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """ย่อภาพแบบคงสัดส่วน + เติมขอบสีเทา 114 ให้เป็น imgsz x imgsz (เหมือน ultralytics)"""
+    h, w = image.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def _center_crop(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """resize ด้านสั้นเป็น imgsz แล้ว crop กลางภาพ (เหมือน classify transforms ของ ultralytics)"""
+    h, w = image.shape[:2]
+    r = imgsz / min(h, w)
+    resized = cv2.resize(image, (max(imgsz, round(w * r)), max(imgsz, round(h * r))),
+                         interpolation=cv2.INTER_LINEAR)
+    h, w = resized.shape[:2]
+    top, left = (h - imgsz) // 2, (w - imgsz) // 2
+    return resized[top:top + imgsz, left:left + imgsz]
+
+
+def _preprocess(image_path: str, task: str, imgsz: int) -> np.ndarray:
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    image = _center_crop(image, imgsz) if task == "classify" else _letterbox(image, imgsz)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+    return image.transpose(2, 0, 1)[None]
+
+
+class RawImageCalibrationReader:
+    """ป้อนภาพ raw ทีละภาพให้ onnxruntime.quantization.quantize_static"""
+
+    def __init__(self, onnx_path: str, task: str, images: list[str]):
+        import onnxruntime as ort
+
+        session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.imgsz = model_input.shape[2]
+        if not isinstance(self.imgsz, int):
+            # ไฟล์ที่ export แบบ dynamic ไม่มีขนาดตายตัว -> ใช้ imgsz จาก metadata ของ ultralytics
+            meta = session.get_modelmeta().custom_metadata_map
+            self.imgsz = int(ast.literal_eval(meta.get("imgsz", "[640, 640]"))[0])
+        self.task = task
+        self._images = iter(images)
+
+    def get_next(self):
+        for image_path in self._images:
+            tensor = _preprocess(image_path, self.task, self.imgsz)
+            if tensor is not None:
+                return {self.input_name: tensor}
+        return None
+
+
+def _copy_metadata(src_path: str, dst_path: str):
+    """คัดลอก metadata (names / stride / imgsz / task) จาก ONNX FP32 ไปไฟล์ INT8 ให้ ultralytics อ่านได้เหมือนเดิม"""
+    import onnx
+
+    src = onnx.load(src_path, load_external_data=False)
+    dst = onnx.load(dst_path)
+    del dst.metadata_props[:]
+    for prop in src.metadata_props:
+        dst.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(dst, dst_path)
+
+
+def quantize_model(model_key: str, mode: str = "static", calib_limit: int = 200) -> str:
+    """สร้าง <ชื่อโมเดล>_int8.onnx จาก ONNX FP32 (export ให้ก่อนถ้ายังไม่มี)"""
+    from onnxruntime.quantization import (QuantFormat, QuantType, quantize_dynamic,
+                                          quantize_static)
+
+    if model_key not in QUANTIZABLE_MODELS:
+        raise ValueError(f"❌ '{model_key}' ไม่รองรับ INT8 (ใช้ได้แค่ {list(QUANTIZABLE_MODELS)})")
+
+    pt_path = get_model_path(model_key)
+    fp32_path = get_backend_artifact_path(pt_path, "onnx")
+    int8_path = get_backend_artifact_path(pt_path, "onnx_int8")
+    if not os.path.exists(fp32_path):
+        export_model(model_key, "onnx")
+
+    images = sample_images(model_key, calib_limit)
+    if mode == "static" and not images:
+        print(f"⚠️ [{model_key}] ไม่มีภาพ raw สำหรับ calibrate -> ใช้ dynamic INT8 แทน")
+        mode = "dynamic"
+
+    started = time.perf_counter()
+    if mode == "static":
+        print(f"🎯 [{model_key}] static INT8 calibration ด้วยภาพ {len(images)} ภาพ")
+        reader = RawImageCalibrationReader(fp32_path, MODEL_TASKS[model_key], images)
+        quantize_static(fp32_path, int8_path, reader,
+                        quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8,
+                        per_channel=True)
+    else:
+        print(f"🎯 [{model_key}] dynamic INT8")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+    _copy_metadata(fp32_path, int8_path)
+
+    print(f"✅ [{model_key}] {int8_path} ({time.perf_counter() - started:.1f}s)")
+    return int8_path
+
+
+# ===================== Report =====================
+def _timed_predict(model, image_path: str):
+    started = time.perf_counter()
+    results = model.predict(image_path, verbose=False)
+    return results, (time.perf_counter() - started) * 1000
+
+
+def _drift_size(ref, other) -> dict:
+    from process.size import extract_shrimp_keypoints, shrimp_length_cm
+
+    pixel_per_cm = 6
+    len_ref = sorted(shrimp_length_cm(kp, pixel_per_cm) for kp in extract_shrimp_keypoints(ref))
+    len_other = sorted(shrimp_length_cm(kp, pixel_per_cm) for kp in extract_shrimp_keypoints(other))
+    n = min(len(len_ref), len(len_other))
+    errors = np.abs(np.array(len_ref[:n]) - np.array(len_other[:n])) if n else np.zeros(0)
+    return {
+        "count_diff": abs(len(len_ref) - len(len_other)),
+        "length_cm_abs_errors": errors.tolist(),
+    }
+
+
+def _drift_shrimp(ref, other) -> dict:
+    from process.shrimp import detect_float_shrimp
+
+    return {"count_diff": abs(len(detect_float_shrimp(ref)) - len(detect_float_shrimp(other)))}
+
+
+def _drift_water(ref, other) -> dict:
+    return {"top1_agree": int(ref[0].probs.top1) == int(other[0].probs.top1)}
+
+
+DRIFT_FUNCS = {"size": _drift_size, "shrimp": _drift_shrimp, "water": _drift_water}
+
+
+def build_report(model_key: str, limit: int = 50) -> dict:
+    """รัน FP32 กับ INT8 บนภาพ raw ชุดเดียวกัน แล้วสรุป latency + drift"""
+    from ultralytics import YOLO
+
+    pt_path = get_model_path(model_key)
+    int8_path = get_backend_artifact_path(pt_path, "onnx_int8")
+    if not os.path.exists(int8_path):
+        raise FileNotFoundError(f"❌ ยังไม่มี {int8_path} (รัน calibrate ก่อน)")
+
+    images = sample_images(model_key, limit)
+    if not images:
+        raise FileNotFoundError(f"❌ [{model_key}] ไม่มีภาพ raw สำหรับทำรายงาน")
+
+    task = MODEL_TASKS[model_key]
+    fp32 = YOLO(pt_path, task=task)
+    int8 = YOLO(int8_path, task=task)
+    # warmup ทั้งสองตัวก่อนจับเวลา
+    _timed_predict(fp32, images[0])
+    _timed_predict(int8, images[0])
+
+    lat_fp32, lat_int8, drifts = [], [], []
+    for image_path in images:
+        ref, t_ref = _timed_predict(fp32, image_path)
+        other, t_other = _timed_predict(int8, image_path)
+        lat_fp32.append(t_ref)
+        lat_int8.append(t_other)
+        drifts.append(DRIFT_FUNCS[model_key](ref, other))
+
+    report = {
+        "model": model_key,
+        "images": len(images),
+        "latency_ms_fp32": {"mean": float(np.mean(lat_fp32)), "p95": float(np.percentile(lat_fp32, 95))},
+        "latency_ms_int8": {"mean": float(np.mean(lat_int8)), "p95": float(np.percentile(lat_int8, 95))},
+        "speedup": float(np.mean(lat_fp32) / max(np.mean(lat_int8), 1e-9)),
+    }
+    if model_key == "size":
+        errors = [e for d in drifts for e in d["length_cm_abs_errors"]]
+        report["length_cm_mae"] = float(np.mean(errors)) if errors else 0.0
+        report["length_cm_max_err"] = float(np.max(errors)) if errors else 0.0
+        report["count_mismatch_images"] = sum(1 for d in drifts if d["count_diff"])
+    elif model_key == "shrimp":
+        report["count_mismatch_images"] = sum(1 for d in drifts if d["count_diff"])
+        report["count_abs_diff_total"] = sum(d["count_diff"] for d in drifts)
+    elif model_key == "water":
+        report["top1_agreement"] = sum(d["top1_agree"] for d in drifts) / len(drifts)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 quantization + accuracy/latency report")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_cal = sub.add_parser("calibrate", help="สร้างไฟล์ _int8.onnx")
+    p_cal.add_argument("--models", nargs="+", default=list(QUANTIZABLE_MODELS), choices=QUANTIZABLE_MODELS)
+    p_cal.add_argument("--mode", choices=["static", "dynamic"], default="static")
+    p_cal.add_argument("--limit", type=int, default=200, help="จำนวนภาพ calibration สูงสุด")
+
+    p_rep = sub.add_parser("report", help="เทียบ FP32 vs INT8")
+    p_rep.add_argument("--models", nargs="+", default=list(QUANTIZABLE_MODELS), choices=QUANTIZABLE_MODELS)
+    p_rep.add_argument("--limit", type=int, default=50)
+    p_rep.add_argument("--out", default=None, help="บันทึกรายงานเป็น JSON")
+
+    args = parser.parse_args()
+
+    if args.command == "calibrate":
+        for model_key in args.models:
+            try:
+                quantize_model(model_key, args.mode, args.limit)
+            except Exception as e:
+                print(f"❌ [{model_key}] quantize failed: {e}")
+        return
+
+    reports = []
+    for model_key in args.models:
+        try:
+            report = build_report(model_key, args.limit)
+        except Exception as e:
+            print(f"❌ [{model_key}] report failed: {e}")
+            continue
+        reports.append(report)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"✅ บันทึกรายงาน: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+คำนวณผลวัดขนาดกุ้งใหม่จาก keypoint ที่บันทึกไว้ (*.keypoints.npz ดู process/size_recompute.py)
+ใช้หลังคาลิเบรตกล้องใหม่ (pixel_per_cm) หรือเปลี่ยนสมการน้ำหนัก (a, b) โดยไม่ต้อง inference ซ้ำ
+
+ตัวอย่าง:
+    python -m utils.recompute_size                                          # ทุกไฟล์ใน OUTPUT_SIZE ด้วยค่าเดิม
+    python -m utils.recompute_size --pixel-per-cm 6.4 --since 2025-09-01 --until 2025-10-01 --pond 2
+    python -m utils.recompute_size --a 0.0092 --b 3.05 --write              # เขียน {base}.recomputed.txt ข้างไฟล์เดิม
+"""
+
+import argparse
+import json
+import os
+
+from process.size import KEYPOINTS_SUFFIX
+from process.size_recompute import find_keypoints, recompute_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute shrimp size results from saved keypoints")
+    parser.add_argument("--dir", default=os.environ.get("OUTPUT_SIZE", "/data/local_storage/size"))
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD")
+    parser.add_argument("--pond", help="pond_id")
+    parser.add_argument("--pixel-per-cm", type=float, help="pixel ต่อ cm (default = ค่าที่ใช้ตอนวิเคราะห์)")
+    parser.add_argument("--a", type=float, help="a ของสมการน้ำหนัก a * L^b")
+    parser.add_argument("--b", type=float, help="b ของสมการน้ำหนัก a * L^b")
+    parser.add_argument("--total-larvae", type=int, help="จำนวนลูกกุ้งที่ปล่อย")
+    parser.add_argument("--min-conf", type=float, help="ตัดตัวที่ confidence ต่ำกว่านี้")
+    parser.add_argument("--write", action="store_true", help="เขียน {base}.recomputed.txt")
+    parser.add_argument("--json", action="store_true", help="พิมพ์ผลเป็น JSON")
+    args = parser.parse_args()
+
+    paths = find_keypoints(args.dir, args.since, args.until, args.pond)
+    if not paths:
+        print(f"⚠️ ไม่พบไฟล์ *{KEYPOINTS_SUFFIX} ใน {args.dir}")
+        return
+
+    results = recompute_files(paths, write=args.write, pixel_per_cm=args.pixel_per_cm, a=args.a, b=args.b,
+                              total_larvae=args.total_larvae, min_conf=args.min_conf)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"🔁 {len(results)} ภาพจาก {args.dir}")
+    for row in results:
+        print(f"  {row['created']}  บ่อ {row['pond_number']}  {row['count']:>3} ตัว  "
+              f"เฉลี่ย {row['avg_weight_g']:.2f} g  รอด {row['n_alive']}  "
+              f"อาหาร เบอร์ {row['feed_size']} {row['feed_kg']:.2f} kg/วัน  ({row['source']})")
+
+
+if __name__ == "__main__":
+    main()
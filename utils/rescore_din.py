@@ -0,0 +1,110 @@
+"""
+คำนวณผล din ใหม่จาก trajectory ที่บันทึกไว้ (*.tracks.npz ดู process/din_tracks.py) ด้วยเกณฑ์ใหม่
+ไม่ต้อง decode / inference ซ้ำ -> ลองหลาย threshold กับคลิปย้อนหลังหลายเดือนได้ในไม่กี่วินาที
+
+ต่อคู่เกณฑ์ (NO_MOVE_THRESHOLD, HEALTHY_MOVED_PERCENT) รายงาน:
+- จำนวนคลิป, % ที่ขยับเฉลี่ย, จำนวนคลิปที่ "สุขภาพดี"
+- changed : จำนวนคลิปที่สถานะรวมต่างจากเกณฑ์เดิมที่ใช้ตอนวิเคราะห์
+
+ตัวอย่าง:
+    python -m utils.rescore_din                                        # ทุกไฟล์ใน OUTPUT_DIN ด้วยเกณฑ์ปัจจุบัน
+    python -m utils.rescore_din --threshold 2 2.5 3 --healthy 60 70 --since 2025-09-01 --until 2025-10-01
+    python -m utils.rescore_din --threshold 3 --healthy 65 --write     # เขียน {base}.rescored.txt ข้างไฟล์เดิม
+"""
+
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+
+from process.din import HEALTHY_MOVED_PERCENT, NO_MOVE_THRESHOLD
+from process.din_tracks import TRACKS_SUFFIX, load_tracks, max_speed, rescore_file
+
+
+def find_tracks(directory: str, since: str = None, until: str = None) -> list:
+    """path ของ .tracks.npz ที่สร้างในช่วงวันที่ [since, until] (YYYY-MM-DD, ตาม meta "created")"""
+    paths = []
+    for path in sorted(glob.glob(os.path.join(directory, f"*{TRACKS_SUFFIX}"))):
+        if since or until:
+            day = load_tracks(path)["meta"].get("created", "")[:10]
+            if (since and day < since) or (until and day > until):
+                continue
+        paths.append(path)
+    return paths
+
+
+def sweep(paths: list, thresholds: list, healthy: list) -> dict:
+    """
+    {"files": [...], "grid": [{threshold, healthy, clips, healthy_clips, mean_moved_percent, changed}, ...]}
+    อ่านแต่ละไฟล์ครั้งเดียว แล้วเทียบทุก threshold พร้อมกันด้วย max_speed ของแต่ละ track
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    moved_pct = np.zeros((len(paths), len(thresholds)))
+    original = np.zeros(len(paths), dtype=bool)
+    files = []
+    for i, path in enumerate(paths):
+        tracks = load_tracks(path)
+        meta = tracks["meta"]
+        _, speed = max_speed(tracks)
+        if len(speed):
+            moved_pct[i] = (speed[None, :] > thresholds[:, None]).mean(axis=1) * 100
+        base_thr = meta.get("no_move_threshold", NO_MOVE_THRESHOLD)
+        base_pct = (speed > base_thr).mean() * 100 if len(speed) else 0.0
+        original[i] = base_pct >= meta.get("healthy_percent", HEALTHY_MOVED_PERCENT)
+        files.append({"path": path, "source": meta.get("source"), "created": meta.get("created"),
+                      "tracks": int(len(speed)), "moved_percent": moved_pct[i].round(2).tolist()})
+
+    grid = []
+    for j, threshold in enumerate(thresholds):
+        for cutoff in healthy:
+            is_healthy = moved_pct[:, j] >= cutoff
+            grid.append({
+                "threshold": float(threshold),
+                "healthy": float(cutoff),
+                "clips": len(paths),
+                "healthy_clips": int(is_healthy.sum()),
+                "mean_moved_percent": round(float(moved_pct[:, j].mean()), 2) if len(paths) else None,
+                "changed": int((is_healthy != original).sum()),
+            })
+    return {"files": files, "grid": grid}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescore din results from saved trajectories")
+    parser.add_argument("--dir", default=os.environ.get("OUTPUT_DIN", "/data/local_storage/din"))
+    parser.add_argument("--threshold", nargs="+", type=float, default=[NO_MOVE_THRESHOLD],
+                        help="NO_MOVE_THRESHOLD (pixel ต่อเฟรม)")
+    parser.add_argument("--healthy", nargs="+", type=float, default=[HEALTHY_MOVED_PERCENT],
+                        help="%% ที่ขยับขั้นต่ำที่ถือว่าสุขภาพดี")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD")
+    parser.add_argument("--write", action="store_true",
+                        help="เขียน {base}.rescored.txt (ใช้ threshold / healthy ค่าแรก)")
+    parser.add_argument("--json", action="store_true", help="พิมพ์ผลเป็น JSON (รวมรายไฟล์)")
+    args = parser.parse_args()
+
+    paths = find_tracks(args.dir, args.since, args.until)
+    if not paths:
+        print(f"⚠️ ไม่พบไฟล์ *{TRACKS_SUFFIX} ใน {args.dir}")
+        return
+
+    report = sweep(paths, args.threshold, args.healthy)
+    if args.write:
+        for path in paths:
+            rescore_file(path, args.threshold[0], args.healthy[0],
+                         output_txt_path=path[:-len(TRACKS_SUFFIX)] + ".rescored.txt")
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"🔁 {len(paths)} คลิปจาก {args.dir}")
+    for row in report["grid"]:
+        print(f"  threshold {row['threshold']:>5}  healthy {row['healthy']:>5}%  "
+              f"healthy_clips {row['healthy_clips']}/{row['clips']}  "
+              f"mean_moved {row['mean_moved_percent']}%  changed {row['changed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Content-addressed result cache สำหรับ /process
+key = sha256(bytes ที่ upload) + ชื่อ analyzer + version ของโมเดล
+Pi ที่ส่งไฟล์เดิมซ้ำ (retry ตอน Wi-Fi หลุด) จะได้ผลเดิมกลับไปทันที ไม่ต้องรัน YOLO / เขียน JSON / push / แจ้งเตือนซ้ำ
+
+- LRU + TTL eviction และจำกัดขนาดรวมของ index บนดิสก์
+- รองรับ idempotency key จาก client (map ไปยัง entry เดียวกัน)
+- งานที่กำลังรันอยู่ถูกจำไว้ด้วย (ตาม key และ idempotency key): retry ที่มาถึงระหว่างงานแรกยังไม่เสร็จ
+  จะรอผลของงานแรกแทนการรันซ้ำ (ดู claim / put / release)
+- index.json ถูกเขียนโดย thread เบื้องหลัง (รวมหลาย put เป็นการเขียนครั้งเดียว) ไม่ block event loop
+- ไม่แตะดิสก์ตอน import: อ่าน index ตอนใช้งานครั้งแรก และสร้างโฟลเดอร์
+  $LOCAL_STORAGE_BASE/cache ตอนเขียนครั้งแรก
+
+ตั้งค่าผ่าน ENV:
+    RESULT_CACHE_TTL          อายุ entry (วินาที, default 86400)
+    RESULT_CACHE_MAX_ENTRIES  จำนวน entry สูงสุด (default 2000)
+    RESULT_CACHE_MAX_BYTES    ขนาด index บนดิสก์สูงสุด (default 20MB)
+    RESULT_CACHE_SAVE_DELAY   รอรวม put ก่อนเขียน index.json (วินาที, default 1)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils import metrics
+from utils.env import env_number
+
+
+def make_key(digest: str, analyzer: str, model_version: str) -> str:
+    return f"{analyzer}:{model_version}:{digest}"
+
+
+def content_key(data: bytes, analyzer: str, model_version: str) -> str:
+    return make_key(hashlib.sha256(data).hexdigest(), analyzer, model_version)
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str = None, ttl: float = 86400, max_entries: int = 2000,
+                 max_bytes: int = 20 * 1024 * 1024, save_delay: float = 1.0):
+        self._cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> {"value", "created", "size"}
+        self._aliases = {}              # idempotency key -> key
+        self._inflight = {}             # key / idempotency key -> asyncio.Future ของงานที่กำลังรัน
+        self._dirty = threading.Event()
+        self._saver = None
+        self._loaded = False
+
+    @property
+    def cache_dir(self) -> str:
+        # None = อ่าน LOCAL_STORAGE_BASE ตอนใช้งาน (local_config อาจตั้ง ENV หลัง import โมดูลนี้)
+        if self._cache_dir is None:
+            return os.path.join(os.environ.get("LOCAL_STORAGE_BASE", "/data/local_storage"), "cache")
+        return self._cache_dir
+
+    @property
+    def index_file(self) -> str:
+        return os.path.join(self.cache_dir, "index.json")
+
+    # ---------- disk ----------
+    def _ensure_loaded(self):
+        # เรียกภายใต้ self._lock
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, entry in data.get("entries", []):
+                self._entries[key] = entry
+            self._aliases = data.get("aliases", {})
+        except Exception as e:
+            print(f"⚠️ Result cache index อ่านไม่ได้ เริ่มใหม่: {e}")
+            self._entries.clear()
+            self._aliases = {}
+
+    def _save(self):
+        # copy ภายใต้ lock (entry แต่ละตัวไม่ถูกแก้หลังสร้าง) แล้วค่อย serialize / เขียนนอก lock
+        with self._lock:
+            data = {"entries": list(self._entries.items()), "aliases": dict(self._aliases)}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_file)
+
+    def _save_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.save_delay)  # รวม put ที่ตามมาติดๆ เป็นการเขียนครั้งเดียว
+            self._dirty.clear()
+            try:
+                self._save()
+            except Exception as e:
+                print(f"⚠️ Result cache save failed: {e}")
+
+    def _schedule_save(self):
+        if self._saver is None:
+            self._saver = threading.Thread(target=self._save_loop, name="result-cache-saver", daemon=True)
+            self._saver.start()
+        self._dirty.set()
+
+    def flush(self):
+        """เขียน index.json ทันทีถ้ายังมี put ที่ไม่ได้เขียน (เรียกตอน shutdown)"""
+        if self._dirty.is_set():
+            self._dirty.clear()
+            try:
+                self._save()
+            except Exception as e:
+                print(f"⚠️ Result cache save failed: {e}")
+
+    # ---------- eviction ----------
+    def _evict(self):
+        now = time.time()
+        expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+        total = sum(e["size"] for e in self._entries.values())
+        while self._entries and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            total -= entry["size"]
+
+        self._aliases = {a: k for a, k in self._aliases.items() if k in self._entries}
+
+    # ---------- API ----------
+    def get(self, key: str, idempotency_key: str = None):
+        with self._lock:
+            self._ensure_loaded()
+            if idempotency_key and idempotency_key in self._aliases:
+                key = self._aliases[idempotency_key]
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry["created"] > self.ttl:
+                metrics.incr("result_cache.miss")
+                return None
+            self._entries.move_to_end(key)
+            metrics.incr("result_cache.hit")
+            return entry["value"]
+
+    async def claim(self, key: str, idempotency_key: str = None):
+        """
+        เรียกก่อนรันงาน (ใน event loop): คืนผลเดิมถ้ามีใน cache หรือรอผลของงานเดียวกันที่กำลังรันอยู่
+        ถ้าได้ None = ผู้เรียกเป็นเจ้าของงานนี้ ต้องเรียก put() เมื่อสำเร็จ หรือ release() เมื่อไม่สำเร็จเสมอ
+        (งานแรกล้มเหลว -> ผู้ที่รออยู่จะกลับมา claim ใหม่ และคนแรกที่เข้ามาจะรันเอง)
+        """
+        names = [name for name in (key, idempotency_key) if name]
+        while True:
+            cached = self.get(key, idempotency_key)
+            if cached is not None:
+                return cached
+            running = next((self._inflight[name] for name in names if name in self._inflight), None)
+            if running is None:
+                break
+            print(f"⏳ Waiting for in-flight job: {key}")
+            cached = await asyncio.shield(running)
+            if cached is not None:
+                metrics.incr("result_cache.inflight_hit")
+                return cached
+
+        future = asyncio.get_running_loop().create_future()
+        for name in names:
+            self._inflight[name] = future
+        return None
+
+    def _finish(self, key: str, idempotency_key: str, value):
+        future = next((self._inflight[name] for name in (key, idempotency_key) if name in self._inflight), None)
+        if future is None:
+            return
+        for name in [name for name, running in self._inflight.items() if running is future]:
+            del self._inflight[name]
+        if not future.done():
+            future.set_result(value)
+
+    def release(self, key: str, idempotency_key: str = None):
+        """ปล่อยงานที่ claim ไว้โดยไม่มีผล (งานล้มเหลว) ถ้า put ไปแล้วจะไม่มีผลอะไร"""
+        self._finish(key, idempotency_key, None)
+
+    def put(self, key: str, value: dict, idempotency_key: str = None):
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[key] = {"value": value, "created": time.time(), "size": size}
+            self._entries.move_to_end(key)
+            if idempotency_key:
+                self._aliases[idempotency_key] = key
+            self._evict()
+        self._finish(key, idempotency_key, value)
+        self._schedule_save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e["size"] for e in self._entries.values()),
+                "aliases": len(self._aliases),
+            }
+
+
+result_cache = ResultCache(
+    ttl=env_number("RESULT_CACHE_TTL", 86400, float),
+    max_entries=env_number("RESULT_CACHE_MAX_ENTRIES", 2000, int),
+    max_bytes=env_number("RESULT_CACHE_MAX_BYTES", 20 * 1024 * 1024, int),
+    save_delay=env_number("RESULT_CACHE_SAVE_DELAY", 1.0, float),
+)
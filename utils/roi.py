@@ -0,0 +1,182 @@
+"""
+ROI (region of interest) ต่อบ่อ: กรอบของถาด / ยอในภาพ size (input_raspi1) และวิดีโอ din (input_video)
+analyzer crop เฉพาะในกรอบก่อนส่งเข้าโมเดลแล้ว map พิกัดกลับเป็นพิกัดภาพเต็ม
+-> pixel น้อยลง inference เร็วขึ้น และไม่นับของที่อยู่นอกถาด
+
+กรอบเก็บเป็นสัดส่วน 0-1 ของภาพ (x1, y1, x2, y2) ใช้ได้กับทุกความละเอียด (รวมภาพที่ decode แบบย่อ)
+แยกตามประเภท (size / din) และบ่อ ใน LOCAL_STORAGE_BASE/roi/rois.json (worker ทุก process อ่านไฟล์เดียวกัน)
+    manual : ตั้งผ่าน POST /ponds/{pond_id}/roi
+    auto   : หาขอบถาดจากภาพแรกที่เข้ามา (detect_tray) แล้ว cache ไว้ ลบด้วย DELETE เพื่อให้หาใหม่
+
+ตั้งค่าผ่าน ENV:
+    ROI_MODE       off / manual / auto (default off = ใช้ภาพเต็มแบบเดิม)
+    ROI_MIN_AREA   พื้นที่ขั้นต่ำของถาดที่ auto หาเจอ เป็นสัดส่วนของภาพ (default 0.15)
+    ROI_PAD        ขยายกรอบที่ auto หาเจอออกแต่ละด้าน เป็นสัดส่วนของภาพ (default 0.02)
+"""
+
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils.env import env_number
+
+ROI_KINDS = ("size", "din")
+DETECT_WIDTH = 320   # ย่อภาพก่อนหาขอบถาด
+
+
+def roi_mode() -> str:
+    mode = (os.environ.get("ROI_MODE") or "off").lower()
+    return mode if mode in ("manual", "auto") else "off"
+
+
+def normalize_box(box) -> tuple:
+    """ตรวจ + จัดรูปกรอบสัดส่วน (x1, y1, x2, y2) ให้อยู่ใน 0-1 และมีพื้นที่"""
+    x1, y1, x2, y2 = (float(v) for v in box)
+    x1, x2 = sorted((min(max(x1, 0.0), 1.0), min(max(x2, 0.0), 1.0)))
+    y1, y2 = sorted((min(max(y1, 0.0), 1.0), min(max(y2, 0.0), 1.0)))
+    if x2 - x1 <= 0.01 or y2 - y1 <= 0.01:
+        raise ValueError(f"❌ ROI เล็กเกินไป: {box}")
+    return x1, y1, x2, y2
+
+
+def to_pixels(box, width: int, height: int) -> tuple:
+    """กรอบสัดส่วน -> (x1, y1, x2, y2) pixel ของภาพขนาด width x height"""
+    x1, y1, x2, y2 = box
+    return (int(x1 * width), int(y1 * height),
+            max(int(x1 * width) + 1, int(round(x2 * width))),
+            max(int(y1 * height) + 1, int(round(y2 * height))))
+
+
+# ===================== auto detect =====================
+def detect_tray(image: np.ndarray):
+    """
+    หากรอบของถาดจากภาพ BGR: Otsu threshold (ทั้งฝั่งสว่าง / มืด) + ปิดรูด้วย morphology
+    แล้วเลือก component ที่ใหญ่และทึบ (พื้นที่ / พื้นที่ bbox) ที่สุด คืนกรอบสัดส่วน หรือ None ถ้าไม่เจอ
+    """
+    h, w = image.shape[:2]
+    small = cv2.resize(image, (DETECT_WIDTH, max(1, h * DETECT_WIDTH // w)), interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (15, 15))
+    min_area = env_number("ROI_MIN_AREA", 0.15, float) * gray.size
+
+    best, best_score = None, 0.0
+    for mask in (binary, cv2.bitwise_not(binary)):
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        for x, y, bw, bh, area in stats[1:]:
+            if area < min_area or bw * bh >= 0.95 * gray.size:
+                continue
+            score = area * area / (bw * bh)  # ใหญ่ + ทึบ (ถาดเป็นสี่เหลี่ยม / วงกลม)
+            if score > best_score:
+                best, best_score = (x, y, x + bw, y + bh), score
+    if best is None:
+        return None
+
+    pad = env_number("ROI_PAD", 0.02, float)
+    sh, sw = gray.shape
+    x1, y1, x2, y2 = best
+    return normalize_box((x1 / sw - pad, y1 / sh - pad, x2 / sw + pad, y2 / sh + pad))
+
+
+# ===================== store =====================
+class RoiStore:
+    """{kind: {pond_id: {"box": [x1, y1, x2, y2], "source": "manual" / "auto", "updated": epoch}}}"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        self._mtime = None
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._data, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+        except Exception as e:
+            print(f"⚠️ ROI file อ่านไม่ได้: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def entry(self, kind: str, pond_id):
+        with self._lock:
+            self._reload()
+            return self._data.get(kind, {}).get(str(pond_id))
+
+    def set(self, kind: str, pond_id, box, source: str = "manual") -> dict:
+        if kind not in ROI_KINDS:
+            raise ValueError(f"❌ Unknown ROI kind: {kind} (ใช้ได้: {', '.join(ROI_KINDS)})")
+        entry = {"box": list(normalize_box(box)), "source": source, "updated": time.time()}
+        with self._lock:
+            self._reload()
+            self._data.setdefault(kind, {})[str(pond_id)] = entry
+            self._save()
+        return entry
+
+    def clear(self, kind: str, pond_id) -> bool:
+        with self._lock:
+            self._reload()
+            removed = self._data.get(kind, {}).pop(str(pond_id), None) is not None
+            if removed:
+                self._save()
+            return removed
+
+    def all(self, pond_id=None) -> dict:
+        with self._lock:
+            self._reload()
+            if pond_id is None:
+                return json.loads(json.dumps(self._data))
+            return {kind: ponds[str(pond_id)] for kind, ponds in self._data.items() if str(pond_id) in ponds}
+
+
+roi_store = RoiStore(os.path.join(os.environ.get("LOCAL_STORAGE_BASE", "/data/local_storage"), "roi", "rois.json"))
+
+
+def stored_roi(kind: str, pond_id):
+    """กรอบที่ใช้ได้ตอนนี้ (ไม่ detect ใหม่) ตาม ROI_MODE หรือ None"""
+    mode = roi_mode()
+    if mode == "off" or pond_id is None:
+        return None
+    entry = roi_store.entry(kind, pond_id)
+    if entry is None or (mode == "manual" and entry["source"] != "manual"):
+        return None
+    return tuple(entry["box"])
+
+
+def roi_for(kind: str, pond_id, image: np.ndarray = None):
+    """
+    กรอบสัดส่วนของบ่อนี้ หรือ None (= ใช้ภาพเต็ม)
+    ROI_MODE=auto และยังไม่มีกรอบ -> หาจาก image แล้ว cache ไว้ (หาไม่เจอก็ใช้ภาพเต็มรอบนี้ แล้วลองใหม่รอบหน้า)
+    """
+    box = stored_roi(kind, pond_id)
+    if box is not None or roi_mode() != "auto" or pond_id is None or image is None:
+        return box
+    box = detect_tray(image)
+    if box is not None:
+        roi_store.set(kind, pond_id, box, source="auto")
+        print(f"🔲 Auto ROI ({kind} pond {pond_id}): {tuple(round(v, 3) for v in box)}")
+    return box
+
+
+def roi_signature(kind: str, pond_id) -> str:
+    """ข้อความสั้นๆ ของกรอบที่ใช้อยู่ (ไว้ผสมใน result cache key) หรือ None"""
+    box = stored_roi(kind, pond_id)
+    return "roi=" + ",".join(f"{v:.3f}" for v in box) if box is not None else None
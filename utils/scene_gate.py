@@ -0,0 +1,125 @@
+"""
+Scene-change gate สำหรับกล้องที่ถ่ายมุมเดิมเป็นรอบๆ (water / shrimp_float)
+เทียบภาพใหม่กับภาพล่าสุดที่ "รันโมเดลจริง" ของบ่อเดียวกัน ถ้าฉากแทบไม่เปลี่ยนจะใช้ผลเดิมซ้ำแทนการรัน inference
+
+fingerprint ของภาพ (decode แบบ 1/8 จาก JPEG DCT จึงถูกมาก):
+- dHash 64 bit จากภาพ gray 9x8   -> จับการเปลี่ยนรูปร่าง / วัตถุในฉาก
+- thumbnail สี 16x16              -> จับการเปลี่ยนสีโดยรวม (เช่น สีน้ำ) ที่ dHash มองไม่เห็น
+
+ตั้งค่าผ่าน ENV:
+    SCENE_GATE                 1 = เปิด (default), 0 = ปิด (รันโมเดลทุกภาพ)
+    SCENE_GATE_HASH_BITS       จำนวน bit ของ dHash ที่ต่างได้สูงสุดถึงจะถือว่าฉากเดิม (default 4)
+    SCENE_GATE_COLOR_DIFF      ค่าเฉลี่ยผลต่างสีของ thumbnail (0-255) ที่ยอมได้ (default 6)
+    SCENE_GATE_MAX_STALENESS   อายุสูงสุดของผลเดิมที่ยอมใช้ซ้ำ (วินาที, default 3600)
+hit / miss ถูกนับใน utils.metrics เป็น "scene_gate.hit.<kind>" / "scene_gate.miss.<kind>"
+"""
+
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils import metrics
+from utils.env import env_number
+
+
+class Fingerprint:
+    def __init__(self, dhash: np.ndarray, thumb: np.ndarray):
+        self.dhash = dhash    # bool (64,)
+        self.thumb = thumb    # float32 (16, 16, 3)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Fingerprint":
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_8)
+        if image is None:
+            raise ValueError(f"❌ decode ภาพไม่ได้ (<{len(data)} bytes>)")
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        dhash = (small[:, 1:] > small[:, :-1]).ravel()
+        thumb = cv2.resize(image, (16, 16), interpolation=cv2.INTER_AREA).astype(np.float32)
+        return cls(dhash, thumb)
+
+    def distance(self, other: "Fingerprint") -> tuple[int, float]:
+        """(จำนวน bit ของ dHash ที่ต่างกัน, ค่าเฉลี่ยผลต่างสีของ thumbnail)"""
+        bits = int(np.count_nonzero(self.dhash != other.dhash))
+        color = float(np.abs(self.thumb - other.thumb).mean())
+        return bits, color
+
+
+class SceneGate:
+    def __init__(self, hash_bits: int = 4, color_diff: float = 6.0, max_staleness: float = 3600,
+                 enabled: bool = True):
+        self.hash_bits = hash_bits
+        self.color_diff = color_diff
+        self.max_staleness = max_staleness
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._state = {}   # (kind, pond_id) -> {"fingerprint", "result", "version", "time"}
+        self._counts = {}  # kind -> [hit, miss]
+
+    def _count(self, kind: str, hit: bool):
+        with self._lock:
+            counts = self._counts.setdefault(kind, [0, 0])
+            counts[0 if hit else 1] += 1
+        metrics.incr(f"scene_gate.{'hit' if hit else 'miss'}.{kind}")
+
+    def _reusable(self, state: dict, fingerprint: Fingerprint, version: str) -> bool:
+        if state is None or state["version"] != version:
+            return False
+        if time.time() - state["time"] > self.max_staleness:
+            return False
+        # ไฟล์ผลเดิมต้องยังอยู่ (อาจถูกลบ / ย้ายไปแล้ว)
+        if not all(os.path.exists(p) for p in state["result"].paths()):
+            return False
+        bits, color = fingerprint.distance(state["fingerprint"])
+        return bits <= self.hash_bits and color <= self.color_diff
+
+    def check(self, kind: str, pond_id, data: bytes, version: str):
+        """
+        คืนค่า (ผลเดิม หรือ None, fingerprint ของภาพใหม่)
+        ถ้าได้ None ให้รันโมเดลแล้วเรียก update() ด้วย fingerprint เดียวกัน
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            fingerprint = Fingerprint.from_bytes(data)
+        except Exception as e:
+            print(f"⚠️ Scene gate skip ({kind} pond {pond_id}): {e}")
+            return None, None
+
+        with self._lock:
+            state = self._state.get((kind, pond_id))
+        if self._reusable(state, fingerprint, version):
+            self._count(kind, True)
+            return state["result"], fingerprint
+        self._count(kind, False)
+        return None, fingerprint
+
+    def update(self, kind: str, pond_id, fingerprint: Fingerprint, result, version: str):
+        """จำผลของภาพที่รันโมเดลจริง (process.results.AnalysisResult) ไว้เป็นฐานเทียบของบ่อนี้"""
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._state[(kind, pond_id)] = {
+                "fingerprint": fingerprint,
+                "result": result,
+                "version": version,
+                "time": time.time(),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                kind: {"hit": hit, "miss": miss, "hit_rate": round(hit / (hit + miss), 4) if hit + miss else 0.0}
+                for kind, (hit, miss) in self._counts.items()
+            }
+
+
+scene_gate = SceneGate(
+    hash_bits=env_number("SCENE_GATE_HASH_BITS", 4, int),
+    color_diff=env_number("SCENE_GATE_COLOR_DIFF", 6.0, float),
+    max_staleness=env_number("SCENE_GATE_MAX_STALENESS", 3600, float),
+    enabled=os.environ.get("SCENE_GATE", "1") != "0",
+)
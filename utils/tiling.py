@@ -0,0 +1,60 @@
+"""
+Tiled inference: แบ่งภาพความละเอียดสูงเป็น tile ที่ซ้อนกัน ส่งทุก tile เข้าโมเดลเป็น batch เดียว
+แล้วรวม box จากทุก tile ด้วย NMS (numpy) -> วัตถุเล็กๆ ไม่ถูกย่อจนหายตอน letterbox ทั้งภาพลงเหลือ imgsz
+CPU ถูกคุมด้วยจำนวน tile สูงสุด (ถ้าเกิน tile จะถูกขยายจนจำนวนพอดี) แทนการเพิ่ม imgsz ทั้งภาพ
+"""
+
+import math
+
+import numpy as np
+
+
+def _axis_starts(length: int, tile: int, overlap: float) -> list:
+    """จุดเริ่มของ tile บนแกนหนึ่ง กระจายเท่าๆ กันจาก 0 ถึง length - tile (ซ้อนกันอย่างน้อย overlap)"""
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    count = math.ceil((length - tile) / step) + 1
+    return np.linspace(0, length - tile, count).round().astype(int).tolist()
+
+
+def tile_grid(width: int, height: int, tile: float, overlap: float = 0.2, max_tiles: int = None) -> list:
+    """
+    กรอบ tile (x1, y1, x2, y2) pixel ที่ครอบทั้งภาพ width x height เรียงแถวละซ้ายไปขวา
+    tile = ขนาดด้านของ tile, overlap = สัดส่วนที่ tile ติดกันซ้อนกัน (0-1)
+    ถ้าได้เกิน max_tiles จะขยาย tile ทีละ 25% จนจำนวนไม่เกิน (แต่ละ tile ถูกย่อเข้าโมเดลมากขึ้นแทน)
+    """
+    tile = max(32, int(tile))
+    overlap = min(max(overlap, 0.0), 0.9)
+    while True:
+        xs = _axis_starts(width, tile, overlap)
+        ys = _axis_starts(height, tile, overlap)
+        if not max_tiles or len(xs) * len(ys) <= max_tiles:
+            break
+        tile = int(tile * 1.25) + 1
+    tile_w, tile_h = min(tile, width), min(tile, height)
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+
+def nms(boxes, scores, iou_threshold: float = 0.5, ios_threshold: float = None) -> np.ndarray:
+    """
+    greedy NMS แบบไม่แยก class คืน index ของ box ที่เก็บไว้ เรียงจาก score มากไปน้อย
+    ios_threshold : ตัด box ที่ถูก box ที่ score สูงกว่าครอบเกือบทั้งตัวด้วย (intersection / พื้นที่ box ที่เล็กกว่า)
+                    -> วัตถุที่ขอบ tile ตัดเหลือครึ่งตัวจะไม่ซ้ำกับตัวเต็มจาก tile ข้างๆ
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+    areas = np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = w * h
+        suppress = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9) > iou_threshold
+        if ios_threshold is not None:
+            suppress |= inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9) > ios_threshold
+        order = rest[~suppress]
+    return np.asarray(keep, dtype=np.int64)
@@ -0,0 +1,179 @@
+"""
+เขียนวิดีโอจากเฟรม BGR (OpenCV) โดยตรง: pipe raw bgr24 เข้า ffmpeg subprocess ไม่ต้องแปลง BGR->RGB ทีละเฟรม
+ffmpeg แปลงสี / ย่อขนาด / encode เองใน process ของมัน ตั้งค่า codec / preset / CRF / ความกว้าง / faststart ได้
+ถ้าหา ffmpeg ไม่เจอ (หรือเปิดไม่ได้) ใช้ cv2.VideoWriter (mp4v) แทน
+stderr ของ ffmpeg ถูกเขียนลงไฟล์ชั่วคราว (ไม่ใช่ pipe ที่ไม่มีใครอ่าน ซึ่ง ffmpeg จะค้างเมื่อ buffer เต็ม)
+และถูกอ่านเฉพาะตอน encode ล้มเหลวเพื่อรายงาน error
+close() คืนสถิติ: backend, frames, seconds (เวลาที่ใช้ encode รวมเวลารอ pipe), bytes (ขนาดไฟล์)
+
+ตั้งค่า default ผ่าน ENV:
+    VIDEO_CODEC      codec ของ ffmpeg (default libx264)
+    VIDEO_PRESET     preset ของ x264 / x265 (default veryfast)
+    VIDEO_CRF        คุณภาพ (ยิ่งมากไฟล์ยิ่งเล็ก, default 28)
+    VIDEO_WIDTH      ย่อความกว้างของวิดีโอผลลัพธ์ (pixel, default 0 = ขนาดเดิม)
+    VIDEO_FASTSTART  1 = ย้าย moov atom ไว้ต้นไฟล์ให้แอปเริ่มเล่นได้ก่อนโหลดจบ (default 1)
+    VIDEO_BACKEND    ffmpeg / cv2 (default ffmpeg)
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from utils.env import env_number
+
+
+def ffmpeg_exe():
+    """path ของ ffmpeg (ของ imageio-ffmpeg ก่อน แล้วค่อยหาใน PATH) หรือ None"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+def _even(value: float) -> int:
+    return max(2, int(value) // 2 * 2)
+
+
+class VideoWriter:
+    """
+    writer = VideoWriter(path, fps)
+    writer.write(frame_bgr) ...
+    stats = writer.close()
+    ขนาดวิดีโอกำหนดจากเฟรมแรก (ถ้าไม่ส่ง size มา) เฟรมถัดไปต้องขนาดเท่ากัน
+    """
+
+    def __init__(self, path: str, fps: float, size: tuple = None, codec: str = None, preset: str = None,
+                 crf: int = None, width: int = None, faststart: bool = None, backend: str = None):
+        self.path = path
+        self.fps = fps or 25
+        self.codec = codec or os.environ.get("VIDEO_CODEC") or "libx264"
+        self.preset = preset or os.environ.get("VIDEO_PRESET") or "veryfast"
+        self.crf = crf if crf is not None else env_number("VIDEO_CRF", 28, int)
+        self.width = width if width is not None else env_number("VIDEO_WIDTH", 0, int)
+        self.faststart = (faststart if faststart is not None
+                          else os.environ.get("VIDEO_FASTSTART", "1") == "1")
+        self.backend = (backend or os.environ.get("VIDEO_BACKEND") or "ffmpeg").lower()
+        self.frames = 0
+        self.seconds = 0.0
+        self._proc = None
+        self._stderr = None
+        self._cv2 = None
+        self._in_size = None
+        self._out_size = None
+        if size is not None:
+            self._open(size)
+
+    # ------------------------------
+    # เปิด backend
+    # ------------------------------
+    def _open(self, size: tuple):
+        w, h = size
+        self._in_size = (w, h)
+        if self.width and self.width < w:
+            self._out_size = (_even(self.width), _even(h * self.width / w))
+        else:
+            self._out_size = (_even(w), _even(h))
+
+        exe = ffmpeg_exe() if self.backend == "ffmpeg" else None
+        if exe:
+            self._stderr = tempfile.TemporaryFile()
+            try:
+                self._proc = subprocess.Popen(self._ffmpeg_args(exe), stdin=subprocess.PIPE,
+                                              stdout=subprocess.DEVNULL, stderr=self._stderr)
+                return
+            except OSError as e:
+                self._close_stderr()
+                print(f"⚠️ เปิด ffmpeg ไม่ได้ ({e}), ใช้ cv2.VideoWriter แทน")
+        self._cv2 = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, self._out_size)
+        if not self._cv2.isOpened():
+            raise IOError(f"❌ เปิด VideoWriter ไม่ได้: {self.path}")
+
+    def _ffmpeg_args(self, exe: str) -> list:
+        w, h = self._in_size
+        args = [
+            exe, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{w}x{h}", "-r", f"{self.fps}", "-i", "-",
+            "-an", "-c:v", self.codec, "-pix_fmt", "yuv420p",
+        ]
+        if self._out_size != self._in_size:
+            args += ["-vf", f"scale={self._out_size[0]}:{self._out_size[1]}"]
+        if self.codec in ("libx264", "libx265"):
+            args += ["-preset", self.preset, "-crf", str(self.crf)]
+        if self.faststart:
+            args += ["-movflags", "+faststart"]
+        return args + [self.path]
+
+    def _ffmpeg_error(self) -> str:
+        """ข้อความ error ของ ffmpeg (เรียกหลัง process จบแล้วเท่านั้น)"""
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()[-2000:]  # ท้ายสุดคือสาเหตุจริง
+
+    def _close_stderr(self):
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+
+    @property
+    def backend_name(self) -> str:
+        if self._proc is not None:
+            return f"ffmpeg {self.codec}"
+        return "cv2 mp4v"
+
+    # ------------------------------
+    # เขียน / ปิด
+    # ------------------------------
+    def write(self, frame: np.ndarray):
+        if self._in_size is None:
+            self._open((frame.shape[1], frame.shape[0]))
+        started = time.perf_counter()
+        if (frame.shape[1], frame.shape[0]) != self._in_size:
+            frame = cv2.resize(frame, self._in_size)
+        if self._proc is not None:
+            try:
+                self._proc.stdin.write(np.ascontiguousarray(frame).data)
+            except BrokenPipeError:
+                self._proc.wait()
+                raise IOError(f"❌ ffmpeg หยุดทำงาน: {self._ffmpeg_error()}")
+        else:
+            if self._out_size != self._in_size:
+                frame = cv2.resize(frame, self._out_size, interpolation=cv2.INTER_AREA)
+            self._cv2.write(frame)
+        self.seconds += time.perf_counter() - started
+        self.frames += 1
+
+    def close(self) -> dict:
+        started = time.perf_counter()
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            try:
+                if self._proc.wait() != 0:
+                    raise IOError(f"❌ ffmpeg encode ไม่สำเร็จ: {self._ffmpeg_error()}")
+            finally:
+                self._close_stderr()
+        elif self._cv2 is not None:
+            self._cv2.release()
+        self.seconds += time.perf_counter() - started
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend_name,
+            "frames": self.frames,
+            "seconds": self.seconds,
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+def describe(stats: dict) -> str:
+    """บรรทัดสรุปสำหรับ txt ผลลัพธ์"""
+    return (f"🎬 encode {stats['frames']} เฟรม ({stats['backend']}) {stats['seconds']:.1f}s, "
+            f"{stats['bytes'] / 1e6:.1f} MB")
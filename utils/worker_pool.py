@@ -0,0 +1,291 @@
+"""
+Process-pool inference workers
+งานหนักของแต่ละ analyzer ถูกส่งไปรันใน process แยกตามประเภท (size / shrimp / water / din)
+แต่ละ process มีโมเดลของตัวเอง (โหลดผ่าน utils.model_registry ใน process นั้น)
+event loop ของ FastAPI จึงไม่ต้องแย่ง GIL / torch threads กับงาน inference
+
+ตั้งค่าผ่าน ENV:
+    INFERENCE_WORKERS_<KIND>   จำนวน process ต่อประเภท (default = INFERENCE_WORKERS หรือ 1)
+                               ตั้งเป็น 0 = รันใน thread ของ process หลักแบบเดิม (asyncio.to_thread)
+    INFERENCE_TORCH_THREADS    จำนวน torch intra-op threads ต่อ process (default = CPU / จำนวน worker ทั้งหมด)
+    INFERENCE_JOBS_<KIND>      จำนวนงานสูงสุดที่ส่งเข้า worker พร้อมกันในครั้งเดียว
+                               (default = BATCH_MAX_SIZE_<KIND> / BATCH_MAX_SIZE หรือ 8, din = 1)
+
+worker 1 process รับงานได้ทีละ 1 ครั้งเรียก จึงรวมงานที่รอ worker ของประเภทเดียวกันไว้ในก้อนเดียว
+(รอไม่เกิน BATCH_MAX_WAIT_MS_<KIND> / BATCH_MAX_WAIT_MS หรือ 15 ms) แล้วส่งไปทีเดียว
+worker รันทุกงานในก้อนพร้อมกันคนละ thread -> MicroBatcher ใน worker เห็นภาพพร้อมกันและรวมเป็น batch ได้จริง
+"""
+
+import asyncio
+import functools
+import importlib
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import metrics
+from utils.env import env_number
+
+ANALYZERS = {
+    "size": ("process.size", "analyze_shrimp"),
+    "shrimp": ("process.shrimp", "analyze_kuny"),
+    "water": ("process.water", "analyze_water"),
+    "din": ("process.din", "analyze_video"),
+}
+
+
+def _resolve(kind: str, entry: str = None):
+    """ฟังก์ชัน analyzer ของประเภทนี้ (entry = ชื่อฟังก์ชันอื่นในโมดูลเดียวกัน เช่น analyze_sampling_session)"""
+    module_name, func_name = ANALYZERS[kind]
+    return getattr(importlib.import_module(module_name), entry or func_name)
+
+
+def worker_count(kind: str) -> int:
+    value = os.environ.get(f"INFERENCE_WORKERS_{kind.upper()}") or os.environ.get("INFERENCE_WORKERS")
+    return int(value) if value not in (None, "") else 1
+
+
+def jobs_per_dispatch(kind: str) -> int:
+    """จำนวนงานสูงสุดต่อการส่งเข้า worker 1 ครั้ง (din มี batch เฟรมของตัวเอง จึงไม่รวมงาน)"""
+    default = 1 if kind == "din" else env_number("BATCH_MAX_SIZE", 8, int, key=kind)
+    return max(1, env_number("INFERENCE_JOBS", default, int, key=kind))
+
+
+def _torch_threads() -> int:
+    value = os.environ.get("INFERENCE_TORCH_THREADS")
+    if value:
+        return int(value)
+    total = sum(max(0, worker_count(kind)) for kind in ANALYZERS) or 1
+    return max(1, (os.cpu_count() or 1) // total)
+
+
+# ===================== ฝั่ง worker process =====================
+def _init_worker(kind: str, model_path: str = None, backend: str = None):
+    """รันครั้งเดียวตอน worker process เริ่ม: จำกัด torch threads แล้วโหลด + warmup โมเดลของประเภทนั้น"""
+    try:
+        import torch
+        torch.set_num_threads(_torch_threads())
+    except ImportError:
+        pass
+
+    from utils.model_registry import registry
+    if model_path or backend:
+        registry.reload(kind, model_path, backend)
+    else:
+        registry.preload([kind])
+
+
+def _picklable(error: Exception) -> Exception:
+    """exception ที่ส่งกลับ process หลักได้ (บางตัว pickle ไม่ได้ -> แปลงเป็น RuntimeError)"""
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _run_job(kind: str, job: tuple) -> tuple:
+    args, kwargs, entry = job
+    try:
+        return True, _resolve(kind, entry)(*args, **kwargs)
+    except Exception as e:
+        return False, _picklable(e)
+
+
+def _run_jobs(kind: str, jobs: list) -> list:
+    """
+    รันทุกงานในก้อนพร้อมกันคนละ thread (ภาพของทุกงานเข้า MicroBatcher ของ process นี้พร้อมกัน)
+    คืน ([(สำเร็จ?, ผลลัพธ์ หรือ exception)] เรียงตาม jobs, metrics ที่เกิดใน worker นับจากครั้งก่อน)
+    """
+    if len(jobs) == 1:
+        outcomes = [_run_job(kind, jobs[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix=f"job-{kind}") as threads:
+            outcomes = list(threads.map(functools.partial(_run_job, kind), jobs))
+    return outcomes, metrics.drain()
+
+
+def _model_status(kind: str) -> dict:
+    from utils.model_registry import registry
+    return registry.status()[kind]
+
+
+# ===================== ฝั่ง process หลัก =====================
+class WorkerPools:
+    def __init__(self):
+        self._pools = {}
+        self._overrides = {}
+        self._info = {}
+        self._lock = threading.Lock()
+        self._pending = {}      # kind -> [((args, kwargs, entry), asyncio.Future)] งานที่รอส่งเข้า worker
+        self._slots = {}        # kind -> asyncio.Semaphore (จำนวนก้อนที่ส่งค้างได้ = จำนวน worker)
+        self._dispatchers = {}  # kind -> asyncio.Task ที่รวมงานใน _pending เป็นก้อน
+        self._inflight = set()
+
+    def _create(self, kind: str, override: tuple = None) -> ProcessPoolExecutor:
+        model_path, backend = override or self._overrides.get(kind, (None, None))
+        print(f"⚙️ Starting {worker_count(kind)} inference worker(s) for '{kind}'")
+        return ProcessPoolExecutor(
+            max_workers=worker_count(kind),
+            # spawn: ไม่ fork สถานะ torch / thread ของ process หลักไปด้วย
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(kind, model_path, backend),
+        )
+
+    def get(self, kind: str) -> ProcessPoolExecutor:
+        pool = self._pools.get(kind)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(kind)
+                if pool is None:
+                    pool = self._create(kind)
+                    self._pools[kind] = pool
+        return pool
+
+    def _discard(self, kind: str, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pools.get(kind) is pool:
+                del self._pools[kind]
+        pool.shutdown(wait=False, cancel_futures=False)
+
+    async def run(self, kind: str, *args, entry: str = None, **kwargs):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(kind, []).append(((args, kwargs, entry), future))
+        dispatcher = self._dispatchers.get(kind)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[kind] = loop.create_task(self._dispatch(kind))
+        return await future
+
+    async def _dispatch(self, kind: str):
+        """รอ worker ว่าง แล้วส่งงานที่ค้างอยู่ (ไม่เกิน jobs_per_dispatch) เป็นก้อนเดียว จนคิวหมด"""
+        pending = self._pending[kind]
+        slots = self._slots.setdefault(kind, asyncio.Semaphore(max(1, worker_count(kind))))
+        limit = jobs_per_dispatch(kind)
+        max_wait = env_number("BATCH_MAX_WAIT_MS", 15, float, key=kind) / 1000
+        while pending:
+            await slots.acquire()
+            if limit > 1 and len(pending) < limit and max_wait > 0:
+                await asyncio.sleep(max_wait)  # เปิดช่องให้ request ที่เข้ามาพร้อมๆ กันได้ไปก้อนเดียวกัน
+            group = [item for item in pending[:limit] if not item[1].done()]
+            del pending[:limit]
+            if not group:
+                slots.release()
+                continue
+            task = asyncio.get_running_loop().create_task(self._send(kind, group))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _send(self, kind: str, group: list):
+        loop = asyncio.get_running_loop()
+        pool = self.get(kind)
+        try:
+            outcomes, worker_metrics = await loop.run_in_executor(pool, _run_jobs, kind, [job for job, _ in group])
+            metrics.merge(worker_metrics)
+        except BrokenProcessPool as e:
+            # worker ตาย (เช่น OOM) -> ทิ้ง pool นี้ ให้ request ถัดไปสร้างใหม่
+            print(f"🚨 Inference pool '{kind}' crashed, restarting on next job")
+            self._discard(kind, pool)
+            outcomes = [(False, e)] * len(group)
+        except Exception as e:
+            outcomes = [(False, e)] * len(group)
+        if len(group) > 1:
+            print(f"📦 {kind}: ส่ง {len(group)} งานเข้า worker ในครั้งเดียว")
+
+        for (_, future), (ok, value) in zip(group, outcomes):
+            if future.done():  # ผู้เรียกยกเลิกไปแล้ว
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def reload(self, kind: str, model_path: str = None, backend: str = None) -> dict:
+        """
+        hot-swap โมเดลของ worker: สร้าง pool ใหม่ที่โหลดโมเดลใหม่ + warmup ให้พร้อมก่อน (ครบทุก worker)
+        แล้วค่อยสลับแทน pool เดิม (งานที่ค้างอยู่ใน pool เดิมจะรันต่อจนจบ)
+        ถ้า worker ใหม่โหลดโมเดลไม่ได้ (initializer ล้ม -> BrokenProcessPool) จะทิ้ง pool ใหม่
+        ใช้ pool เดิมต่อ แล้ว raise RuntimeError
+        """
+        if kind not in ANALYZERS:
+            raise ValueError(f"❌ Unknown model key: {kind}")
+        if model_path and not os.path.exists(model_path):
+            raise FileNotFoundError(f"❌ Model file not found: {model_path}")
+
+        new_pool = self._create(kind, (model_path, backend))
+        try:
+            # ส่งงานพร้อมกันเท่าจำนวน worker: pool spawn worker เพิ่มเมื่อไม่มีตัวว่าง ทุกตัวจึงผ่าน initializer ก่อนสลับ
+            futures = [new_pool.submit(_model_status, kind) for _ in range(worker_count(kind))]
+            info = [future.result() for future in futures][0]
+        except BrokenProcessPool as e:
+            new_pool.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError(f"❌ Worker โหลดโมเดลใหม่ของ '{kind}' ไม่สำเร็จ ใช้โมเดลเดิมต่อ: {e}") from e
+        except Exception:
+            new_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        with self._lock:
+            self._overrides[kind] = (model_path, backend)
+            self._info[kind] = info
+            old_pool = self._pools.get(kind)
+            self._pools[kind] = new_pool
+        if old_pool is not None:
+            old_pool.shutdown(wait=False, cancel_futures=False)
+        return info
+
+    def preload(self, kinds):
+        """เริ่ม pool + โหลดโมเดลล่วงหน้า (ไม่รอผล)"""
+        for kind in kinds:
+            self.get(kind).submit(_model_status, kind)
+
+    def model_version(self, kind: str) -> str:
+        """version ของโมเดลที่ worker ของประเภทนี้ใช้อยู่ (ไม่ต้องส่งงานเข้า worker)"""
+        from utils.model_registry import registry
+
+        if kind in self._info:
+            return self._info[kind]["version"]
+        model_path, backend = self._overrides.get(kind, (None, None))
+        if model_path is None and backend is not None:
+            from utils.loader_model import get_model_artifact
+            model_path = get_model_artifact(kind, backend)[0]
+        return registry.current_version(kind, model_path)
+
+    def status(self, kind: str) -> dict:
+        """สถานะของ pool (ไม่ส่งงานเข้า worker เพื่อไม่ให้ต้องรอคิวงานวิดีโอ)"""
+        status = {"key": kind, "mode": "process", "workers": worker_count(kind),
+                  "started": kind in self._pools}
+        if kind in self._info:
+            status["model"] = self._info[kind]
+        return status
+
+    def shutdown(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+worker_pools = WorkerPools()
+
+
+def model_version(kind: str) -> str:
+    """version ของโมเดลที่ analyzer ประเภทนี้จะใช้ (ใช้ทำ cache key)"""
+    if worker_count(kind) <= 0:
+        from utils.model_registry import registry
+        return registry.current_version(kind)
+    return worker_pools.model_version(kind)
+
+
+async def run_analyzer(kind: str, *args, entry: str = None, **kwargs):
+    """
+    รัน analyzer ตามประเภท: ผ่าน process pool หรือ thread เดิมถ้าตั้ง INFERENCE_WORKERS_<KIND>=0
+    entry = รันฟังก์ชันอื่นในโมดูลของ analyzer นั้นแทน (ใช้ pool / โมเดลเดียวกัน)
+    """
+    if worker_count(kind) <= 0:
+        return await asyncio.to_thread(_resolve(kind, entry), *args, **kwargs)
+    return await worker_pools.run(kind, *args, entry=entry, **kwargs)